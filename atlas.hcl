@@ -18,3 +18,24 @@ env "sqlalchemy" {
     }
   }
 }
+
+data "external_schema" "sqlalchemy_sqlite" {
+  program = [
+    "atlas-provider-sqlalchemy",
+    "--path", "./src/infrastructure/persistence/database/models",
+    "--dialect", "sqlite",
+  ]
+}
+
+env "sqlite" {
+  src = data.external_schema.sqlalchemy_sqlite.url
+  dev = "sqlite://dev?mode=memory"
+  migration {
+    dir = "file://migrations/sqlite"
+  }
+  format {
+    migrate {
+      diff = "{{ sql . \"  \" }}"
+    }
+  }
+}
@@ -0,0 +1,16 @@
+-- Create "tenant_shard" table
+CREATE TABLE "tenant_shard" (
+ "tenant_id" serial NOT NULL,
+ "shard_id" character varying NOT NULL,
+ PRIMARY KEY ("tenant_id")
+);
+-- Create index "ix_tenant_shard_shard_id" to table: "tenant_shard"
+CREATE INDEX "ix_tenant_shard_shard_id" ON "tenant_shard" ("shard_id");
+-- Create "phone_number_directory" table
+CREATE TABLE "phone_number_directory" (
+ "phone_number" character varying NOT NULL,
+ "tenant_id" integer NOT NULL,
+ PRIMARY KEY ("phone_number")
+);
+-- Create index "ix_phone_number_directory_tenant_id" to table: "phone_number_directory"
+CREATE INDEX "ix_phone_number_directory_tenant_id" ON "phone_number_directory" ("tenant_id");
@@ -0,0 +1,8 @@
+-- Modify "tenant_shard" table
+ALTER TABLE "tenant_shard" ADD COLUMN "read_only" boolean NOT NULL DEFAULT false;
+-- Backfill the shard directory with the tenants created before sharding, they stay in the primary database, shard 0
+INSERT INTO "tenant_shard" ("tenant_id", "shard_id") SELECT "id", '0' FROM "tenant" ON CONFLICT DO NOTHING;
+-- Allocate new tenant ids above the backfilled ones
+SELECT setval(pg_get_serial_sequence('"tenant_shard"', 'tenant_id'), "max_id") FROM (SELECT max("tenant_id") AS "max_id" FROM "tenant_shard") AS "tenant_ids" WHERE "max_id" IS NOT NULL;
+-- Backfill the phone number directory with their users
+INSERT INTO "phone_number_directory" ("phone_number", "tenant_id") SELECT "phone_number", "tenant_id" FROM "user" ON CONFLICT DO NOTHING;
@@ -0,0 +1,71 @@
+-- Create "tenant" table
+CREATE TABLE `tenant` (
+  `id` integer NOT NULL,
+  PRIMARY KEY (`id`)
+);
+-- Create "category" table
+CREATE TABLE `category` (
+  `id` integer NOT NULL,
+  `name` varchar NOT NULL,
+  `description` varchar NULL,
+  `tenant_id` integer NOT NULL,
+  PRIMARY KEY (`id`),
+  CONSTRAINT `0` FOREIGN KEY (`tenant_id`) REFERENCES `tenant` (`id`) ON UPDATE NO ACTION ON DELETE NO ACTION
+);
+-- Create index "category_name_tenant_id" to table: "category"
+CREATE UNIQUE INDEX `category_name_tenant_id` ON `category` (`name`, `tenant_id`);
+-- Create "user" table
+CREATE TABLE `user` (
+  `id` integer NOT NULL,
+  `phone_number` varchar NOT NULL,
+  `name` varchar NULL,
+  `is_registered` boolean NOT NULL,
+  `tenant_id` integer NOT NULL,
+  PRIMARY KEY (`id`),
+  CONSTRAINT `0` FOREIGN KEY (`tenant_id`) REFERENCES `tenant` (`id`) ON UPDATE NO ACTION ON DELETE NO ACTION
+);
+-- Create index "ix_user_phone_number" to table: "user"
+CREATE UNIQUE INDEX `ix_user_phone_number` ON `user` (`phone_number`);
+-- Create "bill" table
+CREATE TABLE `bill` (
+  `id` integer NOT NULL,
+  `value` float NOT NULL,
+  `date` date NOT NULL,
+  `category_id` integer NULL,
+  `tenant_id` integer NOT NULL,
+  PRIMARY KEY (`id`),
+  CONSTRAINT `0` FOREIGN KEY (`tenant_id`) REFERENCES `tenant` (`id`) ON UPDATE NO ACTION ON DELETE NO ACTION,
+  CONSTRAINT `1` FOREIGN KEY (`category_id`) REFERENCES `category` (`id`) ON UPDATE NO ACTION ON DELETE NO ACTION
+);
+-- Create "message" table
+CREATE TABLE `message` (
+  `id` integer NOT NULL,
+  `body` varchar NOT NULL,
+  `author` varchar(6) NOT NULL,
+  `broker` varchar(8) NOT NULL,
+  `timestamp` datetime NOT NULL,
+  `external_message_id` varchar NULL,
+  `user_id` integer NOT NULL,
+  `tenant_id` integer NOT NULL,
+  PRIMARY KEY (`id`),
+  CONSTRAINT `0` FOREIGN KEY (`tenant_id`) REFERENCES `tenant` (`id`) ON UPDATE NO ACTION ON DELETE NO ACTION,
+  CONSTRAINT `1` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`) ON UPDATE NO ACTION ON DELETE NO ACTION
+);
+-- Create index "message_external_message_id" to table: "message"
+CREATE UNIQUE INDEX `message_external_message_id` ON `message` (`external_message_id`);
+-- Create "tenant_shard" table
+CREATE TABLE `tenant_shard` (
+  `tenant_id` integer NOT NULL,
+  `shard_id` varchar NOT NULL,
+  PRIMARY KEY (`tenant_id`)
+);
+-- Create index "ix_tenant_shard_shard_id" to table: "tenant_shard"
+CREATE INDEX `ix_tenant_shard_shard_id` ON `tenant_shard` (`shard_id`);
+-- Create "phone_number_directory" table
+CREATE TABLE `phone_number_directory` (
+  `phone_number` varchar NOT NULL,
+  `tenant_id` integer NOT NULL,
+  PRIMARY KEY (`phone_number`)
+);
+-- Create index "ix_phone_number_directory_tenant_id" to table: "phone_number_directory"
+CREATE INDEX `ix_phone_number_directory_tenant_id` ON `phone_number_directory` (`tenant_id`);
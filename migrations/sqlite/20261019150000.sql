@@ -0,0 +1,2 @@
+-- Add column "read_only" to table: "tenant_shard"
+ALTER TABLE `tenant_shard` ADD COLUMN `read_only` boolean NOT NULL DEFAULT false;
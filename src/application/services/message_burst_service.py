@@ -0,0 +1,76 @@
+import asyncio
+import operator
+from string import Template
+
+from domain.entities import Message
+from domain.entities import MessageAuthor
+from domain.exceptions import KeyNotFoundException
+from domain.ports.repositories import MessageRepository
+from domain.ports.services import TemporaryStorageService
+
+LATEST_USER_MESSAGE_KEY_TEMPLATE = Template("user:$user_id:latest_message")
+
+
+class MessageBurstService:
+    """Coalesces bursts of user messages into one agent run.
+
+    Each new user message is marked as the user's latest. An agent run for a message that is no
+    longer the latest is superseded: the run for the latest one answers every message sent since
+    the last reply.
+    """
+
+    def __init__(
+        self,
+        message_repository: MessageRepository,
+        temporary_storage_service: TemporaryStorageService,
+        debounce_seconds: float,
+        poll_seconds: float,
+        latest_message_ttl_seconds: int,
+    ):
+        self._message_repository = message_repository
+        self._temporary_storage_service = temporary_storage_service
+        self.debounce_seconds = debounce_seconds
+        self._poll_seconds = poll_seconds
+        self._latest_message_ttl_seconds = latest_message_ttl_seconds
+
+    def mark_latest(self, message: Message) -> None:
+        # Only ever moves forward, runs of ProcessMessage for a user may overlap or be retried out of order
+        self._temporary_storage_service.set_if_greater(
+            LATEST_USER_MESSAGE_KEY_TEMPLATE.substitute(user_id=message.user_id),
+            message.id,
+            self._latest_message_ttl_seconds,
+        )
+
+    def is_latest(self, message: Message) -> bool:
+        try:
+            latest_message_id = self._temporary_storage_service.get(
+                LATEST_USER_MESSAGE_KEY_TEMPLATE.substitute(user_id=message.user_id),
+            )
+        except KeyNotFoundException:
+            return True
+
+        return message.id >= latest_message_id
+
+    async def wait_until_superseded(self, message: Message) -> None:
+        while await asyncio.to_thread(self.is_latest, message):
+            await asyncio.sleep(self._poll_seconds)
+
+    def get_unanswered(self, message: Message) -> list[Message]:
+        """User messages since the last message to them, up to and including `message`."""
+        # Ids grow with every message of a tenant, timestamps come from the brokers
+        messages = sorted(
+            self._message_repository.get_all(user_id=message.user_id, tenant_id=message.tenant_id),
+            key=operator.attrgetter("id"),
+        )
+
+        unanswered = []
+        for other in messages:
+            if other.id > message.id:
+                break
+
+            if other.author == MessageAuthor.USER:
+                unanswered.append(other)
+            else:
+                unanswered.clear()
+
+        return unanswered or [message]
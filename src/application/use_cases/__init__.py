@@ -1,7 +1,80 @@
+import asyncio
+import contextlib
+import datetime
+import random
+import uuid
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import ParamSpec
+from typing import TypeVar
+
 from domain.ports.services import AsyncTaskDispatcherService
 
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+# Set by the worker for each task, whose repositories share one database session
+blocking_calls_lock: ContextVar[asyncio.Lock | None] = ContextVar("blocking_calls_lock", default=None)
+
+
+async def run_blocking(fn: Callable[P, R], /, *args: P.args, **kwargs: P.kwargs) -> R:
+    """Runs a synchronous port call (repositories, Redis) on the loop's default executor.
+
+    The worker bounds the executor to the size of the database pool, so a slow call doesn't
+    stall other tasks. Database sessions aren't thread-safe, so the calls of a task run one at
+    a time under `blocking_calls_lock`, and a cancelled call waits for its thread to finish.
+    The session is then never used by two threads at once, nor closed while a thread uses it.
+    """
+    async with blocking_calls_lock.get() or contextlib.nullcontext():
+        call = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            await asyncio.wait([call])
+            raise
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    backoff_seconds: float = 1
+    max_backoff_seconds: float = 300
+
+    def delay_seconds(self, attempt: int) -> float:
+        # Exponential backoff with equal jitter, between half and all of it, so a burst of
+        # failures doesn't come back all at once
+        backoff = min(self.backoff_seconds * 2 ** (attempt - 1), self.max_backoff_seconds)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
 
 class AsyncTask:
+    # Tasks with a queue get their own, so slow tasks don't hold up the default queue. The
+    # worker prefetches the largest concurrency declared for a queue, or the default prefetch.
+    queue: str | None = None
+    concurrency: int | None = None
+    # Allows the worker to run the task in process when another task dispatches it
+    inline: bool = False
+    retry_policy = RetryPolicy()
+    # Tasks with the same value for this argument run one at a time, in the order they arrive
+    serialize_by: str | None = None
+
     @classmethod
-    async def dispatch(cls, async_task_dispatcher_service: AsyncTaskDispatcherService, **kwargs):
-        await async_task_dispatcher_service.dispatch(cls.__name__, **kwargs)
+    async def dispatch(
+        cls,
+        async_task_dispatcher_service: AsyncTaskDispatcherService,
+        *,
+        eta: datetime.datetime | None = None,
+        countdown: float | None = None,
+        **kwargs,
+    ):
+        await async_task_dispatcher_service.dispatch(
+            cls.__name__,
+            queue=cls.queue,
+            eta=eta,
+            countdown=countdown,
+            # Copies of this dispatch, redelivered or retried, share the id and run once
+            task_id=uuid.uuid4().hex,
+            **kwargs,
+        )
@@ -1,10 +1,16 @@
 import asyncio
 import datetime
 
+from application.services.message_burst_service import MessageBurstService
 from application.use_cases import AsyncTask
+from application.use_cases import RetryPolicy
+from application.use_cases import run_blocking
+from domain.entities import Message
 from domain.entities import MessageAuthor
 from domain.entities import MessageBroker
+from domain.entities import User
 from domain.exceptions import MessageNotFoundException
+from domain.exceptions import TaskSupersededException
 from domain.ports.repositories import MessageRepository
 from domain.ports.repositories import TenantRepository
 from domain.ports.repositories import UserRepository
@@ -13,6 +19,9 @@ from domain.ports.services import AsyncTaskDispatcherService
 from domain.ports.services import PubsubService
 from domain.ports.services import WhatsappBrokerMessageService
 
+# The message is created in the dispatching scope, which only commits once the task returns
+PROCESS_MESSAGE_COUNTDOWN_SECONDS = 1
+
 
 class ProcessIncomingMessage(AsyncTask):
     dependencies = [AsyncTaskDispatcherService, MessageRepository, UserRepository, TenantRepository]
@@ -29,13 +38,7 @@ class ProcessIncomingMessage(AsyncTask):
         self._user_repository = user_repository
         self._tenant_repository = tenant_repository
 
-    async def __call__(
-        self,
-        message_body: str,
-        phone_number: str,
-        timestamp: str,
-        message_id: str | None = None,
-    ):
+    def _store_message(self, message_body: str, phone_number: str, timestamp: str, message_id: str | None) -> Message:
         dt_timestamp = datetime.datetime.fromisoformat(timestamp)
         user = self._user_repository.get_by_phone_number(phone_number)
         if user is None:
@@ -46,7 +49,7 @@ class ProcessIncomingMessage(AsyncTask):
                 tenant_id=tenant.id,
                 is_registered=False,
             )
-        message = self._message_repository.create(
+        return self._message_repository.create(
             body=message_body,
             author=MessageAuthor.USER,
             timestamp=dt_timestamp,
@@ -55,34 +58,57 @@ class ProcessIncomingMessage(AsyncTask):
             tenant_id=user.tenant_id,
             external_message_id=message_id,
         )
-        await ProcessMessage.dispatch(self._async_task_dispatcher, message_id=message.id)
+
+    async def __call__(
+        self,
+        message_body: str,
+        phone_number: str,
+        timestamp: str,
+        message_id: str | None = None,
+    ):
+        message = await run_blocking(self._store_message, message_body, phone_number, timestamp, message_id)
+        await ProcessMessage.dispatch(
+            self._async_task_dispatcher,
+            countdown=PROCESS_MESSAGE_COUNTDOWN_SECONDS,
+            message_id=message.id,
+        )
 
 
 class ProcessMessage(AsyncTask):
-    dependencies = [AsyncTaskDispatcherService, MessageRepository]
+    inline = True
+    dependencies = [AsyncTaskDispatcherService, MessageRepository, MessageBurstService]
 
     def __init__(
         self,
         async_task_dispatcher: AsyncTaskDispatcherService,
         message_repository: MessageRepository,
+        message_burst_service: MessageBurstService,
     ):
         self._async_task_dispatcher = async_task_dispatcher
         self._message_repository = message_repository
+        self._message_burst_service = message_burst_service
 
     async def __call__(self, message_id: int):
-        await asyncio.sleep(1)
         try:
-            message = self._message_repository.get_by_id(message_id)
+            message = await run_blocking(self._message_repository.get_by_id, message_id)
         except MessageNotFoundException:
             return
         await NotifyUser.dispatch(self._async_task_dispatcher, message_id=message.id)
         if message.author == MessageAuthor.USER:
-            await RunAgent.dispatch(self._async_task_dispatcher, message_id=message.id)
+            # Messages sent within the debounce window are answered by the run of the last one
+            await run_blocking(self._message_burst_service.mark_latest, message)
+            await RunAgent.dispatch(
+                self._async_task_dispatcher,
+                countdown=self._message_burst_service.debounce_seconds,
+                message_id=message.id,
+                user_id=message.user_id,
+            )
         elif message.broker == MessageBroker.WHATSAPP:
             await SendMessage.dispatch(self._async_task_dispatcher, message_id=message.id)
 
 
 class NotifyUser(AsyncTask):
+    inline = True
     dependencies = [MessageRepository, PubsubService]
 
     def __init__(
@@ -94,7 +120,7 @@ class NotifyUser(AsyncTask):
         self._pubsub_service = pubsub_service
 
     async def __call__(self, message_id: int):
-        message = self._message_repository.get_by_id(message_id)
+        message = await run_blocking(self._message_repository.get_by_id, message_id)
         message_data = {
             "id": message.id,
             "author": message.author.value,
@@ -106,7 +132,13 @@ class NotifyUser(AsyncTask):
 
 
 class RunAgent(AsyncTask):
-    dependencies = AsyncTaskDispatcherService, MessageRepository, UserRepository, AIAgentService
+    # Seconds of LLM time per task, kept off the queue of the fast tasks
+    queue = "agent"
+    concurrency = 5
+    retry_policy = RetryPolicy(max_attempts=3, backoff_seconds=5)
+    # Runs for a user share their message history, concurrent ones would overwrite each other's
+    serialize_by = "user_id"
+    dependencies = AsyncTaskDispatcherService, MessageRepository, UserRepository, AIAgentService, MessageBurstService
 
     def __init__(
         self,
@@ -114,17 +146,43 @@ class RunAgent(AsyncTask):
         message_repository: MessageRepository,
         user_repository: UserRepository,
         ai_agent_service: AIAgentService,
+        message_burst_service: MessageBurstService,
     ):
         self._async_task_dispatcher = async_task_dispatcher
         self._message_repository = message_repository
         self._user_repository = user_repository
         self._ai_agent_service = ai_agent_service
+        self._message_burst_service = message_burst_service
 
-    async def __call__(self, message_id: int):
-        message = self._message_repository.get_by_id(message_id)
-        user = self._user_repository.get_by_id(message.user_id)
-        answer = await self._ai_agent_service.run(message.body, user)
-        reply_msg = self._message_repository.create(
+    async def _run_agent_unless_superseded(self, message: Message, message_body: str, user: User) -> str:
+        answer = asyncio.ensure_future(self._ai_agent_service.run(message_body, user))
+        superseded = asyncio.ensure_future(self._message_burst_service.wait_until_superseded(message))
+        try:
+            await asyncio.wait([answer, superseded], return_when=asyncio.FIRST_COMPLETED)
+            # If checking for newer messages failed the run just goes on
+            if not answer.done() and superseded.exception() is None:
+                raise TaskSupersededException(f"A message newer than {message.id} arrived during the agent run")
+
+            return await answer
+        finally:
+            superseded.cancel()
+            answer.cancel()
+            # Lets them unwind, the task's scope closes the session their blocking calls use
+            await asyncio.wait([answer, superseded])
+
+    async def __call__(self, message_id: int, user_id: int | None = None):
+        # user_id only orders the runs of a user, it is read from the message
+        message = await run_blocking(self._message_repository.get_by_id, message_id)
+        if not await run_blocking(self._message_burst_service.is_latest, message):
+            raise TaskSupersededException(f"A message newer than {message.id} arrived")
+
+        user = await run_blocking(self._user_repository.get_by_id, message.user_id)
+        unanswered = await run_blocking(self._message_burst_service.get_unanswered, message)
+        message_body = "\n".join(unanswered_message.body for unanswered_message in unanswered)
+        # Rolls back what the agent's tools did if a newer message arrives, its run starts over
+        answer = await self._run_agent_unless_superseded(message, message_body, user)
+        reply_msg = await run_blocking(
+            self._message_repository.create,
             body=answer,
             author=MessageAuthor.BILLY,
             timestamp=datetime.datetime.now(datetime.UTC),
@@ -132,10 +190,15 @@ class RunAgent(AsyncTask):
             user_id=user.id,
             tenant_id=user.tenant_id,
         )
-        await ProcessMessage.dispatch(self._async_task_dispatcher, message_id=reply_msg.id)
+        await ProcessMessage.dispatch(
+            self._async_task_dispatcher,
+            countdown=PROCESS_MESSAGE_COUNTDOWN_SECONDS,
+            message_id=reply_msg.id,
+        )
 
 
 class SendMessage(AsyncTask):
+    inline = True
     dependencies = [MessageRepository, UserRepository, WhatsappBrokerMessageService]
 
     def __init__(
@@ -149,6 +212,6 @@ class SendMessage(AsyncTask):
         self._whatsapp_broker_message_service = whatsapp_broker_message_service
 
     async def __call__(self, message_id: int):
-        message = self._message_repository.get_by_id(message_id=message_id)
-        user = self._user_repository.get_by_id(message.user_id)
+        message = await run_blocking(self._message_repository.get_by_id, message_id=message_id)
+        user = await run_blocking(self._user_repository.get_by_id, message.user_id)
         await self._whatsapp_broker_message_service.send_message(message.body, user.phone_number)
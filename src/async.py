@@ -1,65 +1,204 @@
+import argparse
 import asyncio
+import contextlib
+import functools
 import logging
+import signal
 import time
-import traceback
+from multiprocessing.queues import Queue
 
-from application.use_cases import async_tasks
+from application.use_cases import AsyncTask
+from application.use_cases import async_tasks  # noqa: F401 - defines the AsyncTask subclasses
+from domain.exceptions import TaskRetryException
+from domain.exceptions import TaskSupersededException
 from domain.ports.services import AMQPService
+from infrastructure.blocking_executor import InstrumentedThreadPoolExecutor
 from infrastructure.config.settings import app_settings
 from infrastructure.di import global_registry
-from infrastructure.di import resolve
 from infrastructure.di import setup_global_registry
+from infrastructure.in_flight_tasks import InFlightTasks
+from infrastructure.metrics import metrics
+from infrastructure.metrics_server import MetricsServer
+from infrastructure.task_registry import TaskRegistry
+from infrastructure.task_runner import TaskRunner
+from infrastructure.task_runner import retry_or_reject
+from infrastructure.task_runner import tasks_total
+from infrastructure.worker_supervisor import WorkerSupervisor
 
 logging.basicConfig(
-    format="%(asctime)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(processName)s - %(levelname)s - %(message)s",
     level=logging.INFO,
 )
 logger = logging.getLogger(__name__)
 
+task_registry = TaskRegistry(global_registry)
+task_runner = TaskRunner(
+    global_registry,
+    task_registry,
+    inline_concurrency=app_settings.async_task_inline_concurrency,
+    inline_max_countdown_seconds=app_settings.async_task_inline_max_countdown_seconds,
+)
+in_flight_tasks = InFlightTasks()
+
 
 async def worker_callback(payload: dict):
     started_at = time.perf_counter()
-    task_name = payload.get("task")
-    task_kwargs = payload.get("kwargs", {})
+    # Unknown tasks and invalid payloads raise TaskRejectedException and are dead lettered
+    route, task_kwargs = task_registry.route(payload)
+    task_name = route.name
 
     logger.info(f"Received task: {task_name}")
 
-    async with global_registry.scope():
-        try:
-            if not hasattr(async_tasks, task_name):
-                logger.error(f"Task '{task_name}' not found in async_tasks module")
+    try:
+        await task_runner.run(route, task_kwargs, payload.get("id"))
+        tasks_total.inc(task=task_name, outcome="success")
 
-            task_cls = getattr(async_tasks, task_name)
-            task_build_args = [await resolve(dep) for dep in task_cls.dependencies]
+        time_taken = time.perf_counter() - started_at
+        logger.info(f"Finished task: {task_name} in {time_taken:.4f} seconds")
 
-            task = task_cls(*task_build_args)
+    except TaskSupersededException as e:
+        # A newer message took over, the run for it answers this one too
+        logger.info(f"Dropped task {task_name}: {e}")
+        tasks_total.inc(task=task_name, outcome="superseded")
 
-            await task(**task_kwargs)
+    except Exception as e:
+        # The consumer publishes retries to a delay queue and dead letters rejected tasks
+        failure = retry_or_reject(route, payload, e)
+        if isinstance(failure, TaskRetryException):
+            logger.exception(f"Error processing task {task_name}, retrying in {failure.delay_ms}ms: {e}")
+            tasks_total.inc(task=task_name, outcome="retry")
+        else:
+            logger.exception(f"Error processing task {task_name}, dead lettering it: {failure}")
+            tasks_total.inc(task=task_name, outcome="failure")
+        raise failure from e
 
-            time_taken = time.perf_counter() - started_at
-            logger.info(f"Finished task: {task_name} in {time_taken:.4f} seconds")
 
-        except Exception as e:
-            logger.exception(f"Error processing task {task_name}: {e}")
-            logger.exception(traceback.format_exc())
+async def drain(amqp_services: list[AMQPService]) -> None:
+    for amqp_service in amqp_services:
+        await amqp_service.cancel_consumers()
 
+    logger.info(f"Stopped consuming, waiting for {len(in_flight_tasks)} running tasks")
+    cancelled = await in_flight_tasks.drain(app_settings.worker_drain_timeout_seconds)
+    if cancelled:
+        logger.warning(f"Cancelled {cancelled} tasks still running after the drain timeout, they will be redelivered")
 
-async def main():
-    print("Starting Worker...")
-    await setup_global_registry()
 
-    async with global_registry.scope() as di_registry:
-        amqp_service: AMQPService = await di_registry.get(AMQPService)
+async def push_metrics(worker_index: int, metrics_queue: Queue):
+    while True:
+        await asyncio.sleep(app_settings.worker_metrics_push_interval_seconds)
+        metrics_queue.put((worker_index, metrics.snapshot()))
 
-        await amqp_service.consume(
-            queue_name=app_settings.async_task_routing_key,
-            callback=worker_callback,
-            no_ack=False,
-            prefetch_count=app_settings.async_task_prefetch_count,
-        )
 
-        await asyncio.Future()
+async def main(
+    worker_index: int | None = None,
+    metrics_queue: Queue | None = None,
+    queue_names: list[str] | None = None,
+):
+    print("Starting Worker...")
+    # Blocking port calls in tasks go through asyncio.to_thread, which uses this executor
+    loop = asyncio.get_running_loop()
+    blocking_threads = app_settings.worker_blocking_threads or app_settings.database_pool_size
+    loop.set_default_executor(
+        InstrumentedThreadPoolExecutor(max_workers=blocking_threads, thread_name_prefix="blocking"),
+    )
+
+    stopping = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stopping.set)
+    if metrics_queue is None:
+        # Under the supervisor SIGINT is ignored, the supervisor forwards it as SIGTERM
+        loop.add_signal_handler(signal.SIGINT, stopping.set)
+
+    await setup_global_registry()
+    task_registry.register_all(AsyncTask.__subclasses__())
+
+    metrics_pusher = None
+    metrics_server = None
+    if metrics_queue is not None:
+        metrics_pusher = asyncio.create_task(push_metrics(worker_index, metrics_queue))
+    elif app_settings.worker_metrics_port:
+        metrics_server = MetricsServer(
+            metrics.snapshot,
+            app_settings.worker_metrics_host,
+            app_settings.worker_metrics_port,
+        )
+        metrics_server.start()
+
+    queues = task_registry.queues()
+    if queue_names:
+        if unknown := set(queue_names) - queues.keys():
+            raise ValueError(f"No task is routed to {', '.join(sorted(unknown))}, known queues: {', '.join(queues)}")
+        queues = {queue_name: queues[queue_name] for queue_name in queue_names}
+
+    try:
+        # Closing the stack commits the scopes and closes their channels, after the tasks drained
+        async with contextlib.AsyncExitStack() as stack:
+            amqp_services: list[AMQPService] = []
+            for queue_name, prefetch_count in queues.items():
+                # A scope, and so a channel, per queue keeps their prefetch limits independent
+                di_registry = await stack.enter_async_context(global_registry.scope())
+                amqp_service: AMQPService = await di_registry.get(AMQPService)
+
+                await amqp_service.consume(
+                    queue_name=queue_name,
+                    callback=in_flight_tasks.track(worker_callback),
+                    no_ack=False,
+                    prefetch_count=prefetch_count,
+                )
+                amqp_services.append(amqp_service)
+                logger.info(f"Consuming {queue_name} with prefetch {prefetch_count}")
+
+            await stopping.wait()
+            await drain(amqp_services)
+    finally:
+        # Flushes pending pubsub events and timers, then closes the connection pools
+        await global_registry.shutdown()
+
+        if metrics_pusher is not None:
+            metrics_pusher.cancel()
+            metrics_queue.put((worker_index, metrics.snapshot()))
+        if metrics_server is not None:
+            metrics_server.stop()
+
+
+def run_worker(worker_index: int, metrics_queue: Queue, queue_names: list[str] | None = None):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(main(worker_index, metrics_queue, queue_names))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Runs the async task worker.")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=app_settings.worker_processes,
+        help="Worker processes to run, more than one runs them under a supervisor that restarts crashed ones",
+    )
+    parser.add_argument(
+        "--queues",
+        help="Comma separated queues to consume, defaults to the queues of every task",
+    )
+    args = parser.parse_args()
+    queue_names = args.queues.split(",") if args.queues else None
+
+    if args.processes > 1:
+        supervisor = WorkerSupervisor(
+            functools.partial(run_worker, queue_names=queue_names),
+            args.processes,
+            shutdown_timeout_seconds=app_settings.worker_shutdown_timeout_seconds,
+        )
+        metrics_server = None
+        if app_settings.worker_metrics_port:
+            # Children push their metrics to the supervisor, which serves them added up
+            metrics_server = MetricsServer(
+                supervisor.aggregated_metrics,
+                app_settings.worker_metrics_host,
+                app_settings.worker_metrics_port,
+            )
+            metrics_server.start()
+        try:
+            supervisor.run()
+        finally:
+            if metrics_server is not None:
+                metrics_server.stop()
+    else:
+        asyncio.run(main(queue_names=queue_names))
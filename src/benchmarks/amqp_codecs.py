@@ -0,0 +1,65 @@
+import argparse
+import statistics
+import time
+import uuid
+
+from infrastructure.services.amqp_codecs import CODECS
+from infrastructure.services.amqp_codecs import PayloadCodec
+
+
+def build_payloads(count: int, body_size: int) -> list[dict]:
+    # Shaped like the task and WhatsApp payloads, with message bodies of about `body_size` characters
+    body = ("Gastei 50 reais no mercado ontem, " * (body_size // 34 + 1))[:body_size]
+    return [
+        {
+            "task": "SendMessage",
+            "kwargs": {"message_id": i, "message_body": body, "phone_number": "5541999999999"},
+            "id": uuid.uuid4().hex,
+        }
+        for i in range(count)
+    ]
+
+
+def measure(name: str, codec: PayloadCodec, payloads: list[dict], repeat: int) -> None:
+    encode_timings, decode_timings = [], []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        encoded = [codec.encode(payload) for payload in payloads]
+        encode_timings.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        for payload in encoded:
+            codec.decode(payload.body, payload.content_type, payload.content_encoding)
+        decode_timings.append(time.perf_counter() - started_at)
+
+    size = sum(len(payload.body) for payload in encoded) / len(payloads)
+    encode_rate = len(payloads) / statistics.median(encode_timings)
+    decode_rate = len(payloads) / statistics.median(decode_timings)
+    print(f"{name:<24} size={size:9.1f}B encode={encode_rate:12,.0f}/s decode={decode_rate:12,.0f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Size and throughput of the AMQP payload codecs")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--body-sizes", default="40,1000,20000", help="Comma separated message body sizes")
+    parser.add_argument("--compress-min-bytes", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for body_size in (int(size) for size in args.body_sizes.split(",")):
+        print(f"Message bodies of {body_size} characters")
+        payloads = build_payloads(args.count, body_size)
+        for codec_name in CODECS:
+            for compress_min_bytes in (0, args.compress_min_bytes):
+                name = f"{codec_name}+zstd" if compress_min_bytes else codec_name
+                try:
+                    codec = PayloadCodec(codec_name, compress_min_bytes)
+                except RuntimeError as e:
+                    print(f"{name:<24} skipped, {e}")
+                    continue
+
+                measure(name, codec, payloads, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# The LLM client is registered with the rest of the graph, no request is ever sent
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+
+from domain.ports.repositories import CategoryRepository  # noqa: E402
+from domain.ports.repositories import TenantRepository  # noqa: E402
+from domain.ports.repositories import UserRepository  # noqa: E402
+from domain.ports.services import TemporaryStorageService  # noqa: E402
+from infrastructure.di import DIRegistry  # noqa: E402
+from infrastructure.di import register_dependencies  # noqa: E402
+from infrastructure.persistence.memory.repositories import InMemoryDatabase  # noqa: E402
+from infrastructure.persistence.memory.repositories.category_repository import InMemoryCategoryRepository  # noqa: E402
+from infrastructure.persistence.memory.repositories.tenant_repository import InMemoryTenantRepository  # noqa: E402
+from infrastructure.persistence.memory.repositories.user_repository import InMemoryUserRepository  # noqa: E402
+from infrastructure.services.in_memory_temporary_storage_service import InMemoryTemporaryStorageService  # noqa: E402
+from infrastructure.services.jwt_encoding_service import JWTUserEncodingService  # noqa: E402
+from presentation.api import app  # noqa: E402
+
+
+async def measure(name: str, client: httpx.AsyncClient, headers: dict, repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        response = await client.get("/api/v1/categories/", headers=headers)
+        timings.append(time.perf_counter() - started_at)
+        assert response.status_code in (200, 401)
+
+    print(f"{name:<24} median={statistics.median(timings) * 1e6:10.2f}us min={min(timings) * 1e6:10.2f}us")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-request overhead of an authenticated route")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Repositories are in memory so the timings are the framework and DI overhead only
+    in_memory_database = InMemoryDatabase()
+    tenant = InMemoryTenantRepository(in_memory_database).create()
+    user = InMemoryUserRepository(in_memory_database).create(
+        phone_number="5541999999999",
+        name="Benchmark",
+        tenant_id=tenant.id,
+        is_registered=True,
+    )
+
+    registry = DIRegistry()
+    register_dependencies(registry)
+    registry.register(UserRepository, factory=lambda: InMemoryUserRepository(in_memory_database))
+    registry.register(TenantRepository, factory=lambda: InMemoryTenantRepository(in_memory_database))
+    registry.register(CategoryRepository, factory=lambda: InMemoryCategoryRepository(in_memory_database))
+    registry.register(TemporaryStorageService, factory=InMemoryTemporaryStorageService)
+    app.state.di_registry = registry
+
+    token = JWTUserEncodingService().encode(user.phone_number, 3600)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await measure("unauthenticated (401)", client, {"Authorization": "Bearer invalid"}, args.repeat)
+        await measure("authenticated", client, {"Authorization": f"Bearer {token}"}, args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import argparse
+import datetime
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from infrastructure.config.settings import app_settings
+from infrastructure.persistence.database import create_database_engine
+from infrastructure.persistence.database.models import Base
+from infrastructure.persistence.database.repositories.bill_repository import DBBillRepository
+from infrastructure.persistence.database.repositories.category_repository import DBCategoryRepository
+from infrastructure.persistence.database.repositories.tenant_repository import DBTenantRepository
+from infrastructure.persistence.database.repositories.user_repository import DBUserRepository
+
+PHONE_NUMBER = "5541999999999"
+
+
+def seed(session_factory: sessionmaker, bills: int) -> None:
+    with session_factory.begin() as session:
+        user_repository = DBUserRepository(session)
+        if user_repository.get_by_phone_number(PHONE_NUMBER) is not None:
+            return
+
+        tenant = DBTenantRepository(session).create()
+        category = DBCategoryRepository(session).create(tenant.id, "default", "Default category")
+        user_repository.create(phone_number=PHONE_NUMBER, name="Bench", tenant_id=tenant.id, is_registered=True)
+
+        bill_repository = DBBillRepository(session)
+        for i in range(bills):
+            bill_repository.create(tenant.id, datetime.date(2025, 1, 1 + i % 28), float(i), category.id)
+
+
+def run_request(session_factory: sessionmaker) -> None:
+    # Mirrors an authenticated "list bills, then add one" request: one session per request,
+    # a phone number lookup for the current user and a commit at the end of the scope.
+    with session_factory.begin() as session:
+        user = DBUserRepository(session).get_by_phone_number(PHONE_NUMBER)
+        bill_repository = DBBillRepository(session)
+        date_range = (datetime.date(2025, 1, 1), datetime.date(2025, 1, 15))
+        bills = list(bill_repository.get_many(user.tenant_id, date_range=date_range))
+        bill_repository.create(user.tenant_id, datetime.date(2025, 1, 1), 10.0, bills[0].category_id)
+
+
+def benchmark(uri: str, requests: int, bills: int) -> list[float]:
+    engine = create_database_engine(uri)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(engine)
+    seed(session_factory, bills)
+
+    for _ in range(min(requests, 50)):
+        run_request(session_factory)
+
+    timings = []
+    for _ in range(requests):
+        started_at = time.perf_counter()
+        run_request(session_factory)
+        timings.append(time.perf_counter() - started_at)
+
+    engine.dispose()
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    quantiles = statistics.quantiles(timings, n=100)
+    print(
+        f"{name:<40} mean={statistics.mean(timings) * 1000:8.3f}ms "
+        f"p50={quantiles[49] * 1000:8.3f}ms p95={quantiles[94] * 1000:8.3f}ms p99={quantiles[98] * 1000:8.3f}ms",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request database latency across backends")
+    parser.add_argument("--uri", action="append", help="Database URIs to compare, defaults to SQLite and Postgres")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--bills", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        uris = args.uri or [
+            f"sqlite:///{tmp_dir}/billy.db",
+            (
+                f"postgresql+psycopg://{app_settings.database_user}:{app_settings.database_password}"
+                f"@{app_settings.database_host}:{app_settings.database_port}/{app_settings.database_db}"
+            ),
+        ]
+
+        for uri in uris:
+            try:
+                timings = benchmark(uri, args.requests, args.bills)
+            except Exception as e:
+                print(f"{uri.split('://')[0]:<40} skipped: {e.__class__.__name__}: {e}")
+                continue
+
+            report(uri.split("://")[0], timings)
+
+
+if __name__ == "__main__":
+    main()
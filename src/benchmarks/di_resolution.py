@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import inspect
+import os
+import statistics
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+# The LLM client is created at startup, no request is ever sent
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+from domain.ports.services import AIAgentService  # noqa: E402
+from infrastructure.di import DIRegistry  # noqa: E402
+from infrastructure.di import global_registry  # noqa: E402
+from infrastructure.di import setup_global_registry  # noqa: E402
+
+
+class RecursiveDIContainer:
+    # The container as it was before resolution plans and singletons: dicts copied per scope,
+    # one await per node and every dependency, pools included, built again in each scope
+    def __init__(self, registry: DIRegistry):
+        self._factories = registry._factories.copy()
+        self._dependencies = registry._dependencies.copy()
+        self._instances = {}
+
+    async def get(self, cls):
+        if cls in self._instances:
+            return self._instances[cls]
+
+        deps = [await self.get(dep_cls) for dep_cls in self._dependencies[cls]]
+        result = self._factories[cls](*deps)
+        if inspect.iscoroutine(result):
+            result = await result
+
+        self._instances[cls] = result
+        return result
+
+
+async def measure(name: str, fn: Callable[[], Awaitable], repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - started_at)
+
+    print(f"{name:<40} median={statistics.median(timings) * 1e6:10.2f}us min={min(timings) * 1e6:10.2f}us")
+
+
+def stub_registry(registry: DIRegistry) -> DIRegistry:
+    # Same graph with no-op factories, so only the container overhead is measured
+    stub = DIRegistry()
+    for interface, dependencies in registry._dependencies.items():
+        stub.register(interface, factory=lambda *deps: object(), dependencies=list(dependencies))
+
+    return stub
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Scope creation plus AIAgentService resolution")
+    parser.add_argument("--repeat", type=int, default=10_000)
+    args = parser.parse_args()
+
+    await setup_global_registry()
+    stub = stub_registry(global_registry)
+
+    async def planned(registry: DIRegistry):
+        await registry.create_container().get(AIAgentService)
+
+    async def recursive(registry: DIRegistry):
+        await RecursiveDIContainer(registry).get(AIAgentService)
+
+    await measure("stub graph, recursive", lambda: recursive(stub), args.repeat)
+    await measure("stub graph, plan", lambda: planned(stub), args.repeat)
+    await measure("global registry, recursive", lambda: recursive(global_registry), args.repeat // 10)
+    await measure("global registry, plan", lambda: planned(global_registry), args.repeat // 10)
+
+    await global_registry.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+import argparse
+import datetime
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from domain.entities import Bill
+from domain.entities import BillBatch
+from domain.entities import Message
+from domain.entities import MessageAuthor
+from domain.entities import MessageBroker
+
+
+@dataclass
+class DictBill:
+    # The Bill entity as it was before slots, kept here as the baseline.
+    id: int
+    value: float
+    date: datetime.date
+    category_id: int
+    tenant_id: int
+
+
+@dataclass
+class DictMessage:
+    id: int
+    body: str
+    author: str
+    timestamp: datetime.datetime
+    broker: str
+    external_message_id: str | None
+    user_id: int
+    tenant_id: int
+
+
+DATES = [datetime.date(2020, 1, 1) + datetime.timedelta(days=day) for day in range(1825)]
+TIMESTAMP = datetime.datetime(2025, 1, 1)
+
+
+def build_bills(cls: type, count: int) -> list:
+    return [cls(id=i, value=float(i % 1000), date=DATES[i % 1825], category_id=1, tenant_id=1) for i in range(count)]
+
+
+def build_bill_batch(count: int) -> BillBatch:
+    batch = BillBatch()
+    for i in range(count):
+        batch.append(i, float(i % 1000), DATES[i % 1825], 1, 1)
+
+    return batch
+
+
+def build_messages(cls: type, count: int) -> list:
+    return [
+        cls(
+            id=i,
+            body="Paguei 50 reais no mercado",
+            author=MessageAuthor.USER,
+            timestamp=TIMESTAMP,
+            broker=MessageBroker.WHATSAPP,
+            external_message_id=None,
+            user_id=1,
+            tenant_id=1,
+        )
+        for i in range(count)
+    ]
+
+
+def measure(name: str, build: Callable[[], object], scan: Callable[[object], float]) -> None:
+    gc.collect()
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    built = build()
+    build_time = time.perf_counter() - started_at
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started_at = time.perf_counter()
+    scan(built)
+    scan_time = time.perf_counter() - started_at
+
+    print(
+        f"{name:<24} memory={allocated / 2**20:9.2f}MiB "
+        f"build={build_time * 1000:9.2f}ms scan={scan_time * 1000:9.2f}ms",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and throughput of entity lists and batches")
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    def sum_values(bills) -> float:
+        return sum(bill.value for bill in bills)
+
+    def count_user_messages(messages) -> float:
+        return sum(1 for message in messages if message.author == MessageAuthor.USER)
+
+    measure("Bill (__dict__)", lambda: build_bills(DictBill, args.count), sum_values)
+    measure("Bill (slots)", lambda: build_bills(Bill, args.count), sum_values)
+    measure("BillBatch", lambda: build_bill_batch(args.count), lambda batch: batch.total())
+    measure("Message (__dict__)", lambda: build_messages(DictMessage, args.count), count_user_messages)
+    measure("Message (slots, frozen)", lambda: build_messages(Message, args.count), count_user_messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import datetime
+import random
+import statistics
+import time
+from collections.abc import Callable
+
+from domain.entities import Bill
+from infrastructure.persistence.memory.repositories import InMemoryDatabase
+from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
+from infrastructure.persistence.memory.repositories.category_repository import InMemoryCategoryRepository
+from infrastructure.persistence.memory.repositories.tenant_repository import InMemoryTenantRepository
+
+START_DATE = datetime.date(2020, 1, 1)
+
+
+def seed(bills: int, tenants: int) -> InMemoryDatabase:
+    database = InMemoryDatabase()
+    tenant_repository = InMemoryTenantRepository(database)
+    category_repository = InMemoryCategoryRepository(database)
+    bill_repository = InMemoryBillRepository(database)
+
+    categories = {}
+    for _ in range(tenants):
+        tenant = tenant_repository.create()
+        categories[tenant.id] = category_repository.create(tenant.id, "default", "Default category").id
+
+    random.seed(0)
+    for i in range(bills):
+        tenant_id = i % tenants + 1
+        date = START_DATE + datetime.timedelta(days=random.randrange(5 * 365))
+        bill_repository.create(tenant_id, date, round(random.uniform(1, 1000), 2), categories[tenant_id])
+
+    return database
+
+
+def linear_scan_get_many(
+    database: InMemoryDatabase,
+    tenant_id: int,
+    date_range: tuple[datetime.date, datetime.date],
+    value_range: tuple[float, float],
+) -> list[Bill]:
+    # The original InMemoryBillRepository.get_many: every bill in the system checked against every predicate.
+    return [
+        bill
+        for bill in database.bills.values()
+        if bill.tenant_id == tenant_id
+        and date_range[0] <= bill.date <= date_range[1]
+        and value_range[0] <= bill.value <= value_range[1]
+    ]
+
+
+def measure(name: str, fn: Callable[[], object], repeat: int) -> None:
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started_at)
+
+    print(f"{name:<32} median={statistics.median(timings) * 1000:10.3f}ms min={min(timings) * 1000:10.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-memory bill range queries and sums")
+    parser.add_argument("--bills", type=int, default=1_000_000)
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    database = seed(args.bills, args.tenants)
+    print(f"Seeded {args.bills} bills across {args.tenants} tenants in {time.perf_counter() - started_at:.2f}s")
+
+    tenant_id = 1
+    date_range = (datetime.date(2022, 3, 1), datetime.date(2022, 3, 31))
+    value_range = (100.0, 500.0)
+    by_date = InMemoryBillRepository(database)
+    columnar = InMemoryBillRepository(database, columnar=True)
+
+    def linear_scan():
+        return linear_scan_get_many(database, tenant_id, date_range, value_range)
+
+    measure("linear scan get_many", linear_scan, args.repeat)
+    measure("bisect get_many", lambda: list(by_date.get_many(tenant_id, date_range, None, value_range)), args.repeat)
+    measure("columnar get_many", lambda: list(columnar.get_many(tenant_id, date_range, None, value_range)), args.repeat)
+    measure("linear scan sum", lambda: sum(bill.value for bill in linear_scan()), args.repeat)
+    measure("bisect get_total", lambda: by_date.get_total(tenant_id, date_range, None, value_range), args.repeat)
+    measure("columnar get_total", lambda: columnar.get_total(tenant_id, date_range, None, value_range), args.repeat)
+    measure("columnar full-history total", lambda: columnar.get_total(tenant_id), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
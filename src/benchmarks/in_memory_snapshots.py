@@ -0,0 +1,52 @@
+import argparse
+import datetime
+import statistics
+import time
+from collections.abc import Callable
+
+from infrastructure.persistence.memory.repositories import InMemoryDatabase
+from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
+from infrastructure.persistence.memory.seed import seed_in_memory_database
+
+
+def measure(name: str, fn: Callable[[], object], repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started_at)
+
+    print(f"{name:<36} median={statistics.median(timings) * 1000:10.3f}ms min={min(timings) * 1000:10.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rebuilding a seeded InMemoryDatabase with forking a snapshot")
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--bills-per-tenant", type=int, default=100_000)
+    parser.add_argument("--messages-per-tenant", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    def seed() -> InMemoryDatabase:
+        return seed_in_memory_database(
+            InMemoryDatabase(),
+            tenants=args.tenants,
+            bills_per_tenant=args.bills_per_tenant,
+            messages_per_tenant=args.messages_per_tenant,
+        )
+
+    measure("seed from scratch", seed, 1)
+
+    snapshot = seed().snapshot()
+
+    def fork_and_update():
+        bill_repository = InMemoryBillRepository(snapshot.fork())
+        bill_repository.update(tenant_id=1, bill_id=1, date=datetime.date(2024, 1, 1), value=1.0)
+        bill_repository.create(tenant_id=1, date=datetime.date(2024, 1, 1), value=1.0, category_id=1)
+
+    measure("fork", snapshot.fork, args.repeat)
+    measure("fork + update + create", fork_and_update, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import json
+import logging
+
+from infrastructure.config.settings import app_settings
+from infrastructure.services.aio_pika_amqp_service import AioPikaAMQPService
+from infrastructure.services.aio_pika_amqp_service import AioPikaPoolService
+from infrastructure.services.aio_pika_amqp_service import DeadLetter
+from infrastructure.services.aio_pika_amqp_service import dead_letter_queue_name
+from infrastructure.services.amqp_codecs import PayloadCodec
+
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+
+def describe_body(payload_codec: PayloadCodec, dead_letter: DeadLetter) -> str:
+    try:
+        return json.dumps(
+            payload_codec.decode(dead_letter.body, dead_letter.content_type, dead_letter.content_encoding),
+            default=repr,
+        )
+    except ValueError:
+        return dead_letter.body.decode("utf-8", errors="replace")
+
+
+async def run(args: argparse.Namespace):
+    payload_codec = PayloadCodec(app_settings.amqp_payload_codec, app_settings.amqp_payload_compress_min_bytes)
+    amqp_pool_service = AioPikaPoolService(app_settings.rabbitmq_uri, payload_codec)
+    amqp_service = AioPikaAMQPService(await amqp_pool_service.get_channel(), payload_codec)
+
+    try:
+        match args.command:
+            case "inspect":
+                dead_letters = await amqp_service.peek_dead_letters(args.queue, args.limit)
+                for dead_letter in dead_letters:
+                    print(f"{dead_letter.reason}\n  {describe_body(payload_codec, dead_letter)}")
+                logger.info(f"Showed {len(dead_letters)} messages of {dead_letter_queue_name(args.queue)}")
+            case "replay":
+                replayed = await amqp_service.replay_dead_letters(args.queue, args.limit)
+                logger.info(f"Replayed {replayed} messages from {dead_letter_queue_name(args.queue)} to {args.queue}")
+    finally:
+        await amqp_service.close()
+        await amqp_pool_service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay dead lettered tasks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    inspect_parser = subparsers.add_parser("inspect", help="Show dead lettered messages and why, leaving them queued")
+    inspect_parser.add_argument("--queue", default=app_settings.async_task_routing_key)
+    inspect_parser.add_argument("--limit", type=int, default=20)
+
+    replay_parser = subparsers.add_parser("replay", help="Publish dead lettered messages to their queue again")
+    replay_parser.add_argument("--queue", default=app_settings.async_task_routing_key)
+    replay_parser.add_argument("--limit", type=int, help="Replays every message by default")
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 import datetime
+from array import array
+from collections.abc import Iterable
+from collections.abc import Iterator
 from dataclasses import dataclass
+from dataclasses import field
 from enum import Enum
 
 
@@ -14,12 +18,12 @@ class MessageAuthor(Enum):
     SYSTEM = "SYSTEM"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Tenant:
     id: int
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     id: int
     phone_number: str
@@ -28,7 +32,7 @@ class User:
     tenant_id: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Bill:
     id: int
     value: float
@@ -37,7 +41,7 @@ class Bill:
     tenant_id: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Category:
     id: int
     name: str
@@ -45,7 +49,7 @@ class Category:
     tenant_id: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Message:
     id: int
     body: str
@@ -55,3 +59,51 @@ class Message:
     external_message_id: str | None
     user_id: int
     tenant_id: int
+
+
+_NO_CATEGORY = -1
+
+
+@dataclass(slots=True)
+class BillBatch:
+    """Bills stored as parallel typed arrays, roughly 40 bytes per bill instead of a Bill object each."""
+
+    ids: array = field(default_factory=lambda: array("q"))
+    values: array = field(default_factory=lambda: array("d"))
+    date_ordinals: array = field(default_factory=lambda: array("l"))
+    category_ids: array = field(default_factory=lambda: array("q"))
+    tenant_ids: array = field(default_factory=lambda: array("q"))
+
+    @classmethod
+    def from_bills(cls, bills: Iterable[Bill]) -> "BillBatch":
+        batch = cls()
+        for bill in bills:
+            batch.append(bill.id, bill.value, bill.date, bill.category_id, bill.tenant_id)
+
+        return batch
+
+    def append(self, id: int, value: float, date: datetime.date, category_id: int | None, tenant_id: int) -> None:
+        self.ids.append(id)
+        self.values.append(value)
+        self.date_ordinals.append(date.toordinal())
+        self.category_ids.append(_NO_CATEGORY if category_id is None else category_id)
+        self.tenant_ids.append(tenant_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> Bill:
+        category_id = self.category_ids[index]
+        return Bill(
+            id=self.ids[index],
+            value=self.values[index],
+            date=datetime.date.fromordinal(self.date_ordinals[index]),
+            category_id=None if category_id == _NO_CATEGORY else category_id,
+            tenant_id=self.tenant_ids[index],
+        )
+
+    def __iter__(self) -> Iterator[Bill]:
+        return (self[index] for index in range(len(self)))
+
+    def total(self) -> float:
+        return sum(self.values)
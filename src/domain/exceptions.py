@@ -21,6 +21,10 @@ class TenantNotFoundException(ResourceNotFoundException):
     pass
 
 
+class TenantReadOnlyException(Exception):
+    pass
+
+
 class KeyNotFoundException(ResourceNotFoundException):
     pass
 
@@ -51,3 +55,18 @@ class PhoneNumberTakenException(RegistrationError):
 
 class CategoryAlreadyExistsException(Exception):
     pass
+
+
+class TaskRejectedException(Exception):
+    pass
+
+
+class TaskSupersededException(Exception):
+    pass
+
+
+class TaskRetryException(Exception):
+    def __init__(self, reason: str, payload: dict, delay_ms: int):
+        super().__init__(reason)
+        self.payload = payload
+        self.delay_ms = delay_ms
@@ -3,6 +3,7 @@ from collections.abc import Generator
 from typing import Protocol
 
 from domain.entities import Bill
+from domain.entities import BillBatch
 from domain.entities import Category
 from domain.entities import Message
 from domain.entities import MessageAuthor
@@ -20,6 +21,20 @@ class BillRepository(Protocol):
         date_range: tuple[datetime.date, datetime.date] | None = None,
         value_range: tuple[float, float] | None = None,
     ) -> Generator[Bill]: ...
+    def get_total(
+        self,
+        tenant_id: int,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> float: ...
+    def get_batch(
+        self,
+        tenant_id: int,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> BillBatch: ...
     def get_by_id(self, tenant_id: int, bill_id: int) -> Bill: ...
     def update(
         self,
@@ -1,11 +1,14 @@
+import datetime
 from collections.abc import AsyncIterator
 from collections.abc import Callable
+from collections.abc import Iterable
 from typing import Any
 from typing import Protocol
 
 
 class TemporaryStorageService(Protocol):
     def set(self, key: str, value: Any, expiration_seconds: int | None) -> bool: ...
+    def set_if_greater(self, key: str, value: int, expiration_seconds: int | None) -> bool: ...
     def get(self, key: str) -> Any: ...
     def delete(self, key: str) -> bool: ...
 
@@ -27,17 +30,28 @@ class AMQPService(Protocol):
         no_ack: bool = True,
         prefetch_count: int | None = None,
     ) -> None: ...
-    async def publish(self, message: dict, queue_name: str) -> None: ...
+    async def cancel_consumers(self) -> None: ...
+    async def publish(self, message: dict, queue_name: str, delay_ms: int = 0) -> None: ...
 
 
 class PubsubService(Protocol):
     async def subscribe(self, channel: str) -> None: ...
     async def publish(self, channel: str, event: str, data: dict) -> None: ...
+    async def publish_many(self, events: Iterable[tuple[str, str, dict]]) -> None: ...
     async def listen(self) -> AsyncIterator: ...
 
 
 class AsyncTaskDispatcherService(Protocol):
-    async def dispatch(self, task_name: str, **kwargs) -> None: ...
+    async def dispatch(
+        self,
+        task_name: str,
+        *,
+        queue: str | None = None,
+        eta: datetime.datetime | None = None,
+        countdown: float | None = None,
+        task_id: str | None = None,
+        **kwargs,
+    ) -> None: ...
 
 
 class WhatsappBrokerMessageService(Protocol):
@@ -0,0 +1,47 @@
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+
+from infrastructure.metrics import metrics
+
+blocking_calls_queued = metrics.gauge("worker_blocking_calls_queued", "Blocking calls waiting for a free thread")
+blocking_calls_running = metrics.gauge("worker_blocking_calls_running", "Blocking calls running on a thread")
+blocking_call_wait_seconds = metrics.histogram(
+    "worker_blocking_call_wait_seconds",
+    "Time blocking calls waited for a free thread",
+)
+blocking_call_duration_seconds = metrics.histogram(
+    "worker_blocking_call_duration_seconds",
+    "Time blocking calls ran on a thread",
+)
+
+
+class InstrumentedThreadPoolExecutor(ThreadPoolExecutor):
+    """Bounded pool for blocking calls that reports how long calls queue for a thread."""
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        submitted_at = time.perf_counter()
+        started = False
+        blocking_calls_queued.inc()
+
+        def run():
+            nonlocal started
+            started = True
+            started_at = time.perf_counter()
+            blocking_calls_queued.dec()
+            blocking_calls_running.inc()
+            blocking_call_wait_seconds.observe(started_at - submitted_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                blocking_calls_running.dec()
+                blocking_call_duration_seconds.observe(time.perf_counter() - started_at)
+
+        def on_done(future: Future):
+            if not started:
+                blocking_calls_queued.dec()
+
+        future = super().submit(run)
+        future.add_done_callback(on_done)
+        return future
@@ -19,23 +19,73 @@ class Settings(BaseSettings):
     database_dialect: str = "postgresql"
     database_driver: str = "psycopg"
     database_db: str = "billy"
-    test_database_uri: str | None
+    test_database_uri: str | None = None
+    # Tenants created before sharding live in the primary database and are put on shard 0, so the
+    # primary database has to be listed first. Run `shards.py backfill-directory` right before
+    # turning sharding on, or tenants and users created since the migration can't be found
+    database_shard_uris: list[str] = []
+    # How long a process caches where a tenant lives, moving a tenant waits for it to expire
+    database_shard_directory_cache_ttl_seconds: float = 5
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+
+    sqlite_database_path: str = "billy.db"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size_kib: int = 65536
 
     rabbitmq_user: str = "billy"
     rabbitmq_password: str = "billy"
     rabbitmq_host: str = "rabbitmq"
     rabbitmq_port: int = 5672
+    # Codec AMQP payloads are published with: json, orjson or msgpack. Consumers pick the codec from
+    # the content type, so every consumer of a queue, the WhatsApp client included, must support
+    # it before publishers switch. orjson and msgpack need billyai[amqp-codecs].
+    amqp_payload_codec: str = "json"
+    # Payloads of at least this many bytes are compressed with zstd, 0 turns compression off
+    amqp_payload_compress_min_bytes: int = 0
 
     redis_host: str = "redis"
     redis_port: int = 6379
+    # Pubsub events are buffered for up to this long and published in one pipeline, 0 publishes each right away
+    pubsub_flush_window_ms: float = 2
+    pubsub_max_batch_size: int = 100
+    # How long a task lock outlives a crashed worker, holders renew it while they run
+    task_lock_lease_seconds: float = 30
+    # How long completed task ids are kept to skip redelivered copies, longer than any redelivery takes
+    task_completion_ttl_seconds: int = 86400
 
     deepseek_api_key: str = ""
     user_validation_token_ttl_seconds: int = 86400
     user_pin_ttl_seconds: int = 86400
     user_token_ttl: int = 86400
+    user_message_history_ttl_seconds: int = 3600
+    # The agent answers once a user stops sending messages for this long, and restarts if they send another
+    agent_debounce_seconds: float = 3
+    agent_supersede_poll_seconds: float = 0.5
     async_task_routing_key: str = "async_tasks"
     whatsapp_message_routing_key: str = "whatsapp_message"
     async_task_prefetch_count: int = 5
+    # "amqp" delays tasks in per-delay TTL queues, "in_process" in a timer wheel in the publisher
+    async_task_delay_backend: str = "amqp"
+    async_task_delay_resolution_ms: int = 100
+    # Inline tasks a worker process runs at once for the tasks dispatching them, 0 publishes them all
+    async_task_inline_concurrency: int = 0
+    async_task_inline_max_countdown_seconds: float = 1
+    # Times DI factories for the di_* metrics, the resolution tree of every scope is logged at DEBUG
+    di_instrumentation: bool = False
+    # Threads the worker runs blocking port calls on, defaults to database_pool_size
+    worker_blocking_threads: int | None = None
+    # Worker processes run by `async.py`, more than one runs them under a supervisor
+    worker_processes: int = 1
+    worker_shutdown_timeout_seconds: float = 30
+    # How long a stopping worker lets running tasks finish before cancelling them, which requeues
+    # their messages. Keep it below worker_shutdown_timeout_seconds and the container's stop timeout.
+    worker_drain_timeout_seconds: float = 25
+    worker_metrics_push_interval_seconds: float = 5
+    # Prometheus metrics of the worker, or of all its processes under the supervisor, 0 turns them off
+    worker_metrics_host: str = "0.0.0.0"
+    worker_metrics_port: int = 9100
 
     @property
     def rabbitmq_uri(self):
@@ -43,6 +93,9 @@ class Settings(BaseSettings):
 
     @property
     def database_uri(self):
+        if not self.test_database_uri and self.database_dialect == "sqlite":
+            return f"sqlite:///{self.sqlite_database_path}"
+
         return self.test_database_uri or (
             f"postgresql+psycopg://{self.database_user}:{self.database_password}"
             f"@{self.database_host}:{self.database_port}/{self.database_db}?sslmode=disable"
@@ -1,14 +1,23 @@
+import collections
 import inspect
+import logging
+import time
 from collections.abc import Callable
+from collections.abc import Mapping
 from contextlib import asynccontextmanager
 from contextvars import ContextVar
+from types import MappingProxyType
 from typing import Any
 from typing import TypeVar
 
 import redis
+from openai import AsyncOpenAI
+from pydantic_ai.models import Model
 
+from application.services.authentication_service import AuthenticationService
 from application.services.bill_service import BillService
 from application.services.category_service import CategoryService
+from application.services.message_burst_service import MessageBurstService
 from application.services.registration_service import RegistrationService
 from domain.ports.repositories import BillRepository
 from domain.ports.repositories import CategoryRepository
@@ -20,8 +29,10 @@ from domain.ports.services import AMQPService
 from domain.ports.services import AsyncTaskDispatcherService
 from domain.ports.services import PubsubService
 from domain.ports.services import TemporaryStorageService
+from domain.ports.services import UserEncodingService
 from domain.ports.services import WhatsappBrokerMessageService
 from infrastructure.config.settings import app_settings
+from infrastructure.metrics import metrics
 from infrastructure.persistence.database import SessionLocal
 from infrastructure.persistence.database.repositories.bill_repository import DBBillRepository
 from infrastructure.persistence.database.repositories.category_repository import DBCategoryRepository
@@ -31,47 +42,87 @@ from infrastructure.persistence.database.repositories.user_repository import DBU
 from infrastructure.services.aio_pika_amqp_service import AioPikaAMQPService
 from infrastructure.services.aio_pika_amqp_service import AioPikaPoolService
 from infrastructure.services.amqp_async_task_dispatcher import AMQPAsyncTaskDispatcherService
+from infrastructure.services.amqp_codecs import PayloadCodec
 from infrastructure.services.amqp_whatsapp_broker_message_service import AMQPWhatsappBrokerMessageService
+from infrastructure.services.jwt_encoding_service import JWTUserEncodingService
 from infrastructure.services.pydanticai_agent_service import PydanticAIAgentService
+from infrastructure.services.pydanticai_agent_service import create_llm_client
+from infrastructure.services.pydanticai_agent_service import create_llm_model
+from infrastructure.services.redis_completed_tasks import RedisCompletedTasks
+from infrastructure.services.redis_keyed_lock import RedisKeyedLock
+from infrastructure.services.redis_pubsub_service import RedisPublishBatcher
 from infrastructure.services.redis_pubsub_service import RedisPubsubService
 from infrastructure.services.redis_pubsub_service import async_redis_pool
 from infrastructure.services.redis_temporary_storage_service import RedisTemporaryStorageService
 from infrastructure.services.redis_temporary_storage_service import redis_pool
+from infrastructure.services.timer_wheel import TimerWheel
 
 T = TypeVar("T")
 
 _current_registry_container: ContextVar["DIContainer | None"] = ContextVar("current_registry", default=None)
-_singletons: dict[type, Any] = {}
+# (interface, factory, dependencies, is_singleton) in the order the interfaces have to be built
+PlanStep = tuple[type, Callable, tuple[type, ...], bool]
+
+logger = logging.getLogger(__name__)
+
+di_construction_seconds = metrics.histogram(
+    "di_construction_seconds",
+    "Time spent in a DI factory building one instance, by type",
+)
+di_resolutions_total = metrics.counter(
+    "di_resolutions_total",
+    "DI resolutions by type and result, hit when the instance already existed in the scope",
+)
+
+
+async def _close(instance: Any) -> None:
+    for method_name in ("aclose", "close"):
+        close_method = getattr(instance, method_name, None)
+        if close_method is not None:
+            result = close_method()
+            if inspect.iscoroutine(result):
+                await result
+            return
 
 
 class DIContainer:
-    def __init__(
-        self,
-        factories: dict[type, Callable],
-        dependencies: dict[type, list[type]],
-    ):
-        self._factories = factories
-        self._dependencies = dependencies
+    def __init__(self, plans: Mapping[type, tuple[PlanStep, ...]], singletons: Mapping[type, Any]):
+        self._plans = plans
+        self._singletons = singletons
         self._instances: dict[type, Any] = {}
 
     async def get(self, cls: type[T]) -> T:
-        if cls in _singletons:
-            return _singletons[cls]
+        if cls in self._singletons:
+            return self._singletons[cls]
 
         if cls in self._instances:
             return self._instances[cls]
 
-        if cls not in self._factories:
+        plan = self._plans.get(cls)
+        if plan is None:
             raise ValueError(f"No factory registered for '{cls.__name__}'")
 
-        deps = [await self.get(dep_cls) for dep_cls in self._dependencies[cls]]
+        # Steps are in dependency order, so every dependency is built before it is needed
+        singletons = self._singletons
+        instances = self._instances
+        for interface, factory, dependencies, is_singleton in plan:
+            if interface in instances or interface in singletons:
+                continue
+
+            if is_singleton:
+                raise RuntimeError(f"Singleton '{interface.__name__}' is not started. Call 'registry.start()' first.")
 
-        result = self._factories[cls](*deps)
+            instances[interface] = await self._build(interface, factory, dependencies)
 
+        return instances[cls]
+
+    async def _build(self, interface: type, factory: Callable, dependencies: tuple[type, ...]) -> Any:
+        singletons = self._singletons
+        instances = self._instances
+        result = factory(*[singletons[dep] if dep in singletons else instances[dep] for dep in dependencies])
         if inspect.iscoroutine(result):
             result = await result
 
-        self._instances[cls] = result
         return result
 
     def commit(self):
@@ -90,11 +141,88 @@ class DIContainer:
         self._instances.clear()
 
 
+class InstrumentedDIContainer(DIContainer):
+    """DIContainer that times every factory and logs the resolution tree at DEBUG when the scope closes."""
+
+    def __init__(self, plans: Mapping[type, tuple[PlanStep, ...]], singletons: Mapping[type, Any]):
+        super().__init__(plans, singletons)
+        self.build_seconds: dict[type, float] = {}
+        self.hits: collections.Counter[type] = collections.Counter()
+        self._roots: list[type] = []
+
+    def _record_hit(self, cls: type) -> None:
+        self.hits[cls] += 1
+        di_resolutions_total.inc(type=cls.__name__, result="hit")
+
+    async def get(self, cls: type[T]) -> T:
+        self._roots.append(cls)
+        if cls in self._singletons or cls in self._instances:
+            self._record_hit(cls)
+        else:
+            # The steps built by earlier calls are reused, the others go through _build
+            for interface, _, _, _ in self._plans.get(cls, ()):
+                if interface in self._instances or interface in self._singletons:
+                    self._record_hit(interface)
+
+        return await super().get(cls)
+
+    async def _build(self, interface: type, factory: Callable, dependencies: tuple[type, ...]) -> Any:
+        started_at = time.perf_counter()
+        result = await super()._build(interface, factory, dependencies)
+        elapsed = time.perf_counter() - started_at
+
+        self.build_seconds[interface] = elapsed
+        di_resolutions_total.inc(type=interface.__name__, result="build")
+        di_construction_seconds.observe(elapsed, type=interface.__name__)
+        return result
+
+    def resolution_tree(self) -> str:
+        lines = []
+        dependencies_of = {}
+        for root in self._roots:
+            for interface, _, dependencies, _ in self._plans.get(root, ()):
+                dependencies_of[interface] = dependencies
+
+        def visit(cls: type, depth: int, seen: set[type]) -> None:
+            if cls in self.build_seconds:
+                status = f"built in {self.build_seconds[cls] * 1000:.3f}ms"
+            elif cls in self._singletons:
+                status = "singleton"
+            else:
+                status = "cached"
+            lines.append(f"{'  ' * depth}{cls.__name__} {status}")
+
+            # Shared dependencies are expanded only the first time they show up
+            if cls in seen:
+                return
+            seen.add(cls)
+            for dependency in dependencies_of.get(cls, ()):
+                visit(dependency, depth + 1, seen)
+
+        seen = set()
+        for root in dict.fromkeys(self._roots):
+            visit(root, 0, seen)
+
+        return "\n".join(lines)
+
+    async def close(self):
+        if self._roots and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"DI scope built {len(self.build_seconds)} objects in {sum(self.build_seconds.values()) * 1000:.3f}ms "
+                f"({sum(self.hits.values())} cache hits):\n{self.resolution_tree()}",
+            )
+        await super().close()
+
+
 class DIRegistry:
-    def __init__(self):
+    def __init__(self, instrumented: bool = False):
+        self._instrumented = instrumented
         self._factories: dict[type, Callable] = {}
-        self._dependencies: dict[type, list[type]] = {}
-        self._instances: dict[type, Any] = {}
+        self._dependencies: dict[type, tuple[type, ...]] = {}
+        self._plans: Mapping[type, tuple[PlanStep, ...]] = MappingProxyType({})
+        # Singleton interfaces in registration order, with the callable used to dispose of them
+        self._singleton_shutdowns: dict[type, Callable | None] = {}
+        self._singletons: dict[type, Any] = {}
 
     def register(
         self,
@@ -102,20 +230,113 @@ class DIRegistry:
         factory: Callable,
         dependencies: list[type] | None = None,
         is_singleton: bool = False,
+        shutdown: Callable | None = None,
     ) -> None:
+        """Registers how to build `interface`.
+
+        Singletons are built once by `start()`, shared by every scope and disposed of by
+        `shutdown()`, using `shutdown(instance)` if given or else the instance's `aclose()`/`close()`.
+        """
+        previous = (
+            self._factories.get(interface),
+            self._dependencies.get(interface),
+            self._singleton_shutdowns.get(interface, ...),
+        )
         self._factories[interface] = factory
-        self._dependencies[interface] = dependencies or []
-
+        self._dependencies[interface] = tuple(dependencies or ())
+        self._singleton_shutdowns.pop(interface, None)
         if is_singleton:
-            temp_container = self.create_container()
-            singleton = temp_container.get(interface)
-            _singletons[interface] = singleton
+            self._singleton_shutdowns[interface] = shutdown
+
+        try:
+            self._plans = MappingProxyType(self._compile_plans())
+        except ValueError:
+            factory, dependencies, singleton_shutdown = previous
+            if factory is None:
+                del self._factories[interface], self._dependencies[interface]
+            else:
+                self._factories[interface], self._dependencies[interface] = factory, dependencies
+            self._singleton_shutdowns.pop(interface, None)
+            if singleton_shutdown is not ...:
+                self._singleton_shutdowns[interface] = singleton_shutdown
+            raise
+
+    def _compile_plan(self, interface: type) -> tuple[PlanStep, ...] | None:
+        steps: list[PlanStep] = []
+        visited: set[type] = set()
+
+        def visit(cls: type, path: tuple[type, ...]) -> bool:
+            if cls in visited:
+                return True
+
+            if cls in path:
+                raise ValueError(f"Circular dependency detected for '{cls.__name__}'")
+
+            if cls not in self._factories:
+                return False
+
+            is_singleton = cls in self._singleton_shutdowns
+            for dependency in self._dependencies[cls]:
+                if is_singleton and dependency in self._factories and dependency not in self._singleton_shutdowns:
+                    raise ValueError(f"Singleton '{cls.__name__}' can't depend on scoped '{dependency.__name__}'")
+
+                if not visit(dependency, (*path, cls)):
+                    return False
+
+            visited.add(cls)
+            steps.append((cls, self._factories[cls], self._dependencies[cls], is_singleton))
+            return True
+
+        return tuple(steps) if visit(interface, ()) else None
+
+    def _compile_plans(self) -> dict[type, tuple[PlanStep, ...]]:
+        # Plans are rebuilt on every registration, which only happens at startup, so resolving
+        # a type in a scope is a flat loop over its dependency graph. Types whose dependencies
+        # are not registered yet get no plan until they are.
+        plans = {}
+        for interface in self._factories:
+            plan = self._compile_plan(interface)
+            if plan is not None:
+                plans[interface] = plan
+
+        return plans
+
+    async def start(self) -> None:
+        # Singletons only depend on other singletons, so their plans can be run once here
+        for interface in self._singleton_shutdowns:
+            plan = self._plans.get(interface)
+            if plan is None:
+                raise ValueError(f"Missing dependencies for singleton '{interface.__name__}'")
+
+            for step_interface, factory, dependencies, _ in plan:
+                if step_interface in self._singletons:
+                    continue
+
+                result = factory(*[self._singletons[dep] for dep in dependencies])
+                if inspect.iscoroutine(result):
+                    result = await result
+
+                self._singletons[step_interface] = result
+
+    async def shutdown(self) -> None:
+        # Singletons are inserted after their dependencies, so reversed order disposes dependents first
+        for interface in reversed(list(self._singletons)):
+            instance = self._singletons.pop(interface)
+            if instance is None:
+                continue
+
+            try:
+                shutdown = self._singleton_shutdowns.get(interface)
+                result = shutdown(instance) if shutdown is not None else _close(instance)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception(f"Error shutting down singleton '{interface.__name__}'")
 
     def create_container(self) -> DIContainer:
-        return DIContainer(
-            factories=self._factories.copy(),
-            dependencies=self._dependencies.copy(),
-        )
+        # Plans and singletons are shared by every scope
+        container_cls = InstrumentedDIContainer if self._instrumented else DIContainer
+        return container_cls(self._plans, self._singletons)
 
     @asynccontextmanager
     async def scope(self):
@@ -140,60 +361,89 @@ async def resolve(cls: type[T]) -> T:
     return await get_current_container().get(cls)
 
 
-global_registry = DIRegistry()
+global_registry = DIRegistry(instrumented=app_settings.di_instrumentation)
 
 
-async def setup_global_registry() -> None:
-    global_registry.register(SessionLocal, factory=SessionLocal)
+def register_dependencies(registry: DIRegistry) -> None:
+    registry.register(SessionLocal, factory=SessionLocal)
 
-    global_registry.register(
+    registry.register(
         UserRepository,
         factory=lambda db_session: DBUserRepository(db_session),
         dependencies=[SessionLocal],
     )
 
-    global_registry.register(
+    registry.register(
         BillRepository,
         factory=lambda db_session: DBBillRepository(db_session),
         dependencies=[SessionLocal],
     )
 
-    global_registry.register(
+    registry.register(
         CategoryRepository,
         factory=lambda db_session: DBCategoryRepository(db_session),
         dependencies=[SessionLocal],
     )
 
-    global_registry.register(
+    registry.register(
         CategoryService,
         factory=lambda category_repository: CategoryService(category_repository),
         dependencies=[CategoryRepository],
     )
 
-    global_registry.register(
+    registry.register(
         BillService,
         factory=lambda bill_repository, category_repository: BillService(bill_repository, category_repository),
         dependencies=[BillRepository, CategoryRepository],
     )
 
-    global_registry.register(
+    registry.register(
         MessageRepository,
         factory=lambda db_session: DBMessageRepository(db_session),
         dependencies=[SessionLocal],
     )
 
-    global_registry.register(
+    registry.register(
         TenantRepository,
         factory=lambda db_session: DBTenantRepository(db_session),
         dependencies=[SessionLocal],
     )
 
-    global_registry.register(
+    registry.register(
+        redis.Redis,
+        factory=lambda: redis.Redis(connection_pool=redis_pool),
+        is_singleton=True,
+        shutdown=lambda client: client.connection_pool.disconnect(),
+    )
+
+    registry.register(
+        redis.asyncio.Redis,
+        factory=lambda: redis.asyncio.Redis(connection_pool=async_redis_pool),
+        is_singleton=True,
+        shutdown=lambda client: client.aclose(close_connection_pool=True),
+    )
+
+    registry.register(
         TemporaryStorageService,
-        factory=lambda: RedisTemporaryStorageService(redis.Redis(connection_pool=redis_pool)),
+        factory=lambda redis_client: RedisTemporaryStorageService(redis_client),
+        dependencies=[redis.Redis],
     )
 
-    global_registry.register(
+    registry.register(UserEncodingService, factory=JWTUserEncodingService)
+
+    registry.register(
+        AuthenticationService,
+        factory=lambda user_repository, temporary_storage_service, user_encoding_service: AuthenticationService(
+            user_repository,
+            temporary_storage_service,
+            user_encoding_service,
+            app_settings.user_pin_ttl_seconds,
+            app_settings.user_token_ttl,
+        ),
+        dependencies=[UserRepository, TemporaryStorageService, UserEncodingService],
+    )
+
+    registry.register(
         RegistrationService,
         factory=lambda user_repository,
         tenant_repository,
@@ -203,24 +453,47 @@ async def setup_global_registry() -> None:
             tenant_repository,
             category_repository,
             temporary_storage_service,
-            user_validation_token_ttl_seconds=3600,
+            user_validation_token_ttl_seconds=app_settings.user_validation_token_ttl_seconds,
         ),
         dependencies=[UserRepository, TenantRepository, CategoryRepository, TemporaryStorageService],
     )
 
-    global_registry.register(
+    registry.register(AsyncOpenAI, factory=create_llm_client, is_singleton=True)
+
+    registry.register(
+        Model,
+        factory=create_llm_model,
+        dependencies=[AsyncOpenAI],
+        is_singleton=True,
+    )
+
+    registry.register(
+        MessageBurstService,
+        factory=lambda message_repository, temporary_storage_service: MessageBurstService(
+            message_repository,
+            temporary_storage_service,
+            debounce_seconds=app_settings.agent_debounce_seconds,
+            poll_seconds=app_settings.agent_supersede_poll_seconds,
+            latest_message_ttl_seconds=app_settings.user_message_history_ttl_seconds,
+        ),
+        dependencies=[MessageRepository, TemporaryStorageService],
+    )
+
+    registry.register(
         AIAgentService,
         factory=lambda registration_service,
         temp_storage_service,
         message_repository,
         bill_service,
-        category_service: PydanticAIAgentService(
+        category_service,
+        llm_model: PydanticAIAgentService(
             registration_service,
             temp_storage_service,
             message_repository,
             bill_service,
             category_service,
-            3600,
+            app_settings.user_message_history_ttl_seconds,
+            llm_model,
         ),
         dependencies=[
             RegistrationService,
@@ -228,6 +501,7 @@ async def setup_global_registry() -> None:
             MessageRepository,
             BillService,
             CategoryService,
+            Model,
         ],
     )
 
@@ -235,37 +509,105 @@ async def setup_global_registry() -> None:
         if app_settings.environment != "testing":
             return app_settings.rabbitmq_uri
 
-    def get_aio_pika_pool_service():
+    registry.register(
+        PayloadCodec,
+        factory=lambda: PayloadCodec(app_settings.amqp_payload_codec, app_settings.amqp_payload_compress_min_bytes),
+        is_singleton=True,
+    )
+
+    def get_aio_pika_pool_service(payload_codec: PayloadCodec):
         if app_settings.environment != "testing":
-            return AioPikaPoolService(get_broker_url())
+            return AioPikaPoolService(get_broker_url(), payload_codec)
 
-    global_registry.register(
+    registry.register(
         AioPikaPoolService,
         factory=get_aio_pika_pool_service,
+        dependencies=[PayloadCodec],
+        is_singleton=True,
     )
 
-    async def get_amqp_service(amqp_pool_service: AioPikaPoolService):
-        return AioPikaAMQPService(await amqp_pool_service.get_channel())
+    async def get_amqp_service(amqp_pool_service: AioPikaPoolService, payload_codec: PayloadCodec):
+        return AioPikaAMQPService(await amqp_pool_service.get_channel(), payload_codec)
 
-    global_registry.register(
+    registry.register(
         AMQPService,
         factory=get_amqp_service,
-        dependencies=[AioPikaPoolService],
+        dependencies=[AioPikaPoolService, PayloadCodec],
     )
 
-    global_registry.register(
-        PubsubService,
-        factory=lambda: RedisPubsubService(client=redis.asyncio.Redis(connection_pool=async_redis_pool)),
+    registry.register(
+        RedisKeyedLock,
+        factory=lambda redis_client: RedisKeyedLock(redis_client, lease_seconds=app_settings.task_lock_lease_seconds),
+        dependencies=[redis.asyncio.Redis],
+        is_singleton=True,
     )
 
-    global_registry.register(
-        AsyncTaskDispatcherService,
-        factory=lambda amqp_service: AMQPAsyncTaskDispatcherService(amqp_service=amqp_service),
-        dependencies=[AMQPService],
+    registry.register(
+        RedisCompletedTasks,
+        factory=lambda redis_client: RedisCompletedTasks(redis_client, app_settings.task_completion_ttl_seconds),
+        dependencies=[redis.asyncio.Redis],
+        is_singleton=True,
     )
 
-    global_registry.register(
+    if app_settings.pubsub_flush_window_ms > 0:
+        # Registered after the client, so pending events are flushed before it closes
+        registry.register(
+            RedisPublishBatcher,
+            factory=lambda redis_client: RedisPublishBatcher(
+                redis_client,
+                flush_window_seconds=app_settings.pubsub_flush_window_ms / 1000,
+                max_batch_size=app_settings.pubsub_max_batch_size,
+            ),
+            dependencies=[redis.asyncio.Redis],
+            is_singleton=True,
+            shutdown=RedisPublishBatcher.close,
+        )
+
+        registry.register(
+            PubsubService,
+            factory=lambda redis_client, batcher: RedisPubsubService(client=redis_client, batcher=batcher),
+            dependencies=[redis.asyncio.Redis, RedisPublishBatcher],
+        )
+    else:
+        registry.register(
+            PubsubService,
+            factory=lambda redis_client: RedisPubsubService(client=redis_client),
+            dependencies=[redis.asyncio.Redis],
+        )
+
+    if app_settings.async_task_delay_backend == "in_process":
+
+        def create_timer_wheel() -> TimerWheel:
+            timer_wheel = TimerWheel()
+            timer_wheel.start()
+            return timer_wheel
+
+        # Registered after the pool, so it is stopped, and its pending timers published, before the pool closes
+        registry.register(TimerWheel, factory=create_timer_wheel, is_singleton=True, shutdown=TimerWheel.stop)
+
+        registry.register(
+            AsyncTaskDispatcherService,
+            factory=lambda amqp_service, timer_wheel, amqp_pool_service: AMQPAsyncTaskDispatcherService(
+                amqp_service=amqp_service,
+                timer_wheel=timer_wheel,
+                amqp_pool_service=amqp_pool_service,
+            ),
+            dependencies=[AMQPService, TimerWheel, AioPikaPoolService],
+        )
+    else:
+        registry.register(
+            AsyncTaskDispatcherService,
+            factory=lambda amqp_service: AMQPAsyncTaskDispatcherService(amqp_service=amqp_service),
+            dependencies=[AMQPService],
+        )
+
+    registry.register(
         WhatsappBrokerMessageService,
         factory=lambda amqp_service: AMQPWhatsappBrokerMessageService(amqp_service=amqp_service),
         dependencies=[AMQPService],
     )
+
+
+async def setup_global_registry() -> None:
+    register_dependencies(global_registry)
+    await global_registry.start()
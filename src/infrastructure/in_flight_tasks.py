@@ -0,0 +1,44 @@
+import asyncio
+import functools
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Any
+
+
+class InFlightTasks:
+    """Keeps track of the running calls of a consumer callback, so shutdown can wait for them."""
+
+    def __init__(self):
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def track(self, callback: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        @functools.wraps(callback)
+        async def tracked(*args, **kwargs) -> Any:
+            task = asyncio.current_task()
+            self._tasks.add(task)
+            try:
+                return await callback(*args, **kwargs)
+            finally:
+                self._tasks.discard(task)
+
+        return tracked
+
+    async def drain(self, timeout_seconds: float) -> int:
+        """Waits for the running calls, cancelling those still running after the timeout.
+
+        Returns how many were cancelled.
+        """
+        if not self._tasks:
+            return 0
+
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout_seconds)
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Lets them unwind, so their messages are rejected back to the queue
+            await asyncio.wait(pending)
+
+        return len(pending)
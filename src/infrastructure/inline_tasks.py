@@ -0,0 +1,25 @@
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+
+
+@dataclass(slots=True)
+class InlineTaskBatch:
+    """Follow-up tasks dispatched by a worker task, to run in process once its scope commits."""
+
+    accepts: Callable[[str, int], bool]
+    # Task name, kwargs and task id of each deferred task
+    tasks: list[tuple[str, dict[str, Any], str | None]] = field(default_factory=list)
+
+    def defer(self, task_name: str, delay_ms: int, kwargs: dict[str, Any], task_id: str | None = None) -> bool:
+        if not self.accepts(task_name, delay_ms):
+            return False
+
+        self.tasks.append((task_name, kwargs, task_id))
+        return True
+
+
+# Set by the worker while a task runs, dispatchers check it before publishing
+current_inline_batch: ContextVar[InlineTaskBatch | None] = ContextVar("current_inline_batch", default=None)
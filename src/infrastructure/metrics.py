@@ -0,0 +1,200 @@
+import bisect
+import threading
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+LabelValues = tuple[tuple[str, str], ...]
+MetricsSnapshot = dict[str, dict[str, Any]]
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_values(labels: dict[str, str]) -> LabelValues:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: defaultdict[LabelValues, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_values(labels)] += value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(_label_values(labels), 0)
+
+    def samples(self) -> dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: defaultdict[LabelValues, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_values(labels)] = value
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_values(labels)] += value
+
+    def dec(self, value: float = 1, **labels: str) -> None:
+        self.inc(-value, **labels)
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(_label_values(labels), 0)
+
+    def samples(self) -> dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # Per label set: (non-cumulative bucket counts with a trailing +Inf bucket, count, sum)
+        self._values: dict[LabelValues, tuple[list[int], int, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_values(labels)
+        with self._lock:
+            bucket_counts, count, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0, 0.0)
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (bucket_counts, count + 1, total + value)
+
+    def get_count(self, **labels: str) -> int:
+        value = self._values.get(_label_values(labels))
+        return value[1] if value else 0
+
+    def get_sum(self, **labels: str) -> float:
+        value = self._values.get(_label_values(labels))
+        return value[2] if value else 0.0
+
+    def samples(self) -> dict[LabelValues, tuple[list[int], int, float]]:
+        with self._lock:
+            return {key: (list(buckets), count, total) for key, (buckets, count, total) in self._values.items()}
+
+
+class MetricsRegistry:
+    """In-process metrics, shared by everything running in the process."""
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as {type(metric).__name__}")
+
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets)
+
+    def collect(self) -> list[Counter | Gauge | Histogram]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> MetricsSnapshot:
+        # Plain picklable data, so worker processes can ship their metrics to the supervisor
+        return {
+            metric.name: {
+                "kind": metric.kind,
+                "description": metric.description,
+                "buckets": getattr(metric, "buckets", None),
+                "samples": metric.samples(),
+            }
+            for metric in self.collect()
+        }
+
+
+def merge_snapshots(snapshots: Iterable[MetricsSnapshot], include_gauges: bool = True) -> MetricsSnapshot:
+    """Adds up samples with the same name and labels across snapshots, e.g. from several processes."""
+    merged: MetricsSnapshot = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if metric["kind"] == "gauge" and not include_gauges:
+                continue
+
+            samples = merged.setdefault(name, {**metric, "samples": {}})["samples"]
+            for labels, value in metric["samples"].items():
+                current = samples.get(labels)
+                if metric["kind"] != "histogram":
+                    samples[labels] = value if current is None else current + value
+                elif current is None:
+                    samples[labels] = (list(value[0]), value[1], value[2])
+                else:
+                    buckets = [a + b for a, b in zip(current[0], value[0], strict=True)]
+                    samples[labels] = (buckets, current[1] + value[1], current[2] + value[2])
+
+    return merged
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label_value(value: str) -> str:
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _format_labels(labels: LabelValues, *extra: tuple[str, str]) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def render_prometheus(snapshot: MetricsSnapshot) -> str:
+    """Renders a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {_escape_help(metric['description'])}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+
+            bucket_counts, count, total = value
+            cumulative = 0
+            for bound, bucket_count in zip((*metric["buckets"], "+Inf"), bucket_counts, strict=True):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', str(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -1,13 +1,63 @@
 from contextlib import contextmanager
 
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.engine import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from infrastructure.config.settings import app_settings
 
-engine = create_engine(app_settings.database_uri)
+
+def create_database_engine(uri: str) -> Engine:
+    if not uri.startswith("sqlite"):
+        return create_engine(
+            uri,
+            pool_size=app_settings.database_pool_size,
+            max_overflow=app_settings.database_max_overflow,
+        )
+
+    # Single node mode: every thread of the API threadpool and the worker gets its own
+    # pooled connection, WAL lets readers run while a writer holds the lock and
+    # busy_timeout makes concurrent writers wait instead of failing.
+    engine = create_engine(
+        uri,
+        connect_args={"check_same_thread": False, "timeout": app_settings.sqlite_busy_timeout_ms / 1000},
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA busy_timeout={app_settings.sqlite_busy_timeout_ms}")
+        cursor.execute(f"PRAGMA mmap_size={app_settings.sqlite_mmap_size}")
+        cursor.execute(f"PRAGMA cache_size=-{app_settings.sqlite_cache_size_kib}")
+        cursor.close()
+
+    return engine
+
+
+engine = create_database_engine(app_settings.database_uri)
 SessionLocal: type[sa.orm.Session] = sessionmaker(engine)
+shard_directory = None
+shard_engines = {}
+
+if app_settings.database_shard_uris:
+    from infrastructure.persistence.database.sharding import ShardDirectory
+    from infrastructure.persistence.database.sharding import create_sharded_sessionmaker
+
+    shard_engines = {
+        str(shard_id): create_database_engine(uri) for shard_id, uri in enumerate(app_settings.database_shard_uris)
+    }
+    shard_directory = ShardDirectory(
+        sessionmaker(engine),
+        shard_engines,
+        app_settings.database_shard_directory_cache_ttl_seconds,
+    )
+    SessionLocal = create_sharded_sessionmaker(shard_directory, shard_engines)
 
 
 @contextmanager
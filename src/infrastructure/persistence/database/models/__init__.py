@@ -8,6 +8,7 @@ from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import UniqueConstraint
+from sqlalchemy import false
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import mapped_column
@@ -21,7 +22,7 @@ from domain.entities import MessageBroker
 from domain.entities import Tenant
 from domain.entities import User
 
-__all__ = ["DBBill", "DBCategory", "DBTenant", "DBUser"]
+__all__ = ["DBBill", "DBCategory", "DBPhoneNumberDirectory", "DBTenant", "DBTenantShard", "DBUser"]
 
 Base = declarative_base()
 
@@ -124,3 +125,19 @@ class DBMessage(Base, TenantMixin):
             user_id=self.user_id,
             tenant_id=self.tenant_id,
         )
+
+
+class DBTenantShard(Base):
+    __tablename__ = "tenant_shard"
+
+    tenant_id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    shard_id = Column(String, nullable=False, index=True)
+    # Set while the tenant is being moved to another shard, writes are refused until it's cleared
+    read_only = Column(Boolean, nullable=False, default=False, server_default=false())
+
+
+class DBPhoneNumberDirectory(Base):
+    __tablename__ = "phone_number_directory"
+
+    phone_number = Column(String, primary_key=True, nullable=False)
+    tenant_id = Column(Integer, nullable=False, index=True)
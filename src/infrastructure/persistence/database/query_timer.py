@@ -0,0 +1,36 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryTimer:
+    """Adds up the time spent running queries, from any thread running in its context."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.seconds += seconds
+
+
+# Set by the worker while a task runs, asyncio.to_thread copies it to the thread running the query
+current_query_timer: ContextVar[QueryTimer | None] = ContextVar("current_query_timer", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_query_timer.get() is not None:
+        context._query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, "_query_started_at", None)
+    query_timer = current_query_timer.get()
+    if started_at is not None and query_timer is not None:
+        query_timer.add(time.perf_counter() - started_at)
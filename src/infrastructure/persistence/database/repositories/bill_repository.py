@@ -1,7 +1,11 @@
 import datetime
 from collections.abc import Generator
 
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+
 from domain.entities import Bill
+from domain.entities import BillBatch
 from domain.exceptions import BillNotFoundException
 from domain.exceptions import CategoryNotFoundException
 from domain.exceptions import FutureBillDateException
@@ -46,26 +50,76 @@ class DBBillRepository(DBRepository):
 
         return db_bill.to_entity()
 
-    def get_many(
+    def _filter(
         self,
+        query: Query,
         tenant_id: int,
         date_range: tuple[datetime.date, datetime.date] | None = None,
         category_id: int | None = None,
         value_range: tuple[float, float] | None = None,
-    ) -> Generator[Bill]:
-        query = self.session.query(DBBill).filter_by(tenant_id=tenant_id)
+    ) -> Query:
+        query = query.filter(DBBill.tenant_id == tenant_id)
 
         if date_range is not None:
             query = query.filter(DBBill.date.between(*date_range))
 
         if category_id is not None:
-            query = query.filter_by(category_id=category_id)
+            query = query.filter(DBBill.category_id == category_id)
 
         if value_range:
             query = query.filter(DBBill.value.between(*value_range))
 
+        return query
+
+    def get_many(
+        self,
+        tenant_id: int,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> Generator[Bill]:
+        query = self._filter(self.session.query(DBBill), tenant_id, date_range, category_id, value_range)
+
         return (db_bill.to_entity() for db_bill in query)
 
+    def get_total(
+        self,
+        tenant_id: int,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> float:
+        query = self._filter(
+            self.session.query(func.coalesce(func.sum(DBBill.value), 0.0)),
+            tenant_id,
+            date_range,
+            category_id,
+            value_range,
+        )
+
+        return float(query.scalar())
+
+    def get_batch(
+        self,
+        tenant_id: int,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> BillBatch:
+        query = self._filter(
+            self.session.query(DBBill.id, DBBill.value, DBBill.date, DBBill.category_id, DBBill.tenant_id),
+            tenant_id,
+            date_range,
+            category_id,
+            value_range,
+        )
+
+        batch = BillBatch()
+        for row in query:
+            batch.append(*row)
+
+        return batch
+
     def get_by_id(self, tenant_id: int, bill_id: int) -> Bill:
         db_bill = self.session.query(DBBill).filter_by(tenant_id=tenant_id, id=bill_id).first()
 
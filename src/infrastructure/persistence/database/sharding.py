@@ -0,0 +1,374 @@
+import time
+from collections.abc import Iterable
+
+from sqlalchemy import Engine
+from sqlalchemy import delete
+from sqlalchemy import event
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import ORMExecuteState
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.sql import visitors
+
+from domain.exceptions import PhoneNumberTakenException
+from domain.exceptions import TenantNotFoundException
+from domain.exceptions import TenantReadOnlyException
+from infrastructure.persistence.database.models import Base
+from infrastructure.persistence.database.models import DBPhoneNumberDirectory
+from infrastructure.persistence.database.models import DBTenant
+from infrastructure.persistence.database.models import DBTenantShard
+from infrastructure.persistence.database.models import DBUser
+
+DIRECTORY_TABLES = {DBTenantShard.__table__, DBPhoneNumberDirectory.__table__}
+SHARDED_TABLES = [table for table in Base.metadata.sorted_tables if table not in DIRECTORY_TABLES]
+SEQUENCE_TABLES = [table for table in SHARDED_TABLES if table is not DBTenant.__table__]
+
+
+class ShardDirectory:
+    """Directory-based shard map kept in the primary database.
+
+    Tenant ids are allocated here so they are unique across shards, and every
+    phone number is registered globally so user lookups can be routed. Lookups
+    are cached for `cache_ttl_seconds`, so other processes pick up a move or a
+    write fence within that time.
+    """
+
+    def __init__(
+        self,
+        directory_session_factory: sessionmaker,
+        shard_ids: Iterable[str],
+        cache_ttl_seconds: float = 5,
+    ):
+        self._session_factory = directory_session_factory
+        self._shard_ids = list(shard_ids)
+        self.cache_ttl_seconds = cache_ttl_seconds
+        # tenant_id -> (shard_id, read_only, cached until)
+        self._tenant_shards: dict[int, tuple[str, bool, float]] = {}
+
+    @property
+    def shard_ids(self) -> list[str]:
+        return self._shard_ids
+
+    def _get_tenant_shard(self, tenant_id: int) -> tuple[str, bool]:
+        cached = self._tenant_shards.get(tenant_id)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached[0], cached[1]
+
+        with self._session_factory() as session:
+            row = session.execute(
+                select(DBTenantShard.shard_id, DBTenantShard.read_only).filter_by(tenant_id=tenant_id),
+            ).first()
+
+        if row is None:
+            raise TenantNotFoundException
+
+        self._cache(tenant_id, row.shard_id, row.read_only)
+        return row.shard_id, row.read_only
+
+    def _cache(self, tenant_id: int, shard_id: str, read_only: bool) -> None:
+        self._tenant_shards[tenant_id] = (shard_id, read_only, time.monotonic() + self.cache_ttl_seconds)
+
+    def get_shard_id(self, tenant_id: int) -> str:
+        return self._get_tenant_shard(tenant_id)[0]
+
+    def check_writable(self, tenant_id: int) -> None:
+        if self._get_tenant_shard(tenant_id)[1]:
+            raise TenantReadOnlyException(f"Tenant {tenant_id} is being moved to another shard")
+
+    def get_least_loaded_shard_id(self) -> str:
+        with self._session_factory() as session:
+            counts = dict(
+                session.execute(
+                    select(DBTenantShard.shard_id, func.count()).group_by(DBTenantShard.shard_id),
+                ).all(),
+            )
+
+        return min(self._shard_ids, key=lambda shard_id: counts.get(shard_id, 0))
+
+    def assign_tenant(self) -> int:
+        shard_id = self.get_least_loaded_shard_id()
+
+        with self._session_factory.begin() as session:
+            tenant_shard = DBTenantShard(shard_id=shard_id)
+            session.add(tenant_shard)
+            session.flush()
+            tenant_id = tenant_shard.tenant_id
+
+        self._cache(tenant_id, shard_id, False)
+        return tenant_id
+
+    def unassign_tenant(self, tenant_id: int) -> None:
+        with self._session_factory.begin() as session:
+            session.execute(delete(DBTenantShard).filter_by(tenant_id=tenant_id))
+
+        self._tenant_shards.pop(tenant_id, None)
+
+    def get_tenant_id_by_phone_number(self, phone_number: str) -> int | None:
+        with self._session_factory() as session:
+            return session.scalar(select(DBPhoneNumberDirectory.tenant_id).filter_by(phone_number=phone_number))
+
+    def register_phone_number(self, phone_number: str, tenant_id: int) -> None:
+        try:
+            with self._session_factory.begin() as session:
+                session.add(DBPhoneNumberDirectory(phone_number=phone_number, tenant_id=tenant_id))
+        except IntegrityError as e:
+            raise PhoneNumberTakenException from e
+
+    def unregister_phone_number(self, phone_number: str) -> None:
+        with self._session_factory.begin() as session:
+            session.execute(delete(DBPhoneNumberDirectory).filter_by(phone_number=phone_number))
+
+    def add_missing(
+        self,
+        shard_id: str,
+        tenant_ids: Iterable[int],
+        phone_numbers: Iterable[tuple[str, int]],
+    ) -> tuple[int, int]:
+        """Adds the tenants and phone numbers that have no directory rows, the tenants to `shard_id`.
+
+        Returns how many of each were added.
+        """
+        with self._session_factory.begin() as session:
+            known_tenant_ids = set(session.scalars(select(DBTenantShard.tenant_id)))
+            known_phone_numbers = set(session.scalars(select(DBPhoneNumberDirectory.phone_number)))
+            new_tenant_ids = [tenant_id for tenant_id in tenant_ids if tenant_id not in known_tenant_ids]
+            new_phone_numbers = [
+                (phone_number, tenant_id)
+                for phone_number, tenant_id in phone_numbers
+                if phone_number not in known_phone_numbers
+            ]
+            session.add_all(DBTenantShard(tenant_id=tenant_id, shard_id=shard_id) for tenant_id in new_tenant_ids)
+            session.add_all(
+                DBPhoneNumberDirectory(phone_number=phone_number, tenant_id=tenant_id)
+                for phone_number, tenant_id in new_phone_numbers
+            )
+            session.flush()
+
+            if new_tenant_ids and session.get_bind().dialect.name == "postgresql":
+                # New tenant ids are allocated above the added ones
+                session.execute(
+                    text(
+                        "SELECT setval(pg_get_serial_sequence('tenant_shard', 'tenant_id'), "
+                        "(SELECT max(tenant_id) FROM tenant_shard))",
+                    ),
+                )
+
+        return len(new_tenant_ids), len(new_phone_numbers)
+
+    def set_read_only(self, tenant_id: int, read_only: bool) -> None:
+        shard_id = self.get_shard_id(tenant_id)
+        with self._session_factory.begin() as session:
+            session.execute(update(DBTenantShard).filter_by(tenant_id=tenant_id).values(read_only=read_only))
+
+        self._cache(tenant_id, shard_id, read_only)
+
+    def set_shard_id(self, tenant_id: int, shard_id: str) -> None:
+        """Routes the tenant to `shard_id` and lifts its write fence."""
+        with self._session_factory.begin() as session:
+            session.execute(
+                update(DBTenantShard).filter_by(tenant_id=tenant_id).values(shard_id=shard_id, read_only=False),
+            )
+
+        self._cache(tenant_id, shard_id, False)
+
+
+def _get_select_comparisons(statement) -> list[tuple]:
+    binds = {}
+    columns = set()
+    comparisons = []
+
+    def visit_bindparam(bind):
+        binds[bind] = bind.effective_value
+
+    def visit_column(column):
+        columns.add(column)
+
+    def visit_binary(binary):
+        if binary.left in columns and binary.right in binds:
+            comparisons.append((binary.left, binary.operator, binds[binary.right]))
+        elif binary.left in binds and binary.right in columns:
+            comparisons.append((binary.right, binary.operator, binds[binary.left]))
+
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is not None:
+        visitors.traverse(
+            whereclause,
+            {},
+            {"bindparam": visit_bindparam, "binary": visit_binary, "column": visit_column},
+        )
+
+    return comparisons
+
+
+def create_sharded_sessionmaker(shard_directory: ShardDirectory, shard_engines: dict[str, Engine]) -> sessionmaker:
+    def shard_chooser(mapper, instance, clause=None):
+        if isinstance(instance, DBTenant):
+            return shard_directory.get_shard_id(instance.id)
+
+        return shard_directory.get_shard_id(instance.tenant_id)
+
+    def identity_chooser(mapper, primary_key, *, lazy_loaded_from, **kw):
+        if lazy_loaded_from:
+            return [lazy_loaded_from.identity_token]
+
+        if mapper.local_table is DBTenant.__table__:
+            return [shard_directory.get_shard_id(primary_key[0])]
+
+        # Ids are unique across shards once their sequences are interleaved, so at most one shard has the row
+        return shard_directory.shard_ids
+
+    def execute_chooser(orm_context: ORMExecuteState):
+        shard_ids = set()
+        for column, operator, value in _get_select_comparisons(orm_context.statement):
+            if operator != operators.eq:
+                continue
+
+            if column.key == "tenant_id" or (column.key == "id" and column.table is DBTenant.__table__):
+                shard_ids.add(shard_directory.get_shard_id(value))
+            elif column.key == "phone_number" and column.table is DBUser.__table__:
+                tenant_id = shard_directory.get_tenant_id_by_phone_number(value)
+                if tenant_id is None:
+                    return shard_directory.shard_ids[:1]
+                shard_ids.add(shard_directory.get_shard_id(tenant_id))
+
+        return list(shard_ids) or shard_directory.shard_ids
+
+    session_factory = sessionmaker(
+        class_=ShardedSession,
+        shards=shard_engines,
+        shard_chooser=shard_chooser,
+        identity_chooser=identity_chooser,
+        execute_chooser=execute_chooser,
+    )
+
+    @event.listens_for(session_factory, "before_flush")
+    def assign_new_tenants(session: Session, flush_context, instances):
+        # The directory row is undone with the session's transaction, see undo_rolled_back_directory_changes
+        for instance in session.new:
+            if isinstance(instance, DBTenant) and instance.id is None:
+                instance.id = shard_directory.assign_tenant()
+                session.info.setdefault("assigned_tenant_ids", []).append(instance.id)
+
+    @event.listens_for(session_factory, "before_flush")
+    def refuse_writes_to_read_only_tenants(session: Session, flush_context, instances):
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(instance, DBTenant):
+                shard_directory.check_writable(instance.id)
+            elif (tenant_id := getattr(instance, "tenant_id", None)) is not None:
+                shard_directory.check_writable(tenant_id)
+
+    @event.listens_for(session_factory, "before_flush")
+    def register_new_phone_numbers(session: Session, flush_context, instances):
+        for instance in session.new:
+            if isinstance(instance, DBUser):
+                shard_directory.register_phone_number(instance.phone_number, instance.tenant_id)
+                session.info.setdefault("registered_phone_numbers", []).append(instance.phone_number)
+
+    @event.listens_for(session_factory, "after_commit")
+    def forget_directory_changes(session: Session):
+        session.info.pop("assigned_tenant_ids", None)
+        session.info.pop("registered_phone_numbers", None)
+
+    @event.listens_for(session_factory, "after_rollback")
+    def undo_rolled_back_directory_changes(session: Session):
+        for phone_number in session.info.pop("registered_phone_numbers", []):
+            shard_directory.unregister_phone_number(phone_number)
+        for tenant_id in session.info.pop("assigned_tenant_ids", []):
+            shard_directory.unassign_tenant(tenant_id)
+
+    return session_factory
+
+
+def backfill_directory(shard_directory: ShardDirectory, primary_engine: Engine) -> tuple[int, int]:
+    """Adds the tenants and users of the primary database that the directory misses, on shard 0.
+
+    They were created before sharding was turned on, when the primary database was the only one.
+    Safe to run again, rows already in the directory are left as they are.
+    """
+    with primary_engine.connect() as connection:
+        tenant_ids = connection.scalars(select(DBTenant.__table__.c.id)).all()
+        phone_numbers = connection.execute(
+            select(DBUser.__table__.c.phone_number, DBUser.__table__.c.tenant_id),
+        ).all()
+
+    return shard_directory.add_missing(shard_directory.shard_ids[0], tenant_ids, phone_numbers)
+
+
+def move_tenant(
+    shard_directory: ShardDirectory,
+    shard_engines: dict[str, Engine],
+    tenant_id: int,
+    target_shard_id: str,
+    settle_seconds: float = 5,
+) -> None:
+    """Copies the tenant's rows to the target shard, switches the directory and deletes the originals.
+
+    The tenant is read-only during the copy. Each step waits for every process's directory cache
+    to expire, plus `settle_seconds` for writes that got past the fence to commit.
+    """
+    source_shard_id = shard_directory.get_shard_id(tenant_id)
+    if source_shard_id == target_shard_id:
+        return
+
+    source_engine = shard_engines[source_shard_id]
+    target_engine = shard_engines[target_shard_id]
+
+    def tenant_filter(table):
+        return table.c.id == tenant_id if table is DBTenant.__table__ else table.c.tenant_id == tenant_id
+
+    shard_directory.set_read_only(tenant_id, True)
+    try:
+        time.sleep(shard_directory.cache_ttl_seconds + settle_seconds)
+
+        with source_engine.connect() as source, target_engine.begin() as target:
+            for table in SHARDED_TABLES:
+                rows = [dict(row) for row in source.execute(select(table).where(tenant_filter(table))).mappings()]
+                if rows:
+                    target.execute(insert(table), rows)
+    except BaseException:
+        shard_directory.set_read_only(tenant_id, False)
+        raise
+
+    shard_directory.set_shard_id(tenant_id, target_shard_id)
+    # Processes with the old shard cached keep reading the source until their cache expires
+    time.sleep(shard_directory.cache_ttl_seconds)
+
+    with source_engine.begin() as source:
+        for table in reversed(SHARDED_TABLES):
+            source.execute(delete(table).where(tenant_filter(table)))
+
+
+def next_interleaved_id(max_id: int, step: int, offset: int) -> int:
+    """The first id above `max_id` in the series offset, offset + step, offset + 2 * step, ..."""
+    return (max_id // step + 1) * step + offset
+
+
+def interleave_sequences(shard_engines: dict[str, Engine]) -> None:
+    # Postgres only: shard N hands out ids N+1, N+1+len(shards), ... so ids stay
+    # unique across shards and tenants can be moved without renumbering rows.
+    # Every sequence restarts above the largest id on any shard, so it can run on
+    # shards that already have rows, and again when a shard is added, as long as
+    # nothing writes to the shards meanwhile.
+    step = len(shard_engines)
+    max_ids = {}
+    for table in SEQUENCE_TABLES:
+        max_ids[table.name] = 0
+        for engine in shard_engines.values():
+            with engine.connect() as connection:
+                max_id = connection.scalar(select(func.max(table.c.id))) or 0
+            max_ids[table.name] = max(max_ids[table.name], max_id)
+
+    for offset, engine in enumerate(shard_engines.values(), start=1):
+        with engine.begin() as connection:
+            for table in SEQUENCE_TABLES:
+                start = next_interleaved_id(max_ids[table.name], step, offset)
+                connection.execute(
+                    text(f'ALTER SEQUENCE "{table.name}_id_seq" INCREMENT BY {step} RESTART WITH {start}'),
+                )
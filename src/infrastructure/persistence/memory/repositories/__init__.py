@@ -1,8 +1,25 @@
+import copy
+import datetime
+from collections import defaultdict
+from collections.abc import Hashable
+
 from domain.entities import Bill
 from domain.entities import Category
 from domain.entities import Message
 from domain.entities import Tenant
 from domain.entities import User
+from infrastructure.persistence.memory.repositories.bill_columns import BillColumns
+
+_TABLES = ("users", "bills", "categories", "messages", "tenants")
+_SEQUENCES = ("users_id_seq", "bills_id_seq", "categories_id_seq", "messages_id_seq", "tenants_id_seq")
+_INDEXES = (
+    "users_by_phone_number",
+    "bills_by_tenant",
+    "bill_dates_by_tenant",
+    "bill_columns_by_tenant",
+    "categories_by_tenant",
+    "messages_by_tenant_user",
+)
 
 
 class InMemoryDatabase:
@@ -18,6 +35,90 @@ class InMemoryDatabase:
         self.tenants: dict[int, Tenant] = {}
         self.tenants_id_seq: int = 0
 
+        self.users_by_phone_number: dict[str, User] = {}
+        self.bills_by_tenant: defaultdict[int, dict[int, Bill]] = defaultdict(dict)
+        self.bill_dates_by_tenant: defaultdict[int, list[tuple[datetime.date, int]]] = defaultdict(list)
+        self.bill_columns_by_tenant: dict[int, BillColumns] = {}
+        self.categories_by_tenant: defaultdict[int, dict[int, Category]] = defaultdict(dict)
+        self.messages_by_tenant_user: defaultdict[tuple[int, int], dict[int, Message]] = defaultdict(dict)
+
+        self._snapshot: InMemoryDatabaseSnapshot | None = None
+        self._private_buckets: set[tuple[str, Hashable]] = set()
+
+    def _fork_from(self, snapshot: "InMemoryDatabaseSnapshot") -> None:
+        # Top level containers are copied (pointer copies only), the per-tenant buckets and
+        # the entities themselves stay shared with the snapshot until they are written to.
+        for name in _TABLES + _INDEXES:
+            setattr(self, name, copy.copy(getattr(snapshot, name)))
+
+        for name in _SEQUENCES:
+            setattr(self, name, getattr(snapshot, name))
+
+        self._snapshot = snapshot
+        self._private_buckets = set()
+
+    def snapshot(self) -> "InMemoryDatabaseSnapshot":
+        snapshot = InMemoryDatabaseSnapshot(self)
+        self._fork_from(snapshot)
+
+        return snapshot
+
+    def writable_bucket(self, index_name: str, key: Hashable) -> dict | list:
+        index = getattr(self, index_name)
+        if self._snapshot is not None and (index_name, key) not in self._private_buckets:
+            bucket = index.get(key)
+            index[key] = copy.copy(bucket) if bucket is not None else index.default_factory()
+            self._private_buckets.add((index_name, key))
+
+        return index[key]
+
+    def _is_shared(self, table_name: str, entity) -> bool:
+        return self._snapshot is not None and getattr(self._snapshot, table_name).get(entity.id) is entity
+
+    def writable_user(self, user_id: int) -> User | None:
+        user = self.users.get(user_id)
+        if user is not None and self._is_shared("users", user):
+            user = copy.copy(user)
+            self.users[user.id] = user
+            self.users_by_phone_number[user.phone_number] = user
+
+        return user
+
+    def writable_bill(self, bill_id: int) -> Bill | None:
+        bill = self.bills.get(bill_id)
+        if bill is not None and self._is_shared("bills", bill):
+            bill = copy.copy(bill)
+            self.bills[bill.id] = bill
+            self.writable_bucket("bills_by_tenant", bill.tenant_id)[bill.id] = bill
+
+        return bill
+
+    def writable_category(self, category_id: int) -> Category | None:
+        category = self.categories.get(category_id)
+        if category is not None and self._is_shared("categories", category):
+            category = copy.copy(category)
+            self.categories[category.id] = category
+            self.writable_bucket("categories_by_tenant", category.tenant_id)[category.id] = category
+
+        return category
+
+
+class InMemoryDatabaseSnapshot:
+    """Frozen state of an InMemoryDatabase that can be forked cheaply.
+
+    Forks share buckets and entities with the snapshot and only copy the ones they write to.
+    """
+
+    def __init__(self, in_memory_database: InMemoryDatabase):
+        for name in _TABLES + _INDEXES + _SEQUENCES:
+            setattr(self, name, getattr(in_memory_database, name))
+
+    def fork(self) -> InMemoryDatabase:
+        in_memory_database = InMemoryDatabase()
+        in_memory_database._fork_from(self)
+
+        return in_memory_database
+
 
 class InMemoryRepository:
     def __init__(self, in_memory_database: InMemoryDatabase):
@@ -0,0 +1,73 @@
+import datetime
+from collections.abc import Iterable
+
+from domain.entities import Bill
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+
+class BillColumns:
+    """Read-only columnar snapshot of a tenant's bills, sorted by (date, id)."""
+
+    def __init__(self, bills: Iterable[Bill]):
+        if np is None:
+            raise RuntimeError("numpy is required for columnar bill queries, install billyai[analytics]")
+
+        sorted_bills = sorted(bills, key=lambda bill: (bill.date, bill.id))
+
+        self.ids = np.fromiter((bill.id for bill in sorted_bills), dtype=np.int64, count=len(sorted_bills))
+        self.dates = np.array([bill.date for bill in sorted_bills], dtype="datetime64[D]")
+        self.values = np.fromiter((bill.value for bill in sorted_bills), dtype=np.float64, count=len(sorted_bills))
+        self.category_ids = np.fromiter(
+            (bill.category_id if bill.category_id is not None else -1 for bill in sorted_bills),
+            dtype=np.int64,
+            count=len(sorted_bills),
+        )
+
+    def _mask(
+        self,
+        date_range: tuple[datetime.date, datetime.date] | None,
+        category_id: int | None,
+        value_range: tuple[float, float] | None,
+    ) -> tuple[slice, "np.ndarray | None"]:
+        rows = slice(None)
+        if date_range is not None:
+            start = np.searchsorted(self.dates, np.datetime64(date_range[0], "D"), side="left")
+            end = np.searchsorted(self.dates, np.datetime64(date_range[1], "D"), side="right")
+            rows = slice(start, end)
+
+        mask = None
+        if category_id is not None:
+            mask = self.category_ids[rows] == category_id
+
+        if value_range is not None:
+            values = self.values[rows]
+            value_mask = (values >= value_range[0]) & (values <= value_range[1])
+            mask = value_mask if mask is None else mask & value_mask
+
+        return rows, mask
+
+    def select_ids(
+        self,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> "np.ndarray":
+        rows, mask = self._mask(date_range, category_id, value_range)
+        ids = self.ids[rows]
+
+        return ids if mask is None else ids[mask]
+
+    def total(
+        self,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> float:
+        rows, mask = self._mask(date_range, category_id, value_range)
+        values = self.values[rows]
+
+        return float(values.sum() if mask is None else values[mask].sum())
@@ -1,14 +1,38 @@
+import bisect
 import datetime
+import math
 from collections.abc import Generator
 
 from domain.entities import Bill
+from domain.entities import BillBatch
 from domain.exceptions import BillNotFoundException
 from domain.exceptions import CategoryNotFoundException
 from domain.exceptions import TenantNotFoundException
+from infrastructure.persistence.memory.repositories import InMemoryDatabase
 from infrastructure.persistence.memory.repositories import InMemoryRepository
+from infrastructure.persistence.memory.repositories.bill_columns import BillColumns
 
 
 class InMemoryBillRepository(InMemoryRepository):
+    def __init__(self, in_memory_database: InMemoryDatabase, columnar: bool = False):
+        super().__init__(in_memory_database)
+        self._columnar = columnar
+
+    def _get_columns(self, tenant_id: int) -> BillColumns:
+        columns = self._in_memory_database.bill_columns_by_tenant.get(tenant_id)
+        if columns is None:
+            columns = BillColumns(self._in_memory_database.bills_by_tenant.get(tenant_id, {}).values())
+            self._in_memory_database.bill_columns_by_tenant[tenant_id] = columns
+
+        return columns
+
+    def _get_bills_in_date_range(self, tenant_id: int, date_range: tuple[datetime.date, datetime.date]) -> list[Bill]:
+        date_keys = self._in_memory_database.bill_dates_by_tenant.get(tenant_id, [])
+        start = bisect.bisect_left(date_keys, (date_range[0],))
+        end = bisect.bisect_right(date_keys, (date_range[1], math.inf))
+
+        return [self._in_memory_database.bills[bill_id] for _, bill_id in date_keys[start:end]]
+
     def create(self, tenant_id: int, date: datetime.date, value: float, category_id: int | None = None) -> Bill:
         if tenant_id not in self._in_memory_database.tenants:
             raise TenantNotFoundException
@@ -26,7 +50,10 @@ class InMemoryBillRepository(InMemoryRepository):
             tenant_id=tenant_id,
         )
 
-        self._in_memory_database.bills[self._in_memory_database.bills_id_seq] = bill
+        self._in_memory_database.bills[bill.id] = bill
+        self._in_memory_database.writable_bucket("bills_by_tenant", tenant_id)[bill.id] = bill
+        bisect.insort(self._in_memory_database.writable_bucket("bill_dates_by_tenant", tenant_id), (date, bill.id))
+        self._in_memory_database.bill_columns_by_tenant.pop(tenant_id, None)
 
         return bill
 
@@ -37,13 +64,11 @@ class InMemoryBillRepository(InMemoryRepository):
         category_id: int | None = None,
         value_range: tuple[float, float] | None = None,
     ) -> Generator[Bill]:
-        def filter_bill(bill: Bill) -> bool:
-            if bill.tenant_id != tenant_id:
-                return False
-
-            if date_range is not None and (bill.date < date_range[0] or bill.date > date_range[1]):
-                return False
+        if self._columnar:
+            bill_ids = self._get_columns(tenant_id).select_ids(date_range, category_id, value_range)
+            return (self._in_memory_database.bills[bill_id] for bill_id in bill_ids.tolist())
 
+        def filter_bill(bill: Bill) -> bool:
             if category_id is not None and bill.category_id != category_id:
                 return False
 
@@ -52,7 +77,33 @@ class InMemoryBillRepository(InMemoryRepository):
 
             return True
 
-        return (bill for bill in filter(filter_bill, self._in_memory_database.bills.values()))
+        if date_range is not None:
+            bills = self._get_bills_in_date_range(tenant_id, date_range)
+        else:
+            bills = self._in_memory_database.bills_by_tenant.get(tenant_id, {}).values()
+
+        return (bill for bill in filter(filter_bill, bills))
+
+    def get_total(
+        self,
+        tenant_id: int,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> float:
+        if self._columnar:
+            return self._get_columns(tenant_id).total(date_range, category_id, value_range)
+
+        return math.fsum(bill.value for bill in self.get_many(tenant_id, date_range, category_id, value_range))
+
+    def get_batch(
+        self,
+        tenant_id: int,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+        category_id: int | None = None,
+        value_range: tuple[float, float] | None = None,
+    ) -> BillBatch:
+        return BillBatch.from_bills(self.get_many(tenant_id, date_range, category_id, value_range))
 
     def get_by_id(self, tenant_id: int, bill_id: int) -> Bill:
         bill = self._in_memory_database.bills.get(bill_id)
@@ -71,11 +122,7 @@ class InMemoryBillRepository(InMemoryRepository):
         if bill is None or bill.tenant_id != tenant_id:
             raise BillNotFoundException
 
-        if date is not None:
-            bill.date = date
-
-        if value is not None:
-            bill.value = value
+        bill = self._in_memory_database.writable_bill(bill_id)
 
         if category_id is not None:
             category = self._in_memory_database.categories.get(category_id)
@@ -83,4 +130,15 @@ class InMemoryBillRepository(InMemoryRepository):
                 raise CategoryNotFoundException
             bill.category_id = category_id
 
+        if date is not None and date != bill.date:
+            date_keys = self._in_memory_database.writable_bucket("bill_dates_by_tenant", tenant_id)
+            del date_keys[bisect.bisect_left(date_keys, (bill.date, bill.id))]
+            bisect.insort(date_keys, (date, bill.id))
+            bill.date = date
+
+        if value is not None:
+            bill.value = value
+
+        self._in_memory_database.bill_columns_by_tenant.pop(tenant_id, None)
+
         return bill
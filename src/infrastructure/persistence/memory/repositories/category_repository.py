@@ -1,4 +1,5 @@
 from collections.abc import Generator
+from collections.abc import Iterable
 
 from domain.entities import Category
 from domain.exceptions import CategoryAlreadyExistsException
@@ -7,9 +8,12 @@ from infrastructure.persistence.memory.repositories import InMemoryRepository
 
 
 class InMemoryCategoryRepository(InMemoryRepository):
+    def _tenant_categories(self, tenant_id: int) -> Iterable[Category]:
+        return self._in_memory_database.categories_by_tenant.get(tenant_id, {}).values()
+
     def _raise_if_name_already_exists_in_tenant(self, tenant_id: int, name: str) -> None:
-        for category in self._in_memory_database.categories.values():
-            if category.tenant_id == tenant_id and category.name == name:
+        for category in self._tenant_categories(tenant_id):
+            if category.name == name:
                 raise CategoryAlreadyExistsException
 
     def create(self, tenant_id: int, name: str, description: str) -> Category:
@@ -18,26 +22,16 @@ class InMemoryCategoryRepository(InMemoryRepository):
         self._in_memory_database.categories_id_seq += 1
         category = Category(self._in_memory_database.categories_id_seq, name, description, tenant_id)
 
-        self._in_memory_database.categories[self._in_memory_database.categories_id_seq] = category
+        self._in_memory_database.categories[category.id] = category
+        self._in_memory_database.writable_bucket("categories_by_tenant", tenant_id)[category.id] = category
 
         return category
 
     def get_all(self, tenant_id: int) -> Generator[Category]:
-        return (
-            category
-            for category in filter(
-                lambda category: category.tenant_id == tenant_id,
-                self._in_memory_database.categories.values(),
-            )
-        )
+        return (category for category in self._tenant_categories(tenant_id))
 
     def get_by_name(self, tenant_id: int, category_name: str) -> Category:
-        categories = list(
-            filter(
-                lambda category: category.tenant_id == tenant_id and category.name == category_name,
-                self._in_memory_database.categories.values(),
-            ),
-        )
+        categories = [category for category in self._tenant_categories(tenant_id) if category.name == category_name]
 
         if categories and len(categories) == 1:
             return categories[0]
@@ -61,6 +55,10 @@ class InMemoryCategoryRepository(InMemoryRepository):
 
         if name is not None:
             self._raise_if_name_already_exists_in_tenant(tenant_id=tenant_id, name=name)
+
+        category = self._in_memory_database.writable_category(category_id)
+
+        if name is not None:
             category.name = name
 
         if description is not None:
@@ -34,18 +34,15 @@ class InMemoryMessageRepository(InMemoryRepository):
             external_message_id=external_message_id,
         )
 
-        self._in_memory_database.messages[self._in_memory_database.messages_id_seq] = message
+        self._in_memory_database.messages[message.id] = message
+        self._in_memory_database.writable_bucket("messages_by_tenant_user", (tenant_id, user_id))[message.id] = message
 
         return message
 
     def get_all(self, user_id: int, tenant_id: int) -> Generator[Message]:
-        return (
-            message
-            for message in filter(
-                lambda message: message.user_id == user_id and message.tenant_id == tenant_id,
-                self._in_memory_database.messages.values(),
-            )
-        )
+        user_messages = self._in_memory_database.messages_by_tenant_user.get((tenant_id, user_id), {})
+
+        return (message for message in user_messages.values())
 
     def get_by_id(self, message_id: int) -> Message:
         if (message := self._in_memory_database.messages.get(message_id)) is None:
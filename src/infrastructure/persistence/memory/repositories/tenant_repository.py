@@ -7,6 +7,6 @@ class InMemoryTenantRepository(InMemoryRepository):
         self._in_memory_database.tenants_id_seq += 1
         tenant = Tenant(id=self._in_memory_database.tenants_id_seq)
 
-        self._in_memory_database.tenants[self._in_memory_database.tenants_id_seq] = tenant
+        self._in_memory_database.tenants[tenant.id] = tenant
 
         return tenant
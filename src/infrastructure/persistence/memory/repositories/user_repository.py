@@ -6,9 +6,7 @@ from infrastructure.persistence.memory.repositories import InMemoryRepository
 
 class InMemoryUserRepository(InMemoryRepository):
     def get_by_phone_number(self, phone_number: str) -> User | None:
-        users = list(filter(lambda user: user.phone_number == phone_number, self._in_memory_database.users.values()))
-
-        return users[0] if users else None
+        return self._in_memory_database.users_by_phone_number.get(phone_number)
 
     def get_by_id(self, user_id: int) -> User:
         if (user := self._in_memory_database.users.get(user_id)) is None:
@@ -29,12 +27,13 @@ class InMemoryUserRepository(InMemoryRepository):
             tenant_id=tenant_id,
         )
 
-        self._in_memory_database.users[self._in_memory_database.users_id_seq] = user
+        self._in_memory_database.users[user.id] = user
+        self._in_memory_database.users_by_phone_number[phone_number] = user
 
         return user
 
     def update(self, user_id: int, tenant_id: int, name: str, is_registered: bool) -> User:
-        if (user := self._in_memory_database.users.get(user_id)) is None:
+        if (user := self._in_memory_database.writable_user(user_id)) is None:
             raise UserNotFoundException
 
         user.name = name
@@ -0,0 +1,55 @@
+import datetime
+
+from domain.entities import MessageAuthor
+from domain.entities import MessageBroker
+from infrastructure.persistence.memory.repositories import InMemoryDatabase
+from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
+from infrastructure.persistence.memory.repositories.category_repository import InMemoryCategoryRepository
+from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
+from infrastructure.persistence.memory.repositories.tenant_repository import InMemoryTenantRepository
+from infrastructure.persistence.memory.repositories.user_repository import InMemoryUserRepository
+
+SEED_START_DATE = datetime.date(2020, 1, 1)
+
+
+def seed_in_memory_database(
+    in_memory_database: InMemoryDatabase,
+    tenants: int,
+    bills_per_tenant: int,
+    messages_per_tenant: int,
+) -> InMemoryDatabase:
+    tenant_repository = InMemoryTenantRepository(in_memory_database)
+    user_repository = InMemoryUserRepository(in_memory_database)
+    category_repository = InMemoryCategoryRepository(in_memory_database)
+    bill_repository = InMemoryBillRepository(in_memory_database)
+    message_repository = InMemoryMessageRepository(in_memory_database)
+
+    for tenant_index in range(tenants):
+        tenant = tenant_repository.create()
+        user = user_repository.create(
+            phone_number=f"55419{tenant_index:08d}",
+            name=f"User {tenant_index}",
+            tenant_id=tenant.id,
+            is_registered=True,
+        )
+        category = category_repository.create(tenant.id, "default", "Default category")
+
+        for bill_index in range(bills_per_tenant):
+            bill_repository.create(
+                tenant.id,
+                SEED_START_DATE + datetime.timedelta(days=bill_index % 1825),
+                float(bill_index % 1000),
+                category.id,
+            )
+
+        for message_index in range(messages_per_tenant):
+            message_repository.create(
+                body=f"Message {message_index}",
+                author=MessageAuthor.USER if message_index % 2 == 0 else MessageAuthor.BILLY,
+                timestamp=datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=message_index),
+                broker=MessageBroker.WHATSAPP,
+                user_id=user.id,
+                tenant_id=tenant.id,
+            )
+
+    return in_memory_database
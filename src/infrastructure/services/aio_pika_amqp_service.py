@@ -1,26 +1,102 @@
-import json
+import logging
+import time
 from collections.abc import Callable
+from dataclasses import dataclass
 
 import aio_pika
 from aio_pika.pool import Pool
 from aio_pika.robust_connection import AbstractRobustConnection
+from aiormq.abc import DeliveredMessage
+
+from domain.exceptions import TaskRejectedException
+from domain.exceptions import TaskRetryException
+from infrastructure.metrics import metrics
+from infrastructure.services.amqp_codecs import EncodedPayload
+from infrastructure.services.amqp_codecs import PayloadCodec
+
+logger = logging.getLogger(__name__)
+
+# When a message is due to be consumed, in epoch milliseconds: when it was published, plus its delay
+DUE_AT_HEADER = "x-due-at-ms"
+
+consumer_lag_seconds = metrics.histogram(
+    "amqp_consumer_lag_seconds",
+    "Time messages waited in the queue after they were due, before a consumer picked them up",
+)
+
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    return f"{queue_name}.dead_letter"
+
+
+@dataclass(frozen=True, slots=True)
+class DeadLetter:
+    body: bytes
+    headers: dict
+    content_type: str | None = None
+    content_encoding: str | None = None
+
+    @property
+    def reason(self) -> str | None:
+        return self.headers.get("x-rejection-reason")
+
+
+def _delay_queue_expires_ms(delay_ms: int) -> int:
+    return 2 * delay_ms + 60_000
+
+
+def delay_queue_arguments(queue_name: str, delay_ms: int) -> dict:
+    # Messages wait in a queue nobody consumes until their TTL expires, then they are dead
+    # lettered to the real queue. One queue per delay keeps every message in it expiring in
+    # order, and the queue deletes itself once it has been idle for longer than the delay.
+    return {
+        "x-message-ttl": delay_ms,
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": queue_name,
+        "x-expires": _delay_queue_expires_ms(delay_ms),
+    }
+
+
+def delay_queue_redeclare_seconds(delay_ms: int) -> float:
+    # Declaring a queue restarts its expiry, publishing to it doesn't. Declared again after half
+    # of x-expires, the queue outlives every message published since by more than the delay.
+    return _delay_queue_expires_ms(delay_ms) / 2000
 
 
 class AioPikaPoolService:
-    def __init__(self, broker_url: str):
+    def __init__(self, broker_url: str, codec: PayloadCodec | None = None):
+        self._codec = codec
+
         async def get_connection() -> AbstractRobustConnection:
             return await aio_pika.connect_robust(broker_url)
 
+        async def get_pooled_channel() -> aio_pika.Channel:
+            return await self.get_channel()
+
         self._connection_pool = Pool(get_connection, max_size=15)
+        self._channel_pool = Pool(get_pooled_channel, max_size=15)
 
     async def get_channel(self) -> aio_pika.Channel:
         async with self._connection_pool.acquire() as connection:
             return await connection.channel()
 
+    async def publish(self, message: dict, queue_name: str, delay_ms: int = 0) -> None:
+        # For publishers that outlive a DI scope, such as timers
+        async with self._channel_pool.acquire() as channel:
+            await AioPikaAMQPService(channel, self._codec).publish(message, queue_name, delay_ms)
+
+    async def close(self) -> None:
+        await self._channel_pool.close()
+        await self._connection_pool.close()
+
 
 class AioPikaAMQPService:
-    def __init__(self, channel: aio_pika.Channel):
+    def __init__(self, channel: aio_pika.Channel, codec: PayloadCodec | None = None):
         self._channel = channel
+        self._codec = codec or PayloadCodec()
+        # Delay queue name to when this service last declared it, on the monotonic clock
+        self._declared_delay_queues: dict[str, float] = {}
+        self._consumers: list[tuple[aio_pika.abc.AbstractQueue, str]] = []
 
     async def consume(
         self,
@@ -30,17 +106,159 @@ class AioPikaAMQPService:
         prefetch_count: int | None = None,
     ) -> None:
         async def callback_fn(message: aio_pika.IncomingMessage):
+            due_at_ms = (message.headers or {}).get(DUE_AT_HEADER)
+            if isinstance(due_at_ms, int):
+                consumer_lag_seconds.observe(max(time.time() - due_at_ms / 1000, 0), queue=queue_name)
+
             async with message.process(requeue=True):
-                payload = json.loads(message.body.decode("utf-8"))
-                await callback(payload)
+                try:
+                    payload = self._codec.decode(message.body, message.content_type, message.content_encoding)
+                except ValueError as e:
+                    await self._dead_letter(message, queue_name, f"Undecodable payload: {e}")
+                    return
+
+                try:
+                    await callback(payload)
+                except TaskRetryException as e:
+                    # Raises if the broker can't route the retry, the message is then requeued, not acked
+                    await self.publish(e.payload, queue_name, e.delay_ms)
+                except TaskRejectedException as e:
+                    await self._dead_letter(message, queue_name, str(e))
+                except Exception as e:
+                    # Requeueing would redeliver it straight away, in a loop if it keeps failing
+                    logger.exception(f"Unhandled error consuming from {queue_name}")
+                    await self._dead_letter(message, queue_name, f"Unhandled {type(e).__name__}: {e}")
 
         if prefetch_count is not None:
             await self._channel.set_qos(prefetch_count=prefetch_count)
 
         queue = await self._channel.declare_queue(queue_name)
 
-        await queue.consume(callback_fn, no_ack=no_ack)
+        consumer_tag = await queue.consume(callback_fn, no_ack=no_ack)
+        self._consumers.append((queue, consumer_tag))
+
+    async def cancel_consumers(self) -> None:
+        # The broker stops delivering, messages already delivered keep running and can still be acked
+        for queue, consumer_tag in self._consumers:
+            try:
+                await queue.cancel(consumer_tag)
+            except (aio_pika.exceptions.AMQPError, aio_pika.exceptions.ChannelInvalidStateError):
+                logger.exception(f"Could not cancel the consumer of {queue.name}, closing the channel requeues")
+        self._consumers.clear()
+
+    async def _dead_letter(self, message: aio_pika.IncomingMessage, queue_name: str, reason: str) -> None:
+        # Rejected messages are parked as they arrived, with the reason, and acked instead of requeued
+        dead_letter_queue = dead_letter_queue_name(queue_name)
+        await self._channel.declare_queue(dead_letter_queue, durable=True)
+        await self._publish_mandatory(
+            aio_pika.Message(
+                body=message.body,
+                content_type=message.content_type,
+                content_encoding=message.content_encoding,
+                headers={**(message.headers or {}), "x-rejection-reason": reason},
+            ),
+            dead_letter_queue,
+        )
+
+    async def peek_dead_letters(self, queue_name: str, limit: int) -> list[DeadLetter]:
+        dead_letter_queue = await self._channel.declare_queue(dead_letter_queue_name(queue_name), durable=True)
+
+        # Everything is read before anything is requeued, or the first message would be read again
+        messages = []
+        while len(messages) < limit and (message := await dead_letter_queue.get(no_ack=False, fail=False)):
+            messages.append(message)
+
+        for message in messages:
+            await message.nack(requeue=True)
+
+        return [
+            DeadLetter(message.body, dict(message.headers or {}), message.content_type, message.content_encoding)
+            for message in messages
+        ]
+
+    def _reset_attempts(self, message: aio_pika.IncomingMessage) -> EncodedPayload:
+        unchanged = EncodedPayload(message.body, message.content_type, message.content_encoding)
+        try:
+            payload = self._codec.decode(message.body, message.content_type, message.content_encoding)
+        except ValueError:
+            return unchanged
+
+        if not isinstance(payload, dict) or "attempt" not in payload:
+            return unchanged
+
+        del payload["attempt"]
+        return self._codec.encode(payload)
+
+    async def replay_dead_letters(self, queue_name: str, limit: int | None = None) -> int:
+        dead_letter_queue = await self._channel.declare_queue(dead_letter_queue_name(queue_name), durable=True)
+
+        replayed = 0
+        while limit is None or replayed < limit:
+            message = await dead_letter_queue.get(no_ack=False, fail=False)
+            if message is None:
+                break
+
+            # Replayed tasks start over with a full set of attempts, and don't count as lagging
+            headers = {
+                name: value
+                for name, value in (message.headers or {}).items()
+                if name not in ("x-rejection-reason", DUE_AT_HEADER)
+            }
+            encoded = self._reset_attempts(message)
+            await self._channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=encoded.body,
+                    content_type=encoded.content_type,
+                    content_encoding=encoded.content_encoding,
+                    headers=headers,
+                ),
+                queue_name,
+            )
+            await message.ack()
+            replayed += 1
+
+        return replayed
+
+    async def _publish_mandatory(self, message: aio_pika.Message, queue_name: str) -> None:
+        result = await self._channel.default_exchange.publish(message, queue_name, mandatory=True)
+        if isinstance(result, DeliveredMessage):
+            # No queue to route it to, the broker returned it instead of dropping it silently
+            raise aio_pika.exceptions.PublishError(result, result.delivery)
+
+    async def _declare_delay_queue(self, queue_name: str, delay_ms: int) -> str:
+        delay_queue_name = f"{queue_name}.delay.{delay_ms}"
+        await self._channel.declare_queue(
+            delay_queue_name,
+            durable=True,
+            arguments=delay_queue_arguments(queue_name, delay_ms),
+        )
+        self._declared_delay_queues[delay_queue_name] = time.monotonic()
+        return delay_queue_name
+
+    async def publish(self, message: dict, queue_name: str, delay_ms: int = 0) -> None:
+        encoded = self._codec.encode(message)
+        amqp_message = aio_pika.Message(
+            body=encoded.body,
+            content_type=encoded.content_type,
+            content_encoding=encoded.content_encoding,
+            headers={DUE_AT_HEADER: int(time.time() * 1000) + delay_ms},
+        )
+        if delay_ms <= 0:
+            await self._publish_mandatory(amqp_message, queue_name)
+            return
+
+        delay_queue_name = f"{queue_name}.delay.{delay_ms}"
+        declared_at = self._declared_delay_queues.get(delay_queue_name)
+        if declared_at is None or time.monotonic() - declared_at > delay_queue_redeclare_seconds(delay_ms):
+            await self._declare_delay_queue(queue_name, delay_ms)
+
+        try:
+            await self._publish_mandatory(amqp_message, delay_queue_name)
+        except aio_pika.exceptions.PublishError:
+            # Deleted since it was declared, by hand or by another broker node losing it
+            logger.warning(f"Delay queue {delay_queue_name} is gone, declaring it again")
+            await self._declare_delay_queue(queue_name, delay_ms)
+            await self._publish_mandatory(amqp_message, delay_queue_name)
 
-    async def publish(self, message: dict, queue_name: str) -> None:
-        payload = json.dumps(message).encode("utf-8")
-        await self._channel.default_exchange.publish(aio_pika.Message(body=payload), queue_name)
+    async def close(self) -> None:
+        await self._channel.close()
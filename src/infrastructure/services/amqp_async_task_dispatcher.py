@@ -1,15 +1,77 @@
+import datetime
+import math
+
 from domain.ports.services import AMQPService
 from infrastructure.config.settings import app_settings
+from infrastructure.inline_tasks import current_inline_batch
+from infrastructure.services.aio_pika_amqp_service import AioPikaPoolService
+from infrastructure.services.timer_wheel import TimerWheel
+
+
+def task_queue_name(queue: str | None) -> str:
+    if queue is None:
+        return app_settings.async_task_routing_key
+
+    return f"{app_settings.async_task_routing_key}.{queue}"
+
+
+def get_delay_ms(eta: datetime.datetime | None, countdown: float | None) -> int:
+    if eta is not None:
+        if eta.tzinfo is None:
+            # The app only creates UTC datetimes, so a naive one is taken to be UTC
+            eta = eta.replace(tzinfo=datetime.UTC)
+        countdown = (eta - datetime.datetime.now(datetime.UTC)).total_seconds()
+
+    if not countdown or countdown <= 0:
+        return 0
+
+    # Rounded up so tasks never run early and the number of distinct delay queues stays small
+    resolution_ms = app_settings.async_task_delay_resolution_ms
+    return math.ceil(countdown * 1000 / resolution_ms) * resolution_ms
 
 
 class AMQPAsyncTaskDispatcherService:
-    def __init__(self, amqp_service: AMQPService):
+    def __init__(
+        self,
+        amqp_service: AMQPService,
+        timer_wheel: TimerWheel | None = None,
+        amqp_pool_service: AioPikaPoolService | None = None,
+    ):
         self._amqp_service = amqp_service
+        self._timer_wheel = timer_wheel
+        self._amqp_pool_service = amqp_pool_service
 
-    async def dispatch(self, task_name: str, **kwargs):
+    async def dispatch(
+        self,
+        task_name: str,
+        *,
+        queue: str | None = None,
+        eta: datetime.datetime | None = None,
+        countdown: float | None = None,
+        task_id: str | None = None,
+        **kwargs,
+    ):
         payload = {
             "task": task_name,
             "kwargs": kwargs,
         }
+        if task_id is not None:
+            payload["id"] = task_id
+
+        queue_name = task_queue_name(queue)
+        delay_ms = get_delay_ms(eta, countdown)
+
+        inline_batch = current_inline_batch.get()
+        if inline_batch is not None and inline_batch.defer(task_name, delay_ms, kwargs, task_id):
+            return
+        if delay_ms and self._timer_wheel is not None:
+            # The scoped channel is closed by then, so the timer publishes through the pool
+            self._timer_wheel.schedule(
+                delay_ms / 1000,
+                self._amqp_pool_service.publish,
+                payload,
+                queue_name,
+            )
+            return
 
-        await self._amqp_service.publish(payload, app_settings.async_task_routing_key)
+        await self._amqp_service.publish(payload, queue_name, delay_ms)
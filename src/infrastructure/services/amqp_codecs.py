@@ -0,0 +1,113 @@
+import json
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is an optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is an optional dependency
+    zstandard = None
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+ZSTD_CONTENT_ENCODING = "zstd"
+
+
+@dataclass(frozen=True, slots=True)
+class Codec:
+    content_type: str
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes], Any]
+
+
+def _json_codec() -> Codec:
+    return Codec(JSON_CONTENT_TYPE, lambda payload: json.dumps(payload).encode("utf-8"), json.loads)
+
+
+def _orjson_codec() -> Codec:
+    if orjson is None:
+        raise RuntimeError("orjson is required for the orjson codec, install billyai[amqp-codecs]")
+
+    return Codec(JSON_CONTENT_TYPE, orjson.dumps, orjson.loads)
+
+
+def _msgpack_codec() -> Codec:
+    if msgpack is None:
+        raise RuntimeError("msgpack is required for the msgpack codec, install billyai[amqp-codecs]")
+
+    return Codec(MSGPACK_CONTENT_TYPE, msgpack.packb, msgpack.unpackb)
+
+
+CODECS: dict[str, Callable[[], Codec]] = {
+    "json": _json_codec,
+    "orjson": _orjson_codec,
+    "msgpack": _msgpack_codec,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedPayload:
+    body: bytes
+    content_type: str
+    content_encoding: str | None = None
+
+
+class PayloadCodec:
+    """Encodes AMQP payloads with one codec, decodes them with the codec their content type names.
+
+    Messages without a content type, or with one no codec handles, are decoded as JSON, as
+    published before codecs existed. JSON is decoded with orjson only when it's the codec. Bodies
+    of at least `compress_min_bytes` are compressed with zstd and marked with a content encoding,
+    0 turns compression off.
+    """
+
+    def __init__(self, codec: str = "json", compress_min_bytes: int = 0):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', known codecs: {', '.join(CODECS)}")
+        if compress_min_bytes and zstandard is None:
+            raise RuntimeError("zstandard is required to compress payloads, install billyai[amqp-codecs]")
+
+        self._codec = CODECS[codec]()
+        self._compress_min_bytes = compress_min_bytes
+        self._decoders = {
+            JSON_CONTENT_TYPE: json.loads,
+            self._codec.content_type: self._codec.decode,
+        }
+        if msgpack is not None:
+            self._decoders[MSGPACK_CONTENT_TYPE] = msgpack.unpackb
+
+    def encode(self, payload: Any) -> EncodedPayload:
+        body = self._codec.encode(payload)
+        if self._compress_min_bytes and len(body) >= self._compress_min_bytes:
+            return EncodedPayload(zstandard.compress(body), self._codec.content_type, ZSTD_CONTENT_ENCODING)
+
+        return EncodedPayload(body, self._codec.content_type)
+
+    def decode(self, body: bytes, content_type: str | None = None, content_encoding: str | None = None) -> Any:
+        """Raises ValueError for bodies that can't be decoded."""
+        decoder = self._decoders.get(content_type) or self._decoders[JSON_CONTENT_TYPE]
+
+        try:
+            if content_encoding == ZSTD_CONTENT_ENCODING:
+                if zstandard is None:
+                    raise ValueError("zstandard is required to decompress the payload")
+                body = zstandard.decompress(body)
+            elif content_encoding:
+                raise ValueError(f"Unknown content encoding '{content_encoding}'")
+
+            return decoder(body)
+        except ValueError:
+            raise
+        except Exception as e:
+            # msgpack and zstandard raise their own errors for corrupt data
+            raise ValueError(f"{type(e).__name__}: {e}") from e
@@ -1,28 +1,110 @@
+import heapq
 import json
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
 from typing import Any
 
 from domain.exceptions import KeyNotFoundException
 
 
+@dataclass
+class TemporaryStorageStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    evicted: int = 0
+
+
 class InMemoryTemporaryStorageService:
-    def __init__(self):
-        self._database = {}
+    """TemporaryStorageService kept in process memory.
+
+    Expired keys are swept from a min-heap of expiry times on every write, so keys that are
+    never read again don't pile up. When `capacity` is set the least recently used keys are
+    evicted to make room for new ones.
+    """
+
+    def __init__(self, capacity: int | None = None, clock: Callable[[], float] = time.monotonic):
+        self._database: OrderedDict[str, dict] = OrderedDict()
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.stats = TemporaryStorageStats()
+
+    def __len__(self) -> int:
+        return len(self._database)
+
+    def _is_expired(self, data: dict, now: float) -> bool:
+        return bool(data["ex"]) and data["ex"] <= now
 
-    def set(self, key: str, value: Any, expiration_seconds: int = 0) -> bool:
+    def _sweep(self, now: float) -> None:
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expiry, key = heapq.heappop(self._expiry_heap)
+            data = self._database.get(key)
+            # The key may have been overwritten or deleted since this heap entry was pushed
+            if data is not None and data["ex"] == expiry:
+                del self._database[key]
+                self.stats.expired += 1
+
+        # Overwritten keys leave stale heap entries behind, rebuild once they dominate the heap
+        if len(self._expiry_heap) > 2 * len(self._database) + 64:
+            self._expiry_heap = [(data["ex"], key) for key, data in self._database.items() if data["ex"]]
+            heapq.heapify(self._expiry_heap)
+
+    def sweep(self) -> None:
+        with self._lock:
+            self._sweep(self._clock())
+
+    def set(self, key: str, value: Any, expiration_seconds: int | None = None) -> bool:
         json_data = json.dumps(value) if type(value) is not bytes else value
-        expiry = time.time() + expiration_seconds if expiration_seconds > 0 else 0
-        self._database[key] = {"ex": expiry, "data": json_data}
+
+        with self._lock:
+            self._set(key, json_data, expiration_seconds, self._clock())
+
+        return True
+
+    def set_if_greater(self, key: str, value: int, expiration_seconds: int | None = None) -> bool:
+        """Sets `value` unless the key holds a value at least as large, atomically. Returns whether it was set."""
+        with self._lock:
+            now = self._clock()
+            data = self._database.get(key)
+            if data is not None and not self._is_expired(data, now) and json.loads(data["data"]) >= value:
+                return False
+
+            self._set(key, json.dumps(value), expiration_seconds, now)
+
         return True
 
+    def _set(self, key: str, json_data: str | bytes, expiration_seconds: int | None, now: float) -> None:
+        self._sweep(now)
+
+        expiry = now + expiration_seconds if expiration_seconds and expiration_seconds > 0 else 0
+        self._database[key] = {"ex": expiry, "data": json_data}
+        self._database.move_to_end(key)
+        if expiry:
+            heapq.heappush(self._expiry_heap, (expiry, key))
+
+        while self._capacity is not None and len(self._database) > self._capacity:
+            self._database.popitem(last=False)
+            self.stats.evicted += 1
+
     def get(self, key: str) -> Any:
-        data = self._database.get(key)
+        with self._lock:
+            data = self._database.get(key)
+
+            if data is None or self._is_expired(data, self._clock()):
+                self.stats.misses += 1
+                raise KeyNotFoundException
 
-        if data is None or (data["ex"] and data["ex"] <= time.time()):
-            raise KeyNotFoundException
+            self._database.move_to_end(key)
+            self.stats.hits += 1
 
         return json.loads(data["data"])
 
     def delete(self, key: str) -> bool:
-        data = self._database.pop(key, None)
-        return bool(data and (not data["ex"] or data["ex"] > time.time()))
+        with self._lock:
+            data = self._database.pop(key, None)
+            return bool(data and not self._is_expired(data, self._clock()))
@@ -1,7 +1,15 @@
+import asyncio
 import datetime
+import functools
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
 from dataclasses import dataclass
 from string import Template
+from typing import ParamSpec
+from typing import TypeVar
 
+from openai import AsyncOpenAI
 from pydantic_ai import Agent
 from pydantic_ai import FunctionToolset
 from pydantic_ai import ModelMessagesTypeAdapter
@@ -11,11 +19,15 @@ from pydantic_ai.messages import ModelRequest
 from pydantic_ai.messages import ModelResponse
 from pydantic_ai.messages import TextPart
 from pydantic_ai.messages import UserPromptPart
+from pydantic_ai.models import Model
+from pydantic_ai.models.openai import OpenAIChatModel
+from pydantic_ai.providers.deepseek import DeepSeekProvider
 from pydantic_core import to_jsonable_python
 
 from application.services.bill_service import BillService
 from application.services.category_service import CategoryService
 from application.services.registration_service import RegistrationService
+from application.use_cases import run_blocking
 from domain.entities import Bill
 from domain.entities import Category
 from domain.entities import Message
@@ -27,9 +39,20 @@ from domain.exceptions import CategoryNotFoundException
 from domain.exceptions import KeyNotFoundException
 from domain.ports.repositories import MessageRepository
 from domain.ports.services import TemporaryStorageService
+from infrastructure.config.settings import app_settings
+from infrastructure.metrics import metrics
 
 USER_MESSAGE_HISTORY_KEY_TEMPLATE = Template("user:$user_id:message_history")
 
+P = ParamSpec("P")
+R = TypeVar("R")
+
+llm_call_duration_seconds = metrics.histogram(
+    "llm_call_duration_seconds",
+    "Time agent runs took, including the model calls and tool calls of the run",
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+
 
 @dataclass
 class AgentDependencies:
@@ -40,7 +63,6 @@ class AgentDependencies:
 
 
 agent = Agent(
-    "deepseek:deepseek-chat",
     instructions="""
     You are an assistant that helps people have more control over their expenses.
     Your main goal is to save users expenses in the form of bills, with value, date and category.
@@ -58,6 +80,18 @@ agent = Agent(
 )
 
 
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
+
+def create_llm_client() -> AsyncOpenAI:
+    # Owns the HTTP connection pool to the LLM API, shared by every agent run in the process
+    return AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=app_settings.deepseek_api_key or None)
+
+
+def create_llm_model(llm_client: AsyncOpenAI) -> Model:
+    return OpenAIChatModel("deepseek-chat", provider=DeepSeekProvider(openai_client=llm_client))
+
+
 class PydanticAIAgentService:
     def __init__(
         self,
@@ -67,6 +101,7 @@ class PydanticAIAgentService:
         bill_service: BillService,
         category_service: CategoryService,
         message_history_ttl_seconds: int,
+        model: Model,
     ):
         self._message_repository = message_repository
         self._registration_service = registration_service
@@ -77,6 +112,7 @@ class PydanticAIAgentService:
         self._temp_storage_service = temp_storage_service
 
         self._agent = agent
+        self._model = model
 
         self._user_toolset = user_toolset
         self._guest_toolset = guest_toolset
@@ -121,16 +157,32 @@ class PydanticAIAgentService:
         agent_dependencies = self._load_agent_dependencies(user)
         toolset = user_toolset if user.is_registered else guest_toolset
 
-        message_history = self._load_user_message_history(user)
+        # Redis and the message repository are synchronous, keep them off the event loop
+        message_history = await run_blocking(self._load_user_message_history, user)
 
-        result = await self._agent.run(
-            message_body,
-            message_history=message_history,
-            deps=agent_dependencies,
-            toolsets=[toolset],
-        )
+        started_at = time.perf_counter()
+        outcome = "failure"
+        try:
+            result = await self._agent.run(
+                message_body,
+                model=self._model,
+                message_history=message_history,
+                deps=agent_dependencies,
+                toolsets=[toolset],
+            )
+            outcome = "success"
+        except asyncio.CancelledError:
+            # Superseded by a newer message
+            outcome = "cancelled"
+            raise
+        finally:
+            llm_call_duration_seconds.observe(
+                time.perf_counter() - started_at,
+                model=self._model.model_name,
+                outcome=outcome,
+            )
 
-        self._cache_user_message_history(user, to_jsonable_python(result.all_messages()))
+        await run_blocking(self._cache_user_message_history, user, to_jsonable_python(result.all_messages()))
 
         return result.output
 
@@ -139,7 +191,22 @@ user_toolset = FunctionToolset()
 guest_toolset = FunctionToolset()
 
 
+def blocking_tool(tool: Callable[P, R]) -> Callable[P, Awaitable[R]]:
+    """Runs a synchronous tool through run_blocking.
+
+    pydantic-ai would run it on its own threads, at the same time as the other tool calls of a
+    model response, while the tools share the task's database session.
+    """
+
+    @functools.wraps(tool)
+    async def run_tool(*args: P.args, **kwargs: P.kwargs) -> R:
+        return await run_blocking(tool, *args, **kwargs)
+
+    return run_tool
+
+
 @guest_toolset.tool
+@blocking_tool
 def register_user(ctx: RunContext[AgentDependencies], user_name: str) -> User:
     """Finishes the registration of the user
 
@@ -164,6 +231,7 @@ def get_user_name(ctx: RunContext[str]) -> str:
 
 
 @user_toolset.tool
+@blocking_tool
 def register_category(
     ctx: RunContext[AgentDependencies],
     name: str,
@@ -185,6 +253,7 @@ def register_category(
 
 
 @user_toolset.tool
+@blocking_tool
 def get_all_categories(ctx: RunContext[AgentDependencies]) -> list[dict]:
     """Gets all categories from a tenant.
 
@@ -196,6 +265,7 @@ def get_all_categories(ctx: RunContext[AgentDependencies]) -> list[dict]:
 
 
 @user_toolset.tool
+@blocking_tool
 def register_bill(
     ctx: RunContext[AgentDependencies],
     date: datetime.date,
@@ -220,6 +290,7 @@ def register_bill(
 
 
 @user_toolset.tool
+@blocking_tool
 def edit_bill(
     ctx: RunContext[AgentDependencies],
     bill_id: int,
@@ -248,6 +319,7 @@ def edit_bill(
 
 
 @user_toolset.tool
+@blocking_tool
 def get_bills(
     ctx: RunContext[AgentDependencies],
     date_range: tuple[datetime.date, datetime.date] | None = None,
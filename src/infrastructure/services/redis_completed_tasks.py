@@ -0,0 +1,55 @@
+import json
+import logging
+from collections.abc import Sequence
+from typing import Any
+
+from redis import asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCompletedTasks:
+    """Remembers the ids of completed tasks for `ttl_seconds`, so redelivered copies can be skipped.
+
+    A completed task is kept with the follow-ups it deferred for inline execution until they have
+    run or been published, so a redelivered copy can publish those a crash left behind.
+
+    Redis errors are logged and treated as "not completed": a duplicate run is better than a
+    lost one.
+    """
+
+    def __init__(self, client: redis.Redis, ttl_seconds: int = 86400, key_prefix: str = "task_done:"):
+        self._client = client
+        self._ttl_seconds = ttl_seconds
+        self._key_prefix = key_prefix
+
+    async def is_completed(self, task_id: str) -> bool:
+        try:
+            return bool(await self._client.exists(self._key_prefix + task_id))
+        except redis.RedisError:
+            logger.exception(f"Could not check whether task {task_id} completed, running it")
+            return False
+
+    async def mark_completed(
+        self,
+        task_id: str,
+        follow_ups: Sequence[tuple[str, dict[str, Any], str | None]] = (),
+    ) -> None:
+        try:
+            await self._client.set(self._key_prefix + task_id, json.dumps(list(follow_ups)), ex=self._ttl_seconds)
+        except redis.RedisError:
+            logger.exception(f"Could not mark task {task_id} as completed, a redelivery would run it again")
+
+    async def pending_follow_ups(self, task_id: str) -> list[tuple[str, dict[str, Any], str | None]]:
+        try:
+            value = await self._client.get(self._key_prefix + task_id)
+        except redis.RedisError:
+            logger.exception(f"Could not read the pending follow-ups of task {task_id}")
+            return []
+
+        follow_ups = json.loads(value) if value is not None else []
+        # Records written before follow-ups were kept hold 1
+        if not isinstance(follow_ups, list):
+            return []
+
+        return [tuple(follow_up) for follow_up in follow_ups]
@@ -0,0 +1,98 @@
+import asyncio
+import contextlib
+import logging
+import random
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+from redis import asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+
+class RedisKeyedLock:
+    """Lets one holder at a time run for each key, across tasks, processes and hosts.
+
+    Holders in the same process wait on an asyncio lock for the key, which hands it over in
+    the order they asked for it. Only the first in line polls Redis for a lease on the key,
+    which other processes are waiting on too. The lease expires after `lease_seconds` unless
+    renewed, so a crashed holder doesn't block the key for longer than that. Without a client
+    the lock only works within the process.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis | None,
+        lease_seconds: float = 30,
+        poll_seconds: float = 0.05,
+        key_prefix: str = "lock:",
+    ):
+        self._client = client
+        self._lease_ms = int(lease_seconds * 1000)
+        self._poll_seconds = poll_seconds
+        self._key_prefix = key_prefix
+        # Per key: the local lock and how many holders are using or waiting for it
+        self._local_locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        local_lock, users = self._local_locks.get(key) or (asyncio.Lock(), 0)
+        self._local_locks[key] = (local_lock, users + 1)
+        try:
+            async with local_lock:
+                if self._client is None:
+                    yield
+                    return
+
+                token = uuid.uuid4().hex
+                await self._acquire_lease(key, token)
+                renewer = asyncio.create_task(self._renew_lease(key, token))
+                try:
+                    yield
+                finally:
+                    renewer.cancel()
+                    await self._release_lease(key, token)
+        finally:
+            local_lock, users = self._local_locks[key]
+            if users == 1:
+                del self._local_locks[key]
+            else:
+                self._local_locks[key] = (local_lock, users - 1)
+
+    async def _acquire_lease(self, key: str, token: str) -> None:
+        while not await self._client.set(self._key_prefix + key, token, nx=True, px=self._lease_ms):
+            # Jittered so waiting processes don't poll in lockstep
+            await asyncio.sleep(self._poll_seconds * random.uniform(0.5, 1.5))
+
+    async def _renew_lease(self, key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(self._lease_ms / 3000)
+            try:
+                if not await self._if_holding(key, token, "pexpire", self._lease_ms):
+                    logger.warning(f"Lost the lease on '{key}', another holder may be running")
+                    return
+            except redis.RedisError:
+                logger.exception(f"Could not renew the lease on '{key}', retrying")
+
+    async def _release_lease(self, key: str, token: str) -> None:
+        try:
+            await self._if_holding(key, token, "delete")
+        except redis.RedisError:
+            logger.exception(f"Could not release the lease on '{key}', it expires on its own")
+
+    async def _if_holding(self, key: str, token: str, command: str, *args: Any) -> bool:
+        # Compare and set with WATCH, the lease may have expired and been taken by someone else
+        lease_key = self._key_prefix + key
+        async with self._client.pipeline(transaction=True) as pipeline:
+            try:
+                await pipeline.watch(lease_key)
+                if await pipeline.get(lease_key) != token.encode():
+                    return False
+
+                pipeline.multi()
+                getattr(pipeline, command)(lease_key, *args)
+                await pipeline.execute()
+                return True
+            except redis.WatchError:
+                return False
@@ -1,5 +1,7 @@
+import asyncio
 import json
 from collections.abc import AsyncIterator
+from collections.abc import Iterable
 
 from redis import asyncio as redis
 
@@ -8,17 +10,91 @@ from infrastructure.config.settings import app_settings
 async_redis_pool = redis.ConnectionPool(host=app_settings.redis_host, port=app_settings.redis_port)
 
 
+def _encode(event: str, data: dict) -> str:
+    return json.dumps({"event": event, "data": data})
+
+
+class RedisPublishBatcher:
+    """Buffers PUBLISH commands and sends them in one pipeline round trip.
+
+    A batch is flushed `flush_window_seconds` after its first message, or as soon as it holds
+    `max_batch_size` messages. `publish` returns once its batch has been sent and raises if
+    sending it failed.
+    """
+
+    def __init__(self, client: redis.Redis, flush_window_seconds: float, max_batch_size: int):
+        self._client = client
+        self._flush_window_seconds = flush_window_seconds
+        self._max_batch_size = max_batch_size
+        self._pending: list[tuple[str, str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flushing: set[asyncio.Task] = set()
+
+    async def publish(self, channel: str, message: str) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((channel, message, future))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._flush_window_seconds, self._flush)
+
+        await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _send(self, batch: list[tuple[str, str, asyncio.Future]]) -> None:
+        try:
+            async with self._client.pipeline(transaction=False) as pipeline:
+                for channel, message, _ in batch:
+                    pipeline.publish(channel, message)
+                await pipeline.execute()
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def close(self) -> None:
+        self._flush()
+        if self._flushing:
+            await asyncio.gather(*self._flushing)
+
+
 class RedisPubsubService:
-    def __init__(self, client: redis.Redis):
+    def __init__(self, client: redis.Redis, batcher: RedisPublishBatcher | None = None):
         self._client = client
+        self._batcher = batcher
         self._pubsub = client.pubsub(ignore_subscribe_messages=True)
 
     async def subscribe(self, channel: str) -> None:
         await self._pubsub.subscribe(channel)
 
     async def publish(self, channel: str, event: str, data: dict) -> None:
-        payload = {"event": event, "data": data}
-        await self._client.publish(channel=channel, message=json.dumps(payload))
+        if self._batcher is not None:
+            await self._batcher.publish(channel, _encode(event, data))
+            return
+
+        await self._client.publish(channel=channel, message=_encode(event, data))
+
+    async def publish_many(self, events: Iterable[tuple[str, str, dict]]) -> None:
+        async with self._client.pipeline(transaction=False) as pipeline:
+            for channel, event, data in events:
+                pipeline.publish(channel, _encode(event, data))
+            await pipeline.execute()
 
     async def listen(self) -> AsyncIterator[str]:
         async for message in self._pubsub.listen():
@@ -26,3 +102,6 @@ class RedisPubsubService:
                 continue
 
             yield message["data"].decode()
+
+    async def close(self) -> None:
+        await self._pubsub.aclose()
@@ -21,6 +21,21 @@ class RedisTemporaryStorageService:
         json_data = json.dumps(value) if type(value) != bytes else value
         return self._client.set(key, json_data, ex=expiration_seconds)
 
+    def set_if_greater(self, key: str, value: int, expiration_seconds: int | None = None) -> bool:
+        """Sets `value` unless the key holds a value at least as large, atomically. Returns whether it was set."""
+
+        def set_if_greater(pipeline: redis.client.Pipeline) -> bool:
+            current = pipeline.get(key)
+            if current is not None and json.loads(current) >= value:
+                return False
+
+            pipeline.multi()
+            pipeline.set(key, json.dumps(value), ex=expiration_seconds)
+            return True
+
+        # Retried from the start if another client writes the key before EXEC
+        return self._client.transaction(set_if_greater, key, value_from_callable=True)
+
     def get(self, key: str) -> Any:
         json_data = self._client.get(key)
 
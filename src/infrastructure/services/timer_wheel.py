@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+# Absorbs float error when turning times into tick numbers, 0.3 / 0.1 is 2.9999999999999996
+_TICK_EPSILON = 1e-9
+
+
+class TimerWheel:
+    """Hashed timer wheel running coroutine callbacks after a delay.
+
+    Scheduling is O(1) and a single task advances the wheel once per tick, so thousands of
+    pending timers cost one sleeping task. Timers live in process memory: they are run early
+    on `stop()` and lost if the process dies.
+    """
+
+    def __init__(self, tick_seconds: float = 0.1, slots: int = 512, clock: Callable[[], float] = time.monotonic):
+        self._tick_seconds = tick_seconds
+        self._slots: list[list[list]] = [[] for _ in range(slots)]
+        self._clock = clock
+        self._started_at = clock()
+        self._current_tick = 0
+        self._pending = 0
+        self._task: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def schedule(self, delay_seconds: float, callback: Callable[..., Awaitable], *args) -> None:
+        elapsed_ticks = (self._clock() - self._started_at) / self._tick_seconds
+        target_tick = math.ceil(elapsed_ticks + delay_seconds / self._tick_seconds - _TICK_EPSILON)
+        target_tick = max(target_tick, self._current_tick + 1)
+        ticks = target_tick - self._current_tick
+
+        # Each entry is [remaining full turns of the wheel, callback, args]
+        self._slots[target_tick % len(self._slots)].append([(ticks - 1) // len(self._slots), callback, args])
+        self._pending += 1
+
+    def _run(self, callback: Callable[..., Awaitable], args: tuple) -> None:
+        task = asyncio.ensure_future(callback(*args))
+        self._running.add(task)
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Timer callback failed", exc_info=task.exception())
+
+    def advance(self) -> None:
+        # Catches up on every tick that passed since the last call
+        due_tick = math.floor((self._clock() - self._started_at) / self._tick_seconds + _TICK_EPSILON)
+        while self._current_tick < due_tick:
+            self._current_tick += 1
+            slot = self._slots[self._current_tick % len(self._slots)]
+            waiting = []
+            for entry in slot:
+                if entry[0] > 0:
+                    entry[0] -= 1
+                    waiting.append(entry)
+                else:
+                    self._pending -= 1
+                    self._run(entry[1], entry[2])
+            slot[:] = waiting
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._tick_seconds)
+            self.advance()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        for slot in self._slots:
+            for _, callback, args in slot:
+                self._run(callback, args)
+            slot.clear()
+        self._pending = 0
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
@@ -0,0 +1,89 @@
+import inspect
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic import ConfigDict
+from pydantic import ValidationError
+from pydantic import create_model
+
+from application.use_cases import AsyncTask
+from domain.exceptions import TaskRejectedException
+from infrastructure.config.settings import app_settings
+from infrastructure.di import DIContainer
+from infrastructure.di import DIRegistry
+from infrastructure.services.amqp_async_task_dispatcher import task_queue_name
+
+
+@dataclass(frozen=True, slots=True)
+class TaskRoute:
+    name: str
+    task_cls: type[AsyncTask]
+    payload_model: type[BaseModel]
+
+    def validate(self, kwargs: Any) -> dict[str, Any]:
+        try:
+            payload = self.payload_model.model_validate(kwargs)
+        except ValidationError as e:
+            raise TaskRejectedException(f"Invalid payload for task '{self.name}': {e}") from e
+
+        return {name: getattr(payload, name) for name in type(payload).model_fields}
+
+    async def build(self, container: DIContainer) -> AsyncTask:
+        return await container.get(self.task_cls)
+
+
+def _create_payload_model(task_cls: type[AsyncTask]) -> type[BaseModel]:
+    fields = {}
+    for name, parameter in inspect.signature(task_cls.__call__).parameters.items():
+        if name == "self":
+            continue
+
+        annotation = Any if parameter.annotation is inspect.Parameter.empty else parameter.annotation
+        default = ... if parameter.default is inspect.Parameter.empty else parameter.default
+        fields[name] = (annotation, default)
+
+    return create_model(f"{task_cls.__name__}Payload", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+class TaskRegistry:
+    """Maps task names to their class and payload validator.
+
+    Task classes are registered in the DI registry too, so building one runs a precompiled plan.
+    """
+
+    def __init__(self, di_registry: DIRegistry):
+        self._di_registry = di_registry
+        self._routes: dict[str, TaskRoute] = {}
+
+    def register(self, task_cls: type[AsyncTask]) -> None:
+        self._di_registry.register(task_cls, factory=task_cls, dependencies=list(task_cls.dependencies))
+        self._routes[task_cls.__name__] = TaskRoute(task_cls.__name__, task_cls, _create_payload_model(task_cls))
+
+    def register_all(self, task_classes: Iterable[type[AsyncTask]]) -> None:
+        for task_cls in task_classes:
+            self.register(task_cls)
+
+    def get(self, task_name: str) -> TaskRoute | None:
+        return self._routes.get(task_name)
+
+    def queues(self) -> dict[str, int]:
+        """Prefetch count per queue of the registered tasks, the largest concurrency declared for it."""
+        prefetch_counts: dict[str, int] = {}
+        for route in self._routes.values():
+            queue_name = task_queue_name(route.task_cls.queue)
+            concurrency = route.task_cls.concurrency or app_settings.async_task_prefetch_count
+            prefetch_counts[queue_name] = max(prefetch_counts.get(queue_name, 0), concurrency)
+
+        return prefetch_counts
+
+    def route(self, payload: Any) -> tuple[TaskRoute, dict[str, Any]]:
+        if not isinstance(payload, dict):
+            raise TaskRejectedException("Task payload must be an object")
+
+        route = self._routes.get(payload.get("task"))
+        if route is None:
+            raise TaskRejectedException(f"Unknown task '{payload.get('task')}'")
+
+        return route, route.validate(payload.get("kwargs", {}))
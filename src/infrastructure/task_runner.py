@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from typing import Any
+
+from application.use_cases import blocking_calls_lock
+from domain.exceptions import TaskRejectedException
+from domain.exceptions import TaskRetryException
+from domain.ports.services import AsyncTaskDispatcherService
+from infrastructure.di import DIContainer
+from infrastructure.di import DIRegistry
+from infrastructure.inline_tasks import InlineTaskBatch
+from infrastructure.inline_tasks import current_inline_batch
+from infrastructure.metrics import metrics
+from infrastructure.persistence.database.query_timer import QueryTimer
+from infrastructure.persistence.database.query_timer import current_query_timer
+from infrastructure.services.amqp_async_task_dispatcher import get_delay_ms
+from infrastructure.services.redis_completed_tasks import RedisCompletedTasks
+from infrastructure.services.redis_keyed_lock import RedisKeyedLock
+from infrastructure.task_registry import TaskRegistry
+from infrastructure.task_registry import TaskRoute
+
+logger = logging.getLogger(__name__)
+
+inline_tasks_total = metrics.counter(
+    "worker_inline_tasks_total",
+    "Follow-up tasks deferred for inline execution, by outcome: inline, saturated, failed or interrupted",
+)
+tasks_total = metrics.counter(
+    "worker_tasks_total",
+    "Tasks consumed from the broker, by outcome: success, retry, failure (dead lettered) or superseded",
+)
+tasks_in_flight = metrics.gauge("worker_tasks_in_flight", "Tasks running, inline ones included")
+task_duration_seconds = metrics.histogram(
+    "worker_task_duration_seconds",
+    "Time tasks took to run and commit, without the inline follow-ups they dispatched",
+)
+task_db_seconds = metrics.histogram("worker_task_db_seconds", "Time tasks spent running database queries")
+duplicate_tasks_total = metrics.counter(
+    "worker_duplicate_tasks_total",
+    "Tasks skipped because a task with the same id already completed, e.g. redeliveries",
+)
+
+
+def retry_or_reject(route: TaskRoute, payload: dict, error: Exception) -> TaskRetryException | TaskRejectedException:
+    """The exception a failed task is reported to the consumer with, a retry while attempts remain."""
+    attempt = payload.get("attempt", 1)
+    reason = f"{type(error).__name__}: {error}"
+    retry_policy = route.task_cls.retry_policy
+    if attempt >= retry_policy.max_attempts:
+        return TaskRejectedException(f"Failed after {attempt} attempts, {reason}")
+
+    delay_ms = get_delay_ms(None, retry_policy.delay_seconds(attempt))
+    return TaskRetryException(reason, {**payload, "attempt": attempt + 1}, delay_ms)
+
+
+class TaskRunner:
+    """Runs a task in its own DI scope, then the follow-ups it deferred for inline execution.
+
+    Follow-ups of tasks marked `inline`, dispatched without a delay or with a countdown of at
+    most `inline_max_countdown_seconds`, run right after the dispatching scope commits instead
+    of going through the broker. Such short countdowns only wait for that commit. A follow-up
+    is published after all when `inline_concurrency` inline tasks are already running, or when
+    it fails, so the broker retries it. Follow-ups still to run when one can't be published or the
+    worker cancels the task are published too. An `inline_concurrency` of 0 turns this off.
+
+    Tasks with an id are skipped when a task with the same id already completed. Their follow-ups
+    are kept with the completion until they have run or been published, a skipped copy publishes
+    those left.
+    """
+
+    def __init__(
+        self,
+        di_registry: DIRegistry,
+        task_registry: TaskRegistry,
+        inline_concurrency: int = 0,
+        inline_max_countdown_seconds: float = 0,
+    ):
+        self._di_registry = di_registry
+        self._task_registry = task_registry
+        self._inline_concurrency = inline_concurrency
+        self._inline_max_delay_ms = inline_max_countdown_seconds * 1000
+        self._running_inline = 0
+
+    def _accepts_inline(self, task_name: str, delay_ms: int) -> bool:
+        route = self._task_registry.get(task_name)
+        return route is not None and route.task_cls.inline and delay_ms <= self._inline_max_delay_ms
+
+    async def run(self, route: TaskRoute, kwargs: dict[str, Any], task_id: str | None = None) -> None:
+        batch = InlineTaskBatch(self._accepts_inline) if self._inline_concurrency else None
+        batch_token = current_inline_batch.set(batch)
+        blocking_calls_lock_token = blocking_calls_lock.set(asyncio.Lock())
+        query_timer = QueryTimer()
+        query_timer_token = current_query_timer.set(query_timer)
+        started_at = time.perf_counter()
+        tasks_in_flight.inc()
+        completed_tasks = None
+        try:
+            async with self._di_registry.scope() as container:
+                if task_id is not None:
+                    completed_tasks = await container.get(RedisCompletedTasks)
+                serialize_by = route.task_cls.serialize_by
+                if serialize_by is None or kwargs.get(serialize_by) is None:
+                    follow_ups = await self._run_once(container, route, kwargs, task_id, completed_tasks, batch)
+                else:
+                    keyed_lock = await container.get(RedisKeyedLock)
+                    # Checked for duplicates under the lock too, a redelivered copy may be waiting on it
+                    async with keyed_lock.hold(f"{serialize_by}:{kwargs[serialize_by]}"):
+                        follow_ups = await self._run_once(container, route, kwargs, task_id, completed_tasks, batch)
+        finally:
+            tasks_in_flight.dec()
+            task_duration_seconds.observe(time.perf_counter() - started_at, task=route.name)
+            task_db_seconds.observe(query_timer.seconds, task=route.name)
+            current_query_timer.reset(query_timer_token)
+            blocking_calls_lock.reset(blocking_calls_lock_token)
+            current_inline_batch.reset(batch_token)
+
+        if follow_ups:
+            await self._run_follow_ups(follow_ups)
+            if completed_tasks is not None:
+                # Every follow-up ran or was published, a redelivery has nothing left to do
+                await completed_tasks.mark_completed(task_id)
+
+    async def _run_once(
+        self,
+        container: DIContainer,
+        route: TaskRoute,
+        kwargs: dict[str, Any],
+        task_id: str | None,
+        completed_tasks: RedisCompletedTasks | None,
+        batch: InlineTaskBatch | None,
+    ) -> list[tuple[str, dict[str, Any], str | None]]:
+        """Runs the task unless it already completed. Returns the follow-ups left to run."""
+        if completed_tasks is not None and await completed_tasks.is_completed(task_id):
+            logger.info(f"Skipping task {route.name} {task_id}, it already completed")
+            duplicate_tasks_total.inc(task=route.name)
+            # Left behind by a copy that stopped before running or publishing all of them
+            return await completed_tasks.pending_follow_ups(task_id)
+
+        task = await route.build(container)
+        await task(**kwargs)
+        # Committed before it is marked as completed, so a failed commit leaves the task to a retry,
+        # and before the lock is released, so the next task for the key sees what this one wrote
+        container.commit()
+        follow_ups = list(batch.tasks) if batch is not None else []
+        if completed_tasks is not None:
+            await completed_tasks.mark_completed(task_id, follow_ups)
+
+        return follow_ups
+
+    async def _run_follow_ups(self, follow_ups: list[tuple[str, dict[str, Any], str | None]]) -> None:
+        for index, (task_name, task_kwargs, task_id) in enumerate(follow_ups):
+            try:
+                await self._run_inline(self._task_registry.get(task_name), task_kwargs, task_id)
+            except Exception:
+                # Its publish failed, it's tried again with the rest. Should that fail too, the record
+                # in RedisCompletedTasks keeps them and a redelivery publishes them.
+                logger.exception(f"Could not run or publish inline task {task_name}")
+                await self._publish_interrupted(follow_ups[index:])
+                return
+            except asyncio.CancelledError:
+                # The interrupted one is published too, its id skips it if it completed
+                await self._publish_interrupted(follow_ups[index:])
+                raise
+
+    async def _run_inline(self, route: TaskRoute, kwargs: dict[str, Any], task_id: str | None) -> None:
+        if self._running_inline >= self._inline_concurrency:
+            inline_tasks_total.inc(task=route.name, outcome="saturated")
+            await self._publish(route, kwargs, task_id)
+            return
+
+        self._running_inline += 1
+        try:
+            await self.run(route, route.validate(kwargs), task_id)
+        except Exception:
+            # Its scope was not committed, the broker can retry it from scratch
+            logger.exception(f"Inline task {route.name} failed, publishing it")
+            inline_tasks_total.inc(task=route.name, outcome="failed")
+            await self._publish(route, kwargs, task_id)
+        else:
+            inline_tasks_total.inc(task=route.name, outcome="inline")
+        finally:
+            self._running_inline -= 1
+
+    async def _publish_interrupted(self, follow_ups: list[tuple[str, dict[str, Any], str | None]]) -> None:
+        logger.warning(f"Interrupted while running inline tasks, publishing {len(follow_ups)} of them")
+        for task_name, task_kwargs, task_id in follow_ups:
+            route = self._task_registry.get(task_name)
+            inline_tasks_total.inc(task=route.name, outcome="interrupted")
+            await self._publish(route, task_kwargs, task_id)
+
+    async def _publish(self, route: TaskRoute, kwargs: dict[str, Any], task_id: str | None) -> None:
+        # The dispatching scope has committed, so there is no need to keep its countdown
+        async with self._di_registry.scope() as container:
+            dispatcher = await container.get(AsyncTaskDispatcherService)
+            await dispatcher.dispatch(route.name, queue=route.task_cls.queue, task_id=task_id, **kwargs)
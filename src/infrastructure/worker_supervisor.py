@@ -0,0 +1,136 @@
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from collections.abc import Callable
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+
+from infrastructure.metrics import MetricsSnapshot
+from infrastructure.metrics import merge_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerSupervisor:
+    """Runs `target(index, metrics_queue)` in N child processes and keeps them running.
+
+    Children are spawned rather than forked, so each one imports the app from scratch and gets
+    its own event loop, DI registry, connection pools and AMQP channel. A child that exits while
+    the supervisor is running is restarted, at most once per `restart_delay_seconds` per slot.
+    SIGTERM and SIGINT are forwarded to the children as SIGTERM, and children that have not
+    exited after `shutdown_timeout_seconds` are killed.
+
+    Children put `(index, metrics.snapshot())` on the metrics queue, and `aggregated_metrics()`
+    adds them up across processes. Counters and histograms of exited children are kept so
+    totals don't go backwards on a restart, their gauges are dropped.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[int, Queue], None],
+        processes: int,
+        shutdown_timeout_seconds: float = 30,
+        restart_delay_seconds: float = 1,
+    ):
+        self._context = multiprocessing.get_context("spawn")
+        self._target = target
+        self._processes = processes
+        self._shutdown_timeout_seconds = shutdown_timeout_seconds
+        self._restart_delay_seconds = restart_delay_seconds
+        self._metrics_queue = self._context.Queue()
+        self._children: dict[int, BaseProcess] = {}
+        self._started_at: dict[int, float] = {}
+        self._metrics_by_child: dict[int, MetricsSnapshot] = {}
+        self._retired_metrics: MetricsSnapshot = {}
+        self._metrics_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.restarts = 0
+
+    def _start_child(self, index: int) -> None:
+        process = self._context.Process(
+            target=self._target,
+            args=(index, self._metrics_queue),
+            name=f"worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._children[index] = process
+        self._started_at[index] = time.monotonic()
+        logger.info(f"Started worker {index} with pid {process.pid}")
+
+    def _retire_child(self, index: int) -> None:
+        with self._metrics_lock:
+            snapshot = self._metrics_by_child.pop(index, None)
+            if snapshot:
+                self._retired_metrics = merge_snapshots([self._retired_metrics, snapshot], include_gauges=False)
+
+    def _collect_metrics(self, timeout: float) -> None:
+        try:
+            index, snapshot = self._metrics_queue.get(timeout=timeout)
+            while True:
+                with self._metrics_lock:
+                    self._metrics_by_child[index] = snapshot
+                index, snapshot = self._metrics_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _check_children(self) -> None:
+        for index, process in list(self._children.items()):
+            if process.is_alive() or self._stopping.is_set():
+                continue
+
+            if time.monotonic() - self._started_at[index] < self._restart_delay_seconds:
+                # Crash looping, wait before trying again
+                continue
+
+            logger.warning(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}, restarting")
+            process.close()
+            self._retire_child(index)
+            self._start_child(index)
+            self.restarts += 1
+
+    def aggregated_metrics(self) -> MetricsSnapshot:
+        with self._metrics_lock:
+            return merge_snapshots([self._retired_metrics, *self._metrics_by_child.values()])
+
+    def stop(self, *_) -> None:
+        self._stopping.set()
+
+    def run(self, install_signal_handlers: bool = True) -> None:
+        if install_signal_handlers:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        for index in range(self._processes):
+            self._start_child(index)
+
+        try:
+            while not self._stopping.is_set():
+                self._collect_metrics(timeout=0.5)
+                self._check_children()
+        finally:
+            self._shutdown()
+
+    def _shutdown(self) -> None:
+        logger.info("Stopping workers...")
+        for process in self._children.values():
+            if process.is_alive():
+                process.terminate()
+
+        # Keep reading the metrics queue while waiting, a child can't exit with unflushed queue data
+        deadline = time.monotonic() + self._shutdown_timeout_seconds
+        while any(process.is_alive() for process in self._children.values()) and time.monotonic() < deadline:
+            self._collect_metrics(timeout=0.1)
+
+        for index, process in self._children.items():
+            if process.is_alive():
+                logger.warning(f"Worker {index} (pid {process.pid}) did not stop in time, killing it")
+                process.kill()
+            process.join()
+
+        self._collect_metrics(timeout=0)
+        for index in list(self._children):
+            self._retire_child(index)
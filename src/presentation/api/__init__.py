@@ -5,7 +5,6 @@ from typing import Annotated
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import FastAPI
-from fastapi import Request
 from fastapi import WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
@@ -23,16 +22,11 @@ from presentation.api.routes import v1
 async def lifespan(app: FastAPI):
     await setup_global_registry()
     yield
+    await global_registry.shutdown()
 
 
 app = FastAPI(debug=app_settings.debug, lifespan=lifespan)
-
-
-@app.middleware("http")
-async def create_di_container(request: Request, call_next):
-    async with global_registry.scope():
-        response = await call_next(request)
-        return response
+app.state.di_registry = global_registry
 
 
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_credentials=True)
@@ -1,13 +1,14 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator
+from collections.abc import Awaitable
+from collections.abc import Callable
 from typing import Annotated
+from typing import TypeVar
 
-import redis
-from aio_pika import RobustChannel
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
 
 from application.services.authentication_service import AuthenticationService
 from application.services.bill_service import BillService
@@ -26,135 +27,50 @@ from domain.ports.services import PubsubService
 from domain.ports.services import TemporaryStorageService
 from domain.ports.services import UserEncodingService
 from domain.ports.services import WhatsappBrokerMessageService
-from infrastructure.config import settings
-from infrastructure.config.settings import app_settings
-from infrastructure.persistence.database import db_session
-from infrastructure.persistence.database.repositories.bill_repository import DBBillRepository
-from infrastructure.persistence.database.repositories.category_repository import DBCategoryRepository
-from infrastructure.persistence.database.repositories.message_repository import DBMessageRepository
-from infrastructure.persistence.database.repositories.tenant_repository import DBTenantRepository
-from infrastructure.persistence.database.repositories.user_repository import DBUserRepository
-from infrastructure.services.aio_pika_amqp_service import AioPikaAMQPService
-from infrastructure.services.aio_pika_amqp_service import AioPikaPoolService
-from infrastructure.services.amqp_async_task_dispatcher import AMQPAsyncTaskDispatcherService
-from infrastructure.services.amqp_whatsapp_broker_message_service import AMQPWhatsappBrokerMessageService
-from infrastructure.services.jwt_encoding_service import JWTUserEncodingService
-from infrastructure.services.pydanticai_agent_service import PydanticAIAgentService
-from infrastructure.services.redis_pubsub_service import RedisPubsubService
-from infrastructure.services.redis_temporary_storage_service import RedisTemporaryStorageService
+from infrastructure.di import DIContainer
+from infrastructure.di import DIRegistry
 
-security = HTTPBearer()
-
-aio_pika_pool_service = AioPikaPoolService(app_settings.rabbitmq_uri)
-
-
-def get_session() -> Generator[Session, None, None]:
-    if settings.app_settings.environment == "testing":
-        yield None
-        return
-
-    with db_session() as session:
-        yield session
-
-
-def get_tenant_repository(session: Annotated[Session, Depends(get_session)]) -> TenantRepository:
-    match settings.app_settings.environment:
-        case "testing":
-            return None
-        case _:
-            return DBTenantRepository(session)
-
-
-def get_user_repository(session: Annotated[Session, Depends(get_session)]) -> UserRepository:
-    match settings.app_settings.environment:
-        case "testing":
-            return None
-        case _:
-            return DBUserRepository(session)
-
-
-def get_bill_repository(session: Annotated[Session, Depends(get_session)]) -> BillRepository:
-    match settings.app_settings.environment:
-        case "testing":
-            return None
-        case _:
-            return DBBillRepository(session)
-
-
-def get_category_repository(session: Annotated[Session, Depends(get_session)]) -> CategoryRepository:
-    match settings.app_settings.environment:
-        case "testing":
-            return None
-        case _:
-            return DBCategoryRepository(session)
-
-
-def get_message_repository(session: Annotated[Session, Depends(get_session)]) -> MessageRepository:
-    match settings.app_settings.environment:
-        case "testing":
-            return None
-        case _:
-            return DBMessageRepository(session)
-
-
-def get_temporary_storage_service() -> TemporaryStorageService:
-    from infrastructure.services.redis_temporary_storage_service import redis_pool
-
-    match settings.app_settings.environment:
-        case "testing":
-            return None
-        case _:
-            return RedisTemporaryStorageService(redis.Redis(connection_pool=redis_pool))
-
-
-def get_user_encoding_service() -> UserEncodingService:
-    match settings.app_settings.environment:
-        case "testing":
-            return None
-        case _:
-            return JWTUserEncodingService()
+T = TypeVar("T")
 
-
-def get_authentication_service(
-    user_repository: Annotated[UserRepository, Depends(get_user_repository)],
-    temporary_storage_service: Annotated[TemporaryStorageService, Depends(get_temporary_storage_service)],
-    user_encoding_service: Annotated[UserEncodingService, Depends(get_user_encoding_service)],
-) -> AuthenticationService:
-    return AuthenticationService(
-        user_repository,
-        temporary_storage_service,
-        user_encoding_service,
-        app_settings.user_pin_ttl_seconds,
-        app_settings.user_token_ttl,
-    )
-
-
-def get_registration_service(
-    user_repository: Annotated[UserRepository, Depends(get_user_repository)],
-    tenant_repository: Annotated[UserRepository, Depends(get_tenant_repository)],
-    category_repository: Annotated[CategoryRepository, Depends(get_category_repository)],
-    temporary_storage_service: Annotated[TemporaryStorageService, Depends(get_temporary_storage_service)],
-) -> RegistrationService:
-    return RegistrationService(
-        user_repository,
-        tenant_repository,
-        category_repository,
-        temporary_storage_service,
-        app_settings.user_validation_token_ttl_seconds,
-    )
-
-
-def get_category_service(
-    category_repository: Annotated[CategoryRepository, Depends(get_category_repository)],
-) -> CategoryService:
-    return CategoryService(category_repository)
+security = HTTPBearer()
 
 
-def get_bill_service(
-    bill_repository: Annotated[BillRepository, Depends(get_bill_repository)],
-    category_repository: Annotated[CategoryRepository, Depends(get_category_repository)],
-) -> BillService:
-    return BillService(bill_repository, category_repository)
+async def get_di_container(connection: HTTPConnection) -> AsyncGenerator[DIContainer]:
+    # One container per request, so every dependency below shares the same session. It is
+    # committed when the path operation returns and before the response is sent.
+    registry: DIRegistry = connection.app.state.di_registry
+    container = registry.create_container()
+    try:
+        yield container
+        container.commit()
+    finally:
+        await container.close()
+
+
+def _provide(interface: type[T]) -> Callable[[DIContainer], Awaitable[T]]:
+    async def dependency(container: Annotated[DIContainer, Depends(get_di_container, scope="function")]) -> T:
+        return await container.get(interface)
+
+    dependency.__name__ = f"get_{interface.__name__}"
+    return dependency
+
+
+get_tenant_repository = _provide(TenantRepository)
+get_user_repository = _provide(UserRepository)
+get_bill_repository = _provide(BillRepository)
+get_category_repository = _provide(CategoryRepository)
+get_message_repository = _provide(MessageRepository)
+get_temporary_storage_service = _provide(TemporaryStorageService)
+get_user_encoding_service = _provide(UserEncodingService)
+get_authentication_service = _provide(AuthenticationService)
+get_registration_service = _provide(RegistrationService)
+get_category_service = _provide(CategoryService)
+get_bill_service = _provide(BillService)
+get_amqp_service = _provide(AMQPService)
+get_pubsub_service = _provide(PubsubService)
+get_async_task_dispatcher_service = _provide(AsyncTaskDispatcherService)
+get_whatsapp_broker_message_service = _provide(WhatsappBrokerMessageService)
+get_ai_agent_service = _provide(AIAgentService)
 
 
 def get_current_user(
@@ -165,50 +81,3 @@ def get_current_user(
         return authentication_service.authenticate_user(credentials.credentials)
     except AuthError as e:
         raise HTTPException(401) from e
-
-
-async def get_amqp_channel() -> RobustChannel:
-    return await aio_pika_pool_service.get_channel()
-
-
-def get_amqp_service(channel: Annotated[RobustChannel, Depends(get_amqp_channel)]) -> AMQPService:
-    return AioPikaAMQPService(channel)
-
-
-async def get_pubsub_service() -> PubsubService:
-    from infrastructure.services.redis_pubsub_service import async_redis_pool
-
-    if app_settings.environment != "testing":
-        return RedisPubsubService(client=redis.asyncio.Redis(connection_pool=async_redis_pool))
-
-
-def get_async_task_dispatcher_service(
-    amqp_service: Annotated[AMQPService, Depends(get_amqp_service)],
-) -> AsyncTaskDispatcherService:
-    if app_settings.environment != "testing":
-        return AMQPAsyncTaskDispatcherService(amqp_service)
-
-
-def get_whatsapp_broker_message_service(
-    amqp_service: Annotated[AMQPService, Depends(get_amqp_service)],
-) -> WhatsappBrokerMessageService:
-    if app_settings.environment != "testing":
-        return AMQPWhatsappBrokerMessageService(amqp_service)
-
-
-def get_ai_agent_service(
-    registration_service: Annotated[RegistrationService, Depends(get_registration_service)],
-    temp_storage_service: Annotated[TemporaryStorageService, Depends(get_temporary_storage_service)],
-    message_repo: Annotated[MessageRepository, Depends(get_message_repository)],
-    bill_service: Annotated[BillService, Depends(get_bill_service)],
-    category_service: Annotated[CategoryService, Depends(get_category_service)],
-) -> AIAgentService:
-    if app_settings.environment != "testing":
-        return PydanticAIAgentService(
-            registration_service=registration_service,
-            temp_storage_service=temp_storage_service,
-            message_repository=message_repo,
-            bill_service=bill_service,
-            category_service=category_service,
-            message_history_ttl_seconds=3600,
-        )
@@ -11,6 +11,8 @@ from pydantic import field_validator
 
 from application.services.authentication_service import AuthenticationService
 from application.services.registration_service import RegistrationService
+from application.use_cases.async_tasks import PROCESS_MESSAGE_COUNTDOWN_SECONDS
+from application.use_cases.async_tasks import ProcessMessage
 from domain.entities import MessageAuthor
 from domain.entities import MessageBroker
 from domain.exceptions import AuthError
@@ -129,7 +131,11 @@ async def login(
         tenant_id=user.tenant_id,
     )
 
-    await async_task_dispatcher_service.dispatch("process_message", message_id=message.id)
+    await ProcessMessage.dispatch(
+        async_task_dispatcher_service,
+        countdown=PROCESS_MESSAGE_COUNTDOWN_SECONDS,
+        message_id=message.id,
+    )
 
     return JSONResponse({"message": "A PIN was sent to your phone"})
 
@@ -5,6 +5,8 @@ from fastapi import APIRouter
 from fastapi import Depends
 from pydantic import BaseModel
 
+from application.use_cases.async_tasks import PROCESS_MESSAGE_COUNTDOWN_SECONDS
+from application.use_cases.async_tasks import ProcessMessage
 from domain.entities import MessageAuthor
 from domain.entities import MessageBroker
 from domain.entities import User
@@ -47,6 +49,10 @@ async def create(
         external_message_id=None,
     )
 
-    await async_task_dispatcher_service.dispatch("process_message", message_id=message.id)
+    await ProcessMessage.dispatch(
+        async_task_dispatcher_service,
+        countdown=PROCESS_MESSAGE_COUNTDOWN_SECONDS,
+        message_id=message.id,
+    )
 
     return message
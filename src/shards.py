@@ -0,0 +1,61 @@
+import argparse
+import logging
+
+from infrastructure.persistence.database import engine
+from infrastructure.persistence.database import shard_directory
+from infrastructure.persistence.database import shard_engines
+from infrastructure.persistence.database.sharding import backfill_directory
+from infrastructure.persistence.database.sharding import interleave_sequences
+from infrastructure.persistence.database.sharding import move_tenant
+
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage tenant shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    move_parser = subparsers.add_parser("move-tenant", help="Move a tenant and all of its rows to another shard")
+    move_parser.add_argument("tenant_id", type=int)
+    move_parser.add_argument("target_shard_id")
+    move_parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=5,
+        help="How long writes that started before the tenant became read-only get to commit",
+    )
+
+    subparsers.add_parser(
+        "backfill-directory",
+        help="Add tenants and users created before sharding to the shard directory, run it before turning sharding on",
+    )
+    subparsers.add_parser(
+        "interleave-sequences",
+        help="Make id sequences unique across shards, run it while nothing writes",
+    )
+
+    args = parser.parse_args()
+
+    if shard_directory is None:
+        parser.error("Sharding is disabled, set DATABASE_SHARD_URIS first")
+
+    match args.command:
+        case "move-tenant":
+            if args.target_shard_id not in shard_engines:
+                parser.error(f"Unknown shard '{args.target_shard_id}'")
+            move_tenant(shard_directory, shard_engines, args.tenant_id, args.target_shard_id, args.settle_seconds)
+            logger.info(f"Moved tenant {args.tenant_id} to shard {args.target_shard_id}")
+        case "backfill-directory":
+            tenants, phone_numbers = backfill_directory(shard_directory, engine)
+            logger.info(f"Added {tenants} tenants and {phone_numbers} phone numbers to the shard directory")
+        case "interleave-sequences":
+            interleave_sequences(shard_engines)
+            logger.info(f"Interleaved sequences across {len(shard_engines)} shards")
+
+
+if __name__ == "__main__":
+    main()
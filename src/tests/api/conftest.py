@@ -4,7 +4,16 @@ import pytest
 from fastapi.testclient import TestClient
 
 from domain.entities import User
+from domain.ports.repositories import BillRepository
+from domain.ports.repositories import CategoryRepository
+from domain.ports.repositories import MessageRepository
+from domain.ports.repositories import TenantRepository
+from domain.ports.repositories import UserRepository
 from domain.ports.services import AMQPService
+from domain.ports.services import TemporaryStorageService
+from infrastructure.di import DIRegistry
+from infrastructure.di import global_registry
+from infrastructure.di import register_dependencies
 from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
 from infrastructure.persistence.memory.repositories.category_repository import InMemoryCategoryRepository
 from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
@@ -27,7 +36,7 @@ def client():
 
 
 @pytest.fixture(autouse=True)
-def repositories_override(
+def di_registry(
     in_memory_user_repository: InMemoryUserRepository,
     in_memory_bill_repository: InMemoryBillRepository,
     in_memory_category_repository: InMemoryCategoryRepository,
@@ -36,15 +45,19 @@ def repositories_override(
     in_memory_temporary_storage_service: InMemoryTemporaryStorageService,
     mock_amqp_service: AMQPService,
 ):
-    app.dependency_overrides = {
-        dependencies.get_user_repository: lambda: in_memory_user_repository,
-        dependencies.get_bill_repository: lambda: in_memory_bill_repository,
-        dependencies.get_category_repository: lambda: in_memory_category_repository,
-        dependencies.get_message_repository: lambda: in_memory_message_repository,
-        dependencies.get_tenant_repository: lambda: in_memory_tenant_repository,
-        dependencies.get_temporary_storage_service: lambda: in_memory_temporary_storage_service,
-        dependencies.get_amqp_channel: lambda: mock_amqp_service,
-    }
+    registry = DIRegistry()
+    register_dependencies(registry)
+    registry.register(UserRepository, factory=lambda: in_memory_user_repository)
+    registry.register(BillRepository, factory=lambda: in_memory_bill_repository)
+    registry.register(CategoryRepository, factory=lambda: in_memory_category_repository)
+    registry.register(MessageRepository, factory=lambda: in_memory_message_repository)
+    registry.register(TenantRepository, factory=lambda: in_memory_tenant_repository)
+    registry.register(TemporaryStorageService, factory=lambda: in_memory_temporary_storage_service)
+    registry.register(AMQPService, factory=lambda: mock_amqp_service)
+
+    app.state.di_registry = registry
+    yield registry
+    app.state.di_registry = global_registry
 
 
 @pytest.fixture
@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+from domain.entities import User
+from domain.ports.repositories import UserRepository
+from infrastructure.di import DIRegistry
+from infrastructure.persistence.memory.repositories.user_repository import InMemoryUserRepository
+from infrastructure.services.jwt_encoding_service import JWTUserEncodingService
+
+
+def test_request_dependencies_share_one_scope(
+    client: TestClient,
+    di_registry: DIRegistry,
+    in_memory_user_repository: InMemoryUserRepository,
+    in_memory_registered_user: User,
+):
+    built = []
+
+    def build_user_repository() -> UserRepository:
+        built.append(in_memory_user_repository)
+        return in_memory_user_repository
+
+    di_registry.register(UserRepository, factory=build_user_repository)
+    token = JWTUserEncodingService().encode(in_memory_registered_user.phone_number, 60)
+
+    # Authentication and the route itself both need the user repository
+    for _ in range(2):
+        response = client.put(
+            "/api/v1/users/me",
+            json={"name": "Updated User Name"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+
+    assert len(built) == 2
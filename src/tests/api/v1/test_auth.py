@@ -126,7 +126,14 @@ def test_login(
     message = in_memory_message_repository.get_by_id(1)
 
     assert response.status_code == 200
-    mock_async_task_dispatcher_service.dispatch.assert_called_with("process_message", message_id=1)
+    mock_async_task_dispatcher_service.dispatch.assert_called_with(
+        "ProcessMessage",
+        queue=None,
+        eta=None,
+        countdown=1,
+        task_id=mock.ANY,
+        message_id=1,
+    )
     assert message.body.startswith("Seu PIN é ")
     assert message.author == MessageAuthor.SYSTEM
     assert message.broker == MessageBroker.WHATSAPP
@@ -104,4 +104,11 @@ def test_create_message(
         "user_id": 1,
     }
 
-    mock_async_task_dispatcher_service.dispatch.assert_called_with("process_message", message_id=1)
+    mock_async_task_dispatcher_service.dispatch.assert_called_with(
+        "ProcessMessage",
+        queue=None,
+        eta=None,
+        countdown=1,
+        task_id=mock.ANY,
+        message_id=1,
+    )
@@ -15,11 +15,13 @@ from domain.ports.services import AsyncTaskDispatcherService
 from domain.ports.services import PubsubService
 from domain.ports.services import WhatsappBrokerMessageService
 from infrastructure.persistence.memory.repositories import InMemoryDatabase
+from infrastructure.persistence.memory.repositories import InMemoryDatabaseSnapshot
 from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
 from infrastructure.persistence.memory.repositories.category_repository import InMemoryCategoryRepository
 from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
 from infrastructure.persistence.memory.repositories.tenant_repository import InMemoryTenantRepository
 from infrastructure.persistence.memory.repositories.user_repository import InMemoryUserRepository
+from infrastructure.persistence.memory.seed import seed_in_memory_database
 from infrastructure.services.in_memory_temporary_storage_service import InMemoryTemporaryStorageService
 
 
@@ -28,6 +30,22 @@ def in_memory_database() -> InMemoryDatabase:
     return InMemoryDatabase()
 
 
+@pytest.fixture(scope="session")
+def seeded_in_memory_database_snapshot() -> InMemoryDatabaseSnapshot:
+    in_memory_database = seed_in_memory_database(
+        InMemoryDatabase(),
+        tenants=5,
+        bills_per_tenant=2000,
+        messages_per_tenant=500,
+    )
+    return in_memory_database.snapshot()
+
+
+@pytest.fixture
+def seeded_in_memory_database(seeded_in_memory_database_snapshot: InMemoryDatabaseSnapshot) -> InMemoryDatabase:
+    return seeded_in_memory_database_snapshot.fork()
+
+
 @pytest.fixture
 def in_memory_user_repository(in_memory_database: InMemoryDatabase) -> InMemoryUserRepository:
     return InMemoryUserRepository(in_memory_database=in_memory_database)
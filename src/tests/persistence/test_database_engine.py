@@ -0,0 +1,17 @@
+from pathlib import Path
+
+from sqlalchemy import text
+
+from infrastructure.persistence.database import create_database_engine
+
+
+def test_sqlite_engine_uses_single_node_pragmas(tmp_path: Path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'billy.db'}")
+
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+    engine.dispose()
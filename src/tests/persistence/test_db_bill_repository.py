@@ -5,6 +5,7 @@ import pytest
 from sqlalchemy.orm import Session
 
 from domain.entities import Bill
+from domain.entities import BillBatch
 from domain.exceptions import BillNotFoundException
 from domain.exceptions import CategoryNotFoundException
 from domain.exceptions import FutureBillDateException
@@ -220,6 +221,52 @@ class TestDBBillRepositoryGetMany:
         assert len(bills) == 4
 
 
+class TestDBBillRepositoryGetTotal:
+    def test_get_total_for_tenant(
+        self,
+        db_bill_repository: DBBillRepository,
+        db_tenant: DBTenant,
+        db_bills: list[DBBill],
+    ):
+        assert db_bill_repository.get_total(tenant_id=db_tenant.id) == 750.00
+
+    def test_get_total_with_filters(
+        self,
+        db_bill_repository: DBBillRepository,
+        db_tenant: DBTenant,
+        db_bills: list[DBBill],
+    ):
+        date_range = (datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+        value_range = (150.00, 300.00)
+
+        total = db_bill_repository.get_total(tenant_id=db_tenant.id, date_range=date_range, value_range=value_range)
+
+        assert total == 500.00
+
+    def test_get_total_with_no_results(self, db_bill_repository: DBBillRepository, db_tenant: DBTenant):
+        assert db_bill_repository.get_total(tenant_id=db_tenant.id) == 0.0
+
+
+class TestDBBillRepositoryGetBatch:
+    def test_get_batch_matches_get_many(
+        self,
+        db_bill_repository: DBBillRepository,
+        db_tenant: DBTenant,
+        db_bills: list[DBBill],
+    ):
+        date_range = (datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+
+        batch = db_bill_repository.get_batch(tenant_id=db_tenant.id, date_range=date_range)
+
+        assert isinstance(batch, BillBatch)
+        assert len(batch) == 3
+        assert list(batch) == list(db_bill_repository.get_many(tenant_id=db_tenant.id, date_range=date_range))
+        assert batch.total() == 600.00
+
+    def test_get_batch_with_no_results(self, db_bill_repository: DBBillRepository, db_tenant: DBTenant):
+        assert len(db_bill_repository.get_batch(tenant_id=db_tenant.id)) == 0
+
+
 class TestDBBillRepositoryUpdate:
     def test_update_bill_date(self, db_bill_repository: DBBillRepository, db_tenant: DBTenant, db_sample_bill: DBBill):
         new_date = datetime.date(2025, 2, 1)
@@ -0,0 +1,259 @@
+import pytest
+from sqlalchemy import Engine
+from sqlalchemy import create_engine
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from domain.exceptions import PhoneNumberTakenException
+from domain.exceptions import TenantNotFoundException
+from domain.exceptions import TenantReadOnlyException
+from infrastructure.persistence.database.models import Base
+from infrastructure.persistence.database.models import DBTenant
+from infrastructure.persistence.database.models import DBUser
+from infrastructure.persistence.database.repositories.tenant_repository import DBTenantRepository
+from infrastructure.persistence.database.repositories.user_repository import DBUserRepository
+from infrastructure.persistence.database.sharding import ShardDirectory
+from infrastructure.persistence.database.sharding import backfill_directory
+from infrastructure.persistence.database.sharding import create_sharded_sessionmaker
+from infrastructure.persistence.database.sharding import move_tenant
+from infrastructure.persistence.database.sharding import next_interleaved_id
+
+
+@pytest.fixture
+def shard_engines() -> dict[str, Engine]:
+    engines = {}
+    for shard_id in ("0", "1"):
+        engines[shard_id] = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(engines[shard_id])
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+@pytest.fixture
+def shard_directory(engine: Engine, shard_engines: dict[str, Engine]) -> ShardDirectory:
+    return ShardDirectory(sessionmaker(bind=engine), shard_engines, cache_ttl_seconds=0)
+
+
+@pytest.fixture
+def sharded_session(shard_directory: ShardDirectory, shard_engines: dict[str, Engine]):
+    session = create_sharded_sessionmaker(shard_directory, shard_engines)()
+    yield session
+    session.rollback()
+    session.close()
+
+
+@pytest.fixture
+def sharded_tenant_repository(sharded_session) -> DBTenantRepository:
+    return DBTenantRepository(sharded_session)
+
+
+@pytest.fixture
+def sharded_user_repository(sharded_session) -> DBUserRepository:
+    return DBUserRepository(sharded_session)
+
+
+def count_users(engine: Engine) -> int:
+    with sessionmaker(bind=engine)() as session:
+        return session.query(DBUser).count()
+
+
+class TestShardedTenantRepository:
+    def test_create_assigns_tenants_to_least_loaded_shard(
+        self,
+        sharded_tenant_repository: DBTenantRepository,
+        shard_directory: ShardDirectory,
+    ):
+        tenants = [sharded_tenant_repository.create() for _ in range(4)]
+
+        shard_ids = [shard_directory.get_shard_id(tenant.id) for tenant in tenants]
+
+        assert sorted(shard_ids) == ["0", "0", "1", "1"]
+        assert len({tenant.id for tenant in tenants}) == 4
+
+    def test_rolled_back_tenant_is_removed_from_directory(
+        self,
+        sharded_session,
+        sharded_tenant_repository: DBTenantRepository,
+        shard_directory: ShardDirectory,
+    ):
+        tenant = sharded_tenant_repository.create()
+
+        sharded_session.rollback()
+
+        with pytest.raises(TenantNotFoundException):
+            shard_directory.get_shard_id(tenant.id)
+
+
+class TestShardedUserRepository:
+    def test_user_is_stored_in_tenant_shard_and_found_by_phone_number(
+        self,
+        sharded_session,
+        sharded_tenant_repository: DBTenantRepository,
+        sharded_user_repository: DBUserRepository,
+        shard_directory: ShardDirectory,
+        shard_engines: dict[str, Engine],
+    ):
+        sharded_tenant_repository.create()
+        tenant = sharded_tenant_repository.create()
+        sharded_user_repository.create(
+            phone_number="5541999999999",
+            name="Test",
+            tenant_id=tenant.id,
+            is_registered=True,
+        )
+        sharded_session.commit()
+
+        user = sharded_user_repository.get_by_phone_number("5541999999999")
+        shard_id = shard_directory.get_shard_id(tenant.id)
+
+        assert user.tenant_id == tenant.id
+        assert count_users(shard_engines[shard_id]) == 1
+        assert shard_directory.get_tenant_id_by_phone_number("5541999999999") == tenant.id
+
+    def test_phone_number_is_unique_across_shards(
+        self,
+        sharded_session,
+        sharded_tenant_repository: DBTenantRepository,
+        sharded_user_repository: DBUserRepository,
+    ):
+        tenant = sharded_tenant_repository.create()
+        another_tenant = sharded_tenant_repository.create()
+        sharded_user_repository.create(
+            phone_number="5541999999999",
+            name="Test",
+            tenant_id=tenant.id,
+            is_registered=True,
+        )
+
+        with pytest.raises(PhoneNumberTakenException):
+            sharded_user_repository.create(
+                phone_number="5541999999999",
+                name="Test",
+                tenant_id=another_tenant.id,
+                is_registered=True,
+            )
+
+    def test_get_by_unknown_phone_number_returns_none(self, sharded_user_repository: DBUserRepository):
+        assert sharded_user_repository.get_by_phone_number("5541999999999") is None
+
+
+class TestShardDirectory:
+    def test_get_shard_id_reads_directory_again_once_cache_expires(
+        self,
+        mocker,
+        engine: Engine,
+        shard_directory: ShardDirectory,
+        shard_engines: dict[str, Engine],
+    ):
+        monotonic = mocker.patch("infrastructure.persistence.database.sharding.time.monotonic", return_value=0)
+        other_process_directory = ShardDirectory(sessionmaker(bind=engine), shard_engines, cache_ttl_seconds=5)
+        tenant_id = shard_directory.assign_tenant()
+        shard_id = other_process_directory.get_shard_id(tenant_id)
+        target_shard_id = "1" if shard_id == "0" else "0"
+
+        shard_directory.set_shard_id(tenant_id, target_shard_id)
+
+        assert other_process_directory.get_shard_id(tenant_id) == shard_id
+        monotonic.return_value = 5
+        assert other_process_directory.get_shard_id(tenant_id) == target_shard_id
+
+    def test_writes_to_read_only_tenant_are_refused(
+        self,
+        sharded_session,
+        sharded_tenant_repository: DBTenantRepository,
+        sharded_user_repository: DBUserRepository,
+        shard_directory: ShardDirectory,
+    ):
+        tenant = sharded_tenant_repository.create()
+        sharded_session.commit()
+
+        shard_directory.set_read_only(tenant.id, True)
+
+        with pytest.raises(TenantReadOnlyException):
+            sharded_user_repository.create(
+                phone_number="5541999999999",
+                name="Test",
+                tenant_id=tenant.id,
+                is_registered=True,
+            )
+
+
+def test_next_interleaved_id_is_above_max_id_and_in_the_shard_series():
+    assert next_interleaved_id(0, 2, 1) == 3
+    assert next_interleaved_id(0, 2, 2) == 4
+    assert next_interleaved_id(41, 3, 1) == 43
+    assert next_interleaved_id(42, 3, 3) == 48
+
+
+class TestMoveTenant:
+    def test_move_tenant_copies_rows_and_updates_directory(
+        self,
+        sharded_session,
+        sharded_tenant_repository: DBTenantRepository,
+        sharded_user_repository: DBUserRepository,
+        shard_directory: ShardDirectory,
+        shard_engines: dict[str, Engine],
+    ):
+        tenant = sharded_tenant_repository.create()
+        sharded_user_repository.create(
+            phone_number="5541999999999",
+            name="Test",
+            tenant_id=tenant.id,
+            is_registered=True,
+        )
+        sharded_session.commit()
+        source_shard_id = shard_directory.get_shard_id(tenant.id)
+        target_shard_id = "1" if source_shard_id == "0" else "0"
+
+        move_tenant(shard_directory, shard_engines, tenant.id, target_shard_id, settle_seconds=0)
+
+        assert shard_directory.get_shard_id(tenant.id) == target_shard_id
+        assert count_users(shard_engines[source_shard_id]) == 0
+        assert count_users(shard_engines[target_shard_id]) == 1
+        shard_directory.check_writable(tenant.id)
+
+    def test_failed_move_keeps_tenant_on_source_shard_and_writable(
+        self,
+        sharded_session,
+        sharded_tenant_repository: DBTenantRepository,
+        shard_directory: ShardDirectory,
+        shard_engines: dict[str, Engine],
+    ):
+        tenant = sharded_tenant_repository.create()
+        sharded_session.commit()
+        source_shard_id = shard_directory.get_shard_id(tenant.id)
+        target_shard_id = "1" if source_shard_id == "0" else "0"
+        with shard_engines[target_shard_id].begin() as connection:
+            connection.execute(insert(DBTenant.__table__).values(id=tenant.id))
+
+        with pytest.raises(IntegrityError):
+            move_tenant(shard_directory, shard_engines, tenant.id, target_shard_id, settle_seconds=0)
+
+        assert shard_directory.get_shard_id(tenant.id) == source_shard_id
+        shard_directory.check_writable(tenant.id)
+
+
+class TestBackfillDirectory:
+    def test_adds_tenants_and_users_created_before_sharding_to_shard_zero(
+        self,
+        sharded_session,
+        sharded_tenant_repository: DBTenantRepository,
+        shard_directory: ShardDirectory,
+        shard_engines: dict[str, Engine],
+    ):
+        with shard_engines["0"].begin() as connection:
+            connection.execute(insert(DBTenant.__table__).values(id=7))
+            connection.execute(
+                insert(DBUser.__table__).values(phone_number="5541999999999", tenant_id=7, is_registered=True),
+            )
+
+        assert backfill_directory(shard_directory, shard_engines["0"]) == (1, 1)
+        assert backfill_directory(shard_directory, shard_engines["0"]) == (0, 0)
+        assert shard_directory.get_shard_id(7) == "0"
+        assert shard_directory.get_tenant_id_by_phone_number("5541999999999") == 7
+
+        tenant = sharded_tenant_repository.create()
+        sharded_session.commit()
+        assert tenant.id > 7
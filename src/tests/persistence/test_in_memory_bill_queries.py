@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+
+from domain.entities import Category
+from domain.entities import Tenant
+from infrastructure.persistence.memory.repositories import InMemoryDatabase
+from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
+
+
+@pytest.fixture(params=[False, True], ids=["date_index", "columnar"])
+def bill_repository(request, in_memory_database: InMemoryDatabase) -> InMemoryBillRepository:
+    if request.param:
+        pytest.importorskip("numpy")
+
+    return InMemoryBillRepository(in_memory_database, columnar=request.param)
+
+
+@pytest.fixture
+def bills(bill_repository: InMemoryBillRepository, in_memory_tenant: Tenant, in_memory_default_category: Category):
+    return [
+        bill_repository.create(
+            in_memory_tenant.id,
+            datetime.date(2025, 1, day),
+            float(day),
+            in_memory_default_category.id,
+        )
+        for day in (20, 5, 10, 10, 31)
+    ]
+
+
+def test_get_many_by_date_range_is_sorted_by_date_and_id(
+    bill_repository: InMemoryBillRepository,
+    in_memory_tenant: Tenant,
+    bills,
+):
+    date_range = (datetime.date(2025, 1, 5), datetime.date(2025, 1, 20))
+
+    result = list(bill_repository.get_many(in_memory_tenant.id, date_range=date_range))
+
+    assert [bill.id for bill in result] == [2, 3, 4, 1]
+
+
+def test_get_many_by_date_and_value_range(bill_repository: InMemoryBillRepository, in_memory_tenant: Tenant, bills):
+    date_range = (datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+
+    result = list(bill_repository.get_many(in_memory_tenant.id, date_range=date_range, value_range=(6.0, 25.0)))
+
+    assert sorted(bill.id for bill in result) == [1, 3, 4]
+
+
+def test_get_many_after_date_update(bill_repository: InMemoryBillRepository, in_memory_tenant: Tenant, bills):
+    bill_repository.update(in_memory_tenant.id, bills[4].id, date=datetime.date(2025, 1, 1))
+
+    date_range = (datetime.date(2025, 1, 1), datetime.date(2025, 1, 5))
+
+    result = list(bill_repository.get_many(in_memory_tenant.id, date_range=date_range))
+
+    assert [bill.id for bill in result] == [5, 2]
+
+
+def test_get_total(bill_repository: InMemoryBillRepository, in_memory_tenant: Tenant, bills):
+    assert bill_repository.get_total(in_memory_tenant.id) == 76.0
+    assert bill_repository.get_total(in_memory_tenant.id, value_range=(10.0, 20.0)) == 40.0
+    assert bill_repository.get_total(in_memory_tenant.id + 1) == 0.0
+
+
+def test_get_batch(bill_repository: InMemoryBillRepository, in_memory_tenant: Tenant, bills):
+    batch = bill_repository.get_batch(in_memory_tenant.id, value_range=(10.0, 20.0))
+
+    assert sorted(batch, key=lambda bill: bill.id) == [bills[0], bills[2], bills[3]]
+    assert batch.total() == 40.0
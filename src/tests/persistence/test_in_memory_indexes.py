@@ -0,0 +1,75 @@
+import datetime
+
+from domain.entities import Category
+from domain.entities import Message
+from domain.entities import Tenant
+from domain.entities import User
+from infrastructure.persistence.memory.repositories import InMemoryDatabase
+from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
+from infrastructure.persistence.memory.repositories.category_repository import InMemoryCategoryRepository
+from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
+from infrastructure.persistence.memory.repositories.user_repository import InMemoryUserRepository
+
+
+def test_user_phone_number_index(
+    in_memory_database: InMemoryDatabase,
+    in_memory_user_repository: InMemoryUserRepository,
+    in_memory_registered_user: User,
+):
+    assert in_memory_database.users_by_phone_number == {"5541999999999": in_memory_registered_user}
+    assert in_memory_user_repository.get_by_phone_number("5541999999999") is in_memory_registered_user
+    assert in_memory_user_repository.get_by_phone_number("5541000000000") is None
+
+
+def test_bills_are_indexed_by_tenant(
+    in_memory_bill_repository: InMemoryBillRepository,
+    in_memory_tenant: Tenant,
+    in_memory_another_tenant: Tenant,
+    in_memory_default_category: Category,
+    in_memory_category_from_another_tenant: Category,
+):
+    bill = in_memory_bill_repository.create(
+        in_memory_tenant.id,
+        datetime.date(2025, 1, 1),
+        10.0,
+        in_memory_default_category.id,
+    )
+    in_memory_bill_repository.create(
+        in_memory_another_tenant.id,
+        datetime.date(2025, 1, 1),
+        20.0,
+        in_memory_category_from_another_tenant.id,
+    )
+
+    updated_bill = in_memory_bill_repository.update(in_memory_tenant.id, bill.id, value=15.0)
+
+    assert list(in_memory_bill_repository.get_many(in_memory_tenant.id)) == [updated_bill]
+    assert list(in_memory_bill_repository.get_many(in_memory_tenant.id, value_range=(0.0, 10.0))) == []
+
+
+def test_categories_are_indexed_by_tenant(
+    in_memory_category_repository: InMemoryCategoryRepository,
+    in_memory_tenant: Tenant,
+    in_memory_default_category: Category,
+    in_memory_category_from_another_tenant: Category,
+):
+    in_memory_category_repository.update(in_memory_tenant.id, in_memory_default_category.id, name="Renamed")
+
+    assert list(in_memory_category_repository.get_all(in_memory_tenant.id)) == [in_memory_default_category]
+    assert in_memory_category_repository.get_by_name(in_memory_tenant.id, "Renamed") == in_memory_default_category
+
+
+def test_messages_are_indexed_by_tenant_and_user(
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_messages: list[Message],
+    in_memory_registered_user: User,
+    in_memory_registered_user_same_tenant: User,
+):
+    messages = in_memory_message_repository.get_all(in_memory_registered_user.id, in_memory_registered_user.tenant_id)
+    other_user_messages = in_memory_message_repository.get_all(
+        in_memory_registered_user_same_tenant.id,
+        in_memory_registered_user_same_tenant.tenant_id,
+    )
+
+    assert list(messages) == in_memory_messages
+    assert list(other_user_messages) == []
@@ -0,0 +1,69 @@
+import datetime
+
+from infrastructure.persistence.memory.repositories import InMemoryDatabase
+from infrastructure.persistence.memory.repositories import InMemoryDatabaseSnapshot
+from infrastructure.persistence.memory.repositories.bill_repository import InMemoryBillRepository
+from infrastructure.persistence.memory.repositories.category_repository import InMemoryCategoryRepository
+from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
+from infrastructure.persistence.memory.repositories.user_repository import InMemoryUserRepository
+
+
+def test_fork_sees_snapshot_data(seeded_in_memory_database: InMemoryDatabase):
+    bill_repository = InMemoryBillRepository(seeded_in_memory_database)
+    message_repository = InMemoryMessageRepository(seeded_in_memory_database)
+
+    assert len(list(bill_repository.get_many(tenant_id=1))) == 2000
+    assert len(list(message_repository.get_all(user_id=1, tenant_id=1))) == 500
+
+
+def test_bill_update_in_fork_does_not_leak(
+    seeded_in_memory_database_snapshot: InMemoryDatabaseSnapshot,
+    seeded_in_memory_database: InMemoryDatabase,
+):
+    bill_repository = InMemoryBillRepository(seeded_in_memory_database)
+
+    updated_bill = bill_repository.update(tenant_id=1, bill_id=1, date=datetime.date(2024, 12, 31), value=999.0)
+    other_fork = seeded_in_memory_database_snapshot.fork()
+    other_fork_bill = InMemoryBillRepository(other_fork).get_by_id(tenant_id=1, bill_id=1)
+
+    assert updated_bill is not seeded_in_memory_database_snapshot.bills[1]
+    assert other_fork_bill.value == 0.0
+    assert other_fork_bill.date == datetime.date(2020, 1, 1)
+    date_range = (datetime.date(2024, 12, 31), datetime.date(2024, 12, 31))
+    assert updated_bill in bill_repository.get_many(tenant_id=1, date_range=date_range)
+
+
+def test_creates_in_fork_do_not_leak(
+    seeded_in_memory_database_snapshot: InMemoryDatabaseSnapshot,
+    seeded_in_memory_database: InMemoryDatabase,
+):
+    bill_repository = InMemoryBillRepository(seeded_in_memory_database)
+
+    bill = bill_repository.create(tenant_id=1, date=datetime.date(2025, 1, 1), value=1.0, category_id=1)
+
+    assert bill.id == 10001
+    assert 10001 not in seeded_in_memory_database_snapshot.bills
+    assert len(seeded_in_memory_database_snapshot.bills_by_tenant[1]) == 2000
+    assert seeded_in_memory_database_snapshot.fork().bills_id_seq == 10000
+
+
+def test_user_and_category_updates_in_fork_do_not_leak(
+    seeded_in_memory_database_snapshot: InMemoryDatabaseSnapshot,
+    seeded_in_memory_database: InMemoryDatabase,
+):
+    user = InMemoryUserRepository(seeded_in_memory_database).update(1, 1, name="Renamed", is_registered=False)
+    category = InMemoryCategoryRepository(seeded_in_memory_database).update(1, 1, name="Renamed")
+
+    assert InMemoryUserRepository(seeded_in_memory_database).get_by_phone_number(user.phone_number).name == "Renamed"
+    assert seeded_in_memory_database_snapshot.users[1].name == "User 0"
+    assert list(InMemoryCategoryRepository(seeded_in_memory_database).get_all(1)) == [category]
+    assert seeded_in_memory_database_snapshot.categories[1].name == "default"
+
+
+def test_snapshot_of_live_database_keeps_database_writable(in_memory_database: InMemoryDatabase, in_memory_bills):
+    snapshot = in_memory_database.snapshot()
+
+    InMemoryBillRepository(in_memory_database).update(tenant_id=1, bill_id=1, value=1.0)
+
+    assert in_memory_database.bills[1].value == 1.0
+    assert snapshot.bills[1].value == 10.5
@@ -0,0 +1,297 @@
+import datetime
+import json
+from unittest import mock
+
+import aio_pika
+import pytest
+from aiormq.abc import DeliveredMessage
+from pamqp.commands import Basic
+from pamqp.header import ContentHeader
+
+from application.use_cases.async_tasks import RunAgent
+from domain.exceptions import TaskRejectedException
+from domain.exceptions import TaskRetryException
+from infrastructure.services.aio_pika_amqp_service import AioPikaAMQPService
+from infrastructure.services.aio_pika_amqp_service import consumer_lag_seconds
+from infrastructure.services.aio_pika_amqp_service import delay_queue_redeclare_seconds
+from infrastructure.services.amqp_async_task_dispatcher import AMQPAsyncTaskDispatcherService
+from infrastructure.services.timer_wheel import TimerWheel
+
+
+async def test_dispatch_publishes_immediately(mock_amqp_service):
+    dispatcher = AMQPAsyncTaskDispatcherService(mock_amqp_service)
+
+    await dispatcher.dispatch("ProcessMessage", message_id=1)
+
+    mock_amqp_service.publish.assert_awaited_once_with(
+        {"task": "ProcessMessage", "kwargs": {"message_id": 1}},
+        "async_tasks",
+        0,
+    )
+
+
+async def test_dispatch_publishes_to_task_queue(mock_amqp_service):
+    dispatcher = AMQPAsyncTaskDispatcherService(mock_amqp_service)
+
+    await RunAgent.dispatch(dispatcher, message_id=1)
+
+    mock_amqp_service.publish.assert_awaited_once_with(
+        {"task": "RunAgent", "kwargs": {"message_id": 1}, "id": mock.ANY},
+        "async_tasks.agent",
+        0,
+    )
+
+
+async def test_each_task_dispatch_gets_its_own_id(mock_amqp_service):
+    dispatcher = AMQPAsyncTaskDispatcherService(mock_amqp_service)
+
+    await RunAgent.dispatch(dispatcher, message_id=1)
+    await RunAgent.dispatch(dispatcher, message_id=1)
+
+    first_id, second_id = (call.args[0]["id"] for call in mock_amqp_service.publish.await_args_list)
+    assert first_id != second_id
+
+
+async def test_dispatch_with_countdown_rounds_delay_up(mock_amqp_service):
+    dispatcher = AMQPAsyncTaskDispatcherService(mock_amqp_service)
+
+    await dispatcher.dispatch("ProcessMessage", countdown=1.01, message_id=1)
+
+    assert mock_amqp_service.publish.await_args.args[2] == 1100
+
+
+@pytest.mark.freeze_time("2026-01-01 12:00:00")
+async def test_dispatch_with_eta(mock_amqp_service):
+    dispatcher = AMQPAsyncTaskDispatcherService(mock_amqp_service)
+
+    await dispatcher.dispatch("ProcessMessage", eta=datetime.datetime(2026, 1, 1, 12, 1, tzinfo=datetime.UTC))
+    await dispatcher.dispatch("ProcessMessage", eta=datetime.datetime(2026, 1, 1, 11, 0, tzinfo=datetime.UTC))
+
+    assert [call.args[2] for call in mock_amqp_service.publish.await_args_list] == [60_000, 0]
+
+
+@pytest.mark.freeze_time("2026-01-01 12:00:00")
+async def test_dispatch_with_naive_eta_treats_it_as_utc(mock_amqp_service):
+    dispatcher = AMQPAsyncTaskDispatcherService(mock_amqp_service)
+
+    await dispatcher.dispatch("ProcessMessage", eta=datetime.datetime(2026, 1, 1, 12, 1))
+
+    assert mock_amqp_service.publish.await_args.args[2] == 60_000
+
+
+async def test_dispatch_with_timer_wheel_publishes_through_pool(mocker, mock_amqp_service):
+    amqp_pool_service = mocker.AsyncMock()
+    timer_wheel = TimerWheel()
+    dispatcher = AMQPAsyncTaskDispatcherService(mock_amqp_service, timer_wheel, amqp_pool_service)
+
+    await dispatcher.dispatch("ProcessMessage", countdown=30, message_id=1)
+
+    mock_amqp_service.publish.assert_not_awaited()
+    assert len(timer_wheel) == 1
+
+    await timer_wheel.stop()
+
+    amqp_pool_service.publish.assert_awaited_once_with(
+        {"task": "ProcessMessage", "kwargs": {"message_id": 1}},
+        "async_tasks",
+    )
+
+
+async def test_amqp_service_publishes_delayed_message_to_ttl_queue(mocker):
+    channel = mocker.AsyncMock()
+    amqp_service = AioPikaAMQPService(channel)
+
+    await amqp_service.publish({"task": "ProcessMessage"}, "async_tasks", delay_ms=1000)
+    await amqp_service.publish({"task": "ProcessMessage"}, "async_tasks", delay_ms=1000)
+
+    channel.declare_queue.assert_awaited_once_with(
+        "async_tasks.delay.1000",
+        durable=True,
+        arguments={
+            "x-message-ttl": 1000,
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": "async_tasks",
+            "x-expires": 62_000,
+        },
+    )
+    assert channel.default_exchange.publish.await_args.args[1] == "async_tasks.delay.1000"
+
+
+@pytest.mark.parametrize(
+    ("body", "callback_error"),
+    [
+        (b"not json", None),
+        (b'{"task": "Unknown"}', TaskRejectedException("Unknown task 'Unknown'")),
+        (b'{"task": "ProcessMessage"}', RuntimeError("Bug in the worker")),
+    ],
+)
+async def test_amqp_service_dead_letters_rejected_messages(mocker, body, callback_error):
+    channel = mocker.AsyncMock()
+    amqp_service = AioPikaAMQPService(channel)
+    callback = mocker.AsyncMock(side_effect=callback_error)
+    await amqp_service.consume("async_tasks", callback, no_ack=False)
+    callback_fn = channel.declare_queue.return_value.consume.await_args.args[0]
+    message = mocker.MagicMock(body=body, headers={}, content_type=None, content_encoding=None)
+    message.process.return_value = mocker.AsyncMock()
+
+    await callback_fn(message)
+
+    dead_letter_message, queue_name = channel.default_exchange.publish.await_args.args
+    assert queue_name == "async_tasks.dead_letter"
+    assert dead_letter_message.body == body
+    assert "x-rejection-reason" in dead_letter_message.headers
+
+
+async def test_amqp_service_publishes_retries_to_delay_queue(mocker):
+    channel = mocker.AsyncMock()
+    amqp_service = AioPikaAMQPService(channel)
+    retry_payload = {"task": "ProcessMessage", "kwargs": {}, "attempt": 2}
+    callback = mocker.AsyncMock(side_effect=TaskRetryException("ConnectionError", retry_payload, 1000))
+    await amqp_service.consume("async_tasks", callback, no_ack=False)
+    callback_fn = channel.declare_queue.return_value.consume.await_args.args[0]
+    message = mocker.MagicMock(
+        body=b'{"task": "ProcessMessage", "kwargs": {}}',
+        headers={},
+        content_type=None,
+        content_encoding=None,
+    )
+    message.process.return_value = mocker.AsyncMock()
+
+    await callback_fn(message)
+
+    retry_message, queue_name = channel.default_exchange.publish.await_args.args
+    assert queue_name == "async_tasks.delay.1000"
+    assert json.loads(retry_message.body) == retry_payload
+
+
+async def test_amqp_service_replays_dead_letters_with_fresh_attempts(mocker):
+    channel = mocker.AsyncMock()
+    dead_letter = mocker.AsyncMock(
+        body=b'{"task": "ProcessMessage", "kwargs": {}, "attempt": 5}',
+        headers={"x-rejection-reason": "Failed after 5 attempts", "x-trace": "1"},
+        content_type=None,
+        content_encoding=None,
+    )
+    channel.declare_queue.return_value.get.side_effect = [dead_letter, None]
+    amqp_service = AioPikaAMQPService(channel)
+
+    replayed = await amqp_service.replay_dead_letters("async_tasks")
+
+    assert replayed == 1
+    channel.declare_queue.assert_awaited_once_with("async_tasks.dead_letter", durable=True)
+    message, queue_name = channel.default_exchange.publish.await_args.args
+    assert queue_name == "async_tasks"
+    assert json.loads(message.body) == {"task": "ProcessMessage", "kwargs": {}}
+    assert message.headers == {"x-trace": "1"}
+    dead_letter.ack.assert_awaited_once()
+
+
+async def test_amqp_service_peeks_dead_letters_without_removing_them(mocker):
+    channel = mocker.AsyncMock()
+    dead_letters = [
+        mocker.AsyncMock(body=b"not json", headers={"x-rejection-reason": "Undecodable payload"}),
+        mocker.AsyncMock(body=b"{}", headers={"x-rejection-reason": "Unknown task 'None'"}),
+    ]
+    channel.declare_queue.return_value.get.side_effect = [*dead_letters, None]
+    amqp_service = AioPikaAMQPService(channel)
+
+    peeked = await amqp_service.peek_dead_letters("async_tasks", limit=10)
+
+    assert [dead_letter.reason for dead_letter in peeked] == ["Undecodable payload", "Unknown task 'None'"]
+    for dead_letter in dead_letters:
+        dead_letter.nack.assert_awaited_once_with(requeue=True)
+    channel.default_exchange.publish.assert_not_awaited()
+
+
+async def test_amqp_service_measures_consumer_lag_from_when_messages_are_due(mocker):
+    channel = mocker.AsyncMock()
+    amqp_service = AioPikaAMQPService(channel)
+    await amqp_service.publish({"task": "ProcessMessage", "kwargs": {}}, "async_tasks", delay_ms=1000)
+    published_message = channel.default_exchange.publish.await_args.args[0]
+    lag_count = consumer_lag_seconds.get_count(queue="async_tasks")
+    await amqp_service.consume("async_tasks", mocker.AsyncMock(), no_ack=False)
+    callback_fn = channel.declare_queue.return_value.consume.await_args.args[0]
+    message = mocker.MagicMock(
+        body=published_message.body,
+        headers=published_message.headers,
+        content_type=published_message.content_type,
+        content_encoding=published_message.content_encoding,
+    )
+    message.process.return_value = mocker.AsyncMock()
+
+    await callback_fn(message)
+
+    assert consumer_lag_seconds.get_count(queue="async_tasks") == lag_count + 1
+    # Due a second after it was published, so it was consumed early rather than late
+    assert consumer_lag_seconds.get_sum(queue="async_tasks") < 1
+
+
+async def test_amqp_service_cancels_its_consumers(mocker):
+    channel = mocker.AsyncMock()
+    queue = channel.declare_queue.return_value
+    queue.consume.return_value = "ctag-1"
+    amqp_service = AioPikaAMQPService(channel)
+    await amqp_service.consume("async_tasks", mocker.AsyncMock(), no_ack=False)
+
+    await amqp_service.cancel_consumers()
+    await amqp_service.cancel_consumers()
+
+    queue.cancel.assert_awaited_once_with("ctag-1")
+
+
+def _returned_message(queue_name: str) -> DeliveredMessage:
+    return DeliveredMessage(
+        delivery=Basic.Return(reply_code=312, reply_text="NO_ROUTE", exchange="", routing_key=queue_name),
+        header=ContentHeader(),
+        body=b"",
+        channel=None,
+    )
+
+
+async def test_amqp_service_declares_an_expired_delay_queue_again_and_delivers(mocker):
+    channel = mocker.AsyncMock()
+    amqp_service = AioPikaAMQPService(channel)
+    await amqp_service.publish({"task": "ProcessMessage", "kwargs": {}}, "async_tasks", delay_ms=1000)
+    # The broker deleted the cached queue, the next publish comes back unroutable
+    channel.default_exchange.publish.side_effect = [_returned_message("async_tasks.delay.1000"), None]
+
+    await amqp_service.publish({"task": "ProcessMessage", "kwargs": {}}, "async_tasks", delay_ms=1000)
+
+    assert channel.declare_queue.await_count == 2
+    assert [call.args[1] for call in channel.default_exchange.publish.await_args_list] == ["async_tasks.delay.1000"] * 3
+
+
+async def test_amqp_service_declares_delay_queues_again_before_they_expire(mocker):
+    channel = mocker.AsyncMock()
+    amqp_service = AioPikaAMQPService(channel)
+    await amqp_service.publish({"task": "ProcessMessage", "kwargs": {}}, "async_tasks", delay_ms=1000)
+    await amqp_service.publish({"task": "ProcessMessage", "kwargs": {}}, "async_tasks", delay_ms=1000)
+    assert channel.declare_queue.await_count == 1
+
+    amqp_service._declared_delay_queues["async_tasks.delay.1000"] -= delay_queue_redeclare_seconds(1000) + 1
+    await amqp_service.publish({"task": "ProcessMessage", "kwargs": {}}, "async_tasks", delay_ms=1000)
+
+    assert channel.declare_queue.await_count == 2
+
+
+async def test_amqp_service_does_not_ack_a_retry_the_broker_could_not_route(mocker):
+    channel = mocker.AsyncMock()
+    channel.default_exchange.publish.return_value = _returned_message("async_tasks.delay.1000")
+    amqp_service = AioPikaAMQPService(channel)
+    retry_payload = {"task": "ProcessMessage", "kwargs": {}, "attempt": 2}
+    callback = mocker.AsyncMock(side_effect=TaskRetryException("ConnectionError", retry_payload, 1000))
+    await amqp_service.consume("async_tasks", callback, no_ack=False)
+    callback_fn = channel.declare_queue.return_value.consume.await_args.args[0]
+    message = mocker.MagicMock(
+        body=b'{"task": "ProcessMessage", "kwargs": {}}',
+        headers={},
+        content_type=None,
+        content_encoding=None,
+    )
+    message.process.return_value = mocker.AsyncMock()
+
+    with pytest.raises(aio_pika.exceptions.PublishError):
+        await callback_fn(message)
+
+    # Leaving process() with an error rejects the message back to its queue instead of acking it
+    assert message.process.return_value.__aexit__.await_args.args[0] is aio_pika.exceptions.PublishError
@@ -0,0 +1,99 @@
+import json
+import math
+
+import pytest
+
+from infrastructure.services import amqp_codecs
+from infrastructure.services.amqp_codecs import PayloadCodec
+
+PAYLOAD = {"task": "SendMessage", "kwargs": {"message_id": 1, "body": "Gastei R$ 50 no mercado ✓"}, "id": "abc"}
+
+
+def test_json_payloads_round_trip():
+    codec = PayloadCodec()
+
+    encoded = codec.encode(PAYLOAD)
+
+    assert encoded.content_type == "application/json"
+    assert encoded.content_encoding is None
+    assert codec.decode(encoded.body, encoded.content_type) == PAYLOAD
+
+
+def test_messages_without_content_type_are_decoded_as_json():
+    body = json.dumps(PAYLOAD).encode("utf-8")
+
+    assert PayloadCodec().decode(body, None, None) == PAYLOAD
+
+
+@pytest.mark.parametrize("content_type", ["", "text/plain", "application/octet-stream"])
+def test_messages_with_unknown_content_type_are_decoded_as_json(content_type: str):
+    body = json.dumps(PAYLOAD).encode("utf-8")
+
+    assert PayloadCodec().decode(body, content_type) == PAYLOAD
+
+
+def test_json_codec_decodes_with_the_standard_library():
+    # orjson refuses NaN, json accepts it
+    payload = PayloadCodec().decode(b'{"value": NaN}', "application/json")
+
+    assert math.isnan(payload["value"])
+
+
+@pytest.mark.parametrize(
+    ("body", "content_type", "content_encoding"),
+    [
+        (b"not json", None, None),
+        (b"not json", "text/csv", None),
+        (b"{}", "application/json", "gzip"),
+    ],
+)
+def test_undecodable_payloads_raise_value_error(body: bytes, content_type: str | None, content_encoding: str | None):
+    with pytest.raises(ValueError):
+        PayloadCodec().decode(body, content_type, content_encoding)
+
+
+def test_unknown_codec_is_refused():
+    with pytest.raises(ValueError, match="Unknown codec 'yaml'"):
+        PayloadCodec("yaml")
+
+
+def test_codec_without_its_library_is_refused(monkeypatch):
+    monkeypatch.setattr(amqp_codecs, "msgpack", None)
+
+    with pytest.raises(RuntimeError, match="install billyai\\[amqp-codecs\\]"):
+        PayloadCodec("msgpack")
+
+
+def test_orjson_payloads_are_json():
+    pytest.importorskip("orjson")
+    codec = PayloadCodec("orjson")
+
+    encoded = codec.encode(PAYLOAD)
+
+    assert encoded.content_type == "application/json"
+    assert json.loads(encoded.body) == PAYLOAD
+    assert codec.decode(json.dumps(PAYLOAD).encode("utf-8"), None) == PAYLOAD
+
+
+def test_msgpack_payloads_round_trip_and_json_still_decodes():
+    pytest.importorskip("msgpack")
+    codec = PayloadCodec("msgpack")
+
+    encoded = codec.encode(PAYLOAD)
+
+    assert encoded.content_type == "application/msgpack"
+    assert codec.decode(encoded.body, encoded.content_type) == PAYLOAD
+    assert codec.decode(json.dumps(PAYLOAD).encode("utf-8"), "application/json") == PAYLOAD
+
+
+def test_large_payloads_are_compressed():
+    pytest.importorskip("zstandard")
+    codec = PayloadCodec(compress_min_bytes=1024)
+    large_payload = {**PAYLOAD, "kwargs": {"body": "Oi " * 1000}}
+
+    small, large = codec.encode(PAYLOAD), codec.encode(large_payload)
+
+    assert small.content_encoding is None
+    assert large.content_encoding == "zstd"
+    assert len(large.body) < 1024
+    assert codec.decode(large.body, large.content_type, large.content_encoding) == large_payload
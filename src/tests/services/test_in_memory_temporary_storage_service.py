@@ -0,0 +1,97 @@
+import pytest
+
+from domain.exceptions import KeyNotFoundException
+from infrastructure.services.in_memory_temporary_storage_service import InMemoryTemporaryStorageService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def test_set_and_get_success(clock: FakeClock):
+    storage_service = InMemoryTemporaryStorageService(clock=clock)
+
+    storage_service.set("session_123", {"user_id": 1}, expiration_seconds=60)
+
+    assert storage_service.get("session_123") == {"user_id": 1}
+    assert storage_service.stats.hits == 1
+
+
+def test_get_expired_key_raises_exception(clock: FakeClock):
+    storage_service = InMemoryTemporaryStorageService(clock=clock)
+    storage_service.set("pin", "1234", expiration_seconds=60)
+
+    clock.now += 60
+
+    with pytest.raises(KeyNotFoundException):
+        storage_service.get("pin")
+    assert storage_service.stats.misses == 1
+
+
+def test_set_sweeps_expired_keys(clock: FakeClock):
+    storage_service = InMemoryTemporaryStorageService(clock=clock)
+    for i in range(10):
+        storage_service.set(f"pin_{i}", "1234", expiration_seconds=60)
+    storage_service.set("history", [], expiration_seconds=600)
+
+    clock.now += 60
+    storage_service.set("other", "value")
+
+    assert len(storage_service) == 2
+    assert storage_service.stats.expired == 10
+
+
+def test_overwritten_key_is_not_swept_by_stale_expiry(clock: FakeClock):
+    storage_service = InMemoryTemporaryStorageService(clock=clock)
+    storage_service.set("pin", "1234", expiration_seconds=60)
+    storage_service.set("pin", "5678", expiration_seconds=600)
+
+    clock.now += 60
+    storage_service.sweep()
+
+    assert storage_service.get("pin") == "5678"
+
+
+def test_capacity_evicts_least_recently_used(clock: FakeClock):
+    storage_service = InMemoryTemporaryStorageService(capacity=2, clock=clock)
+    storage_service.set("a", 1)
+    storage_service.set("b", 2)
+    storage_service.get("a")
+
+    storage_service.set("c", 3)
+
+    assert storage_service.get("a") == 1
+    assert storage_service.get("c") == 3
+    with pytest.raises(KeyNotFoundException):
+        storage_service.get("b")
+    assert storage_service.stats.evicted == 1
+
+
+def test_delete_expired_key_returns_false(clock: FakeClock):
+    storage_service = InMemoryTemporaryStorageService(clock=clock)
+    storage_service.set("pin", "1234", expiration_seconds=60)
+
+    clock.now += 61
+
+    assert storage_service.delete("pin") is False
+
+
+def test_set_if_greater_only_moves_forward(clock: FakeClock):
+    storage_service = InMemoryTemporaryStorageService(clock=clock)
+
+    assert storage_service.set_if_greater("latest", 2, expiration_seconds=60)
+    assert not storage_service.set_if_greater("latest", 1, expiration_seconds=60)
+    assert storage_service.get("latest") == 2
+
+    clock.now += 61
+    assert storage_service.set_if_greater("latest", 1, expiration_seconds=60)
+    assert storage_service.get("latest") == 1
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.messages import ModelResponse
+from pydantic_ai.messages import TextPart
+from pydantic_ai.messages import ToolCallPart
+from pydantic_ai.messages import ToolReturnPart
+from pydantic_ai.models.function import AgentInfo
+from pydantic_ai.models.function import FunctionModel
+
+from application.use_cases import blocking_calls_lock
+from domain.entities import User
+from infrastructure.blocking_executor import InstrumentedThreadPoolExecutor
+from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
+from infrastructure.services.in_memory_temporary_storage_service import InMemoryTemporaryStorageService
+from infrastructure.services.pydanticai_agent_service import PydanticAIAgentService
+
+
+async def test_tool_calls_of_one_response_run_one_at_a_time_through_run_blocking(
+    mocker,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_temporary_storage_service: InMemoryTemporaryStorageService,
+    in_memory_registered_user: User,
+):
+    running, overlapped = 0, False
+    thread_names = []
+    counter_lock = threading.Lock()
+
+    def service_call(*args, **kwargs) -> list:
+        nonlocal running, overlapped
+        with counter_lock:
+            running += 1
+            overlapped |= running > 1
+            thread_names.append(threading.current_thread().name)
+        time.sleep(0.02)
+        with counter_lock:
+            running -= 1
+        return []
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if any(isinstance(part, ToolReturnPart) for message in messages for part in message.parts):
+            return ModelResponse(parts=[TextPart("Nenhuma conta")])
+
+        return ModelResponse(parts=[ToolCallPart("get_all_categories", {}), ToolCallPart("get_bills", {})])
+
+    bill_service = mocker.Mock()
+    bill_service.get_many.side_effect = service_call
+    category_service = mocker.Mock()
+    category_service.get_all.side_effect = service_call
+    agent_service = PydanticAIAgentService(
+        registration_service=mocker.Mock(),
+        temp_storage_service=in_memory_temporary_storage_service,
+        message_repository=in_memory_message_repository,
+        bill_service=bill_service,
+        category_service=category_service,
+        message_history_ttl_seconds=60,
+        model=FunctionModel(respond),
+    )
+    executor = InstrumentedThreadPoolExecutor(max_workers=4, thread_name_prefix="blocking-test")
+    asyncio.get_running_loop().set_default_executor(executor)
+    token = blocking_calls_lock.set(asyncio.Lock())
+
+    try:
+        answer = await agent_service.run("Quanto gastei?", in_memory_registered_user)
+    finally:
+        blocking_calls_lock.reset(token)
+        executor.shutdown()
+
+    assert answer == "Nenhuma conta"
+    assert len(thread_names) == 2
+    assert all(name.startswith("blocking-test") for name in thread_names)
+    assert not overlapped
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from fakeredis import aioredis
+
+from infrastructure.services.redis_keyed_lock import RedisKeyedLock
+
+
+@pytest.fixture
+async def redis_client():
+    client = aioredis.FakeRedis()
+    yield client
+    await client.flushall()
+    await client.aclose()
+
+
+async def _hold(keyed_lock: RedisKeyedLock, key: str, name: str, events: list[str], seconds: float = 0.01):
+    async with keyed_lock.hold(key):
+        events.append(f"{name} start")
+        await asyncio.sleep(seconds)
+        events.append(f"{name} end")
+
+
+async def test_holders_of_a_key_run_one_at_a_time_in_order(redis_client: aioredis.FakeRedis):
+    keyed_lock = RedisKeyedLock(redis_client)
+    events = []
+
+    await asyncio.gather(*(_hold(keyed_lock, "user_id:1", name, events) for name in "abc"))
+
+    assert events == ["a start", "a end", "b start", "b end", "c start", "c end"]
+    assert await redis_client.get("lock:user_id:1") is None
+    assert keyed_lock._local_locks == {}
+
+
+async def test_holders_of_different_keys_run_in_parallel(redis_client: aioredis.FakeRedis):
+    keyed_lock = RedisKeyedLock(redis_client)
+    events = []
+
+    await asyncio.gather(_hold(keyed_lock, "user_id:1", "a", events), _hold(keyed_lock, "user_id:2", "b", events))
+
+    assert events[:2] == ["a start", "b start"]
+
+
+async def test_lease_excludes_other_processes(redis_client: aioredis.FakeRedis):
+    # Two locks on the same Redis stand in for two worker processes
+    first, second = RedisKeyedLock(redis_client, poll_seconds=0.01), RedisKeyedLock(redis_client, poll_seconds=0.01)
+    events = []
+
+    await asyncio.gather(_hold(first, "user_id:1", "a", events, 0.05), _hold(second, "user_id:1", "b", events))
+
+    assert events == ["a start", "a end", "b start", "b end"]
+
+
+async def test_lease_is_renewed_while_held(redis_client: aioredis.FakeRedis):
+    first = RedisKeyedLock(redis_client, lease_seconds=0.1)
+    second = RedisKeyedLock(redis_client, lease_seconds=0.1, poll_seconds=0.01)
+    events = []
+
+    await asyncio.gather(_hold(first, "user_id:1", "a", events, 0.3), _hold(second, "user_id:1", "b", events))
+
+    assert events == ["a start", "a end", "b start", "b end"]
+
+
+async def test_expired_lease_taken_by_someone_else_is_not_released(redis_client: aioredis.FakeRedis):
+    keyed_lock = RedisKeyedLock(redis_client)
+
+    async with keyed_lock.hold("user_id:1"):
+        await redis_client.set("lock:user_id:1", "other holder")
+
+    assert await redis_client.get("lock:user_id:1") == b"other holder"
+
+
+async def test_without_client_only_serializes_in_process():
+    keyed_lock = RedisKeyedLock(None)
+    events = []
+
+    await asyncio.gather(_hold(keyed_lock, "user_id:1", "a", events), _hold(keyed_lock, "user_id:1", "b", events))
+
+    assert events == ["a start", "a end", "b start", "b end"]
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from collections.abc import Awaitable
 from collections.abc import Callable
@@ -6,6 +7,7 @@ import pytest
 import redis
 from fakeredis import aioredis
 
+from infrastructure.services.redis_pubsub_service import RedisPublishBatcher
 from infrastructure.services.redis_pubsub_service import RedisPubsubService
 
 
@@ -75,3 +77,62 @@ class TestRedisPubsubService:
             break
 
         assert msg == json.dumps({"event": "msg", "data": {"text": "hello"}})
+
+    async def test_publish_many_sends_every_event(
+        self,
+        pubsub_subscribed_to_channel,
+        pubsub_service: RedisPubsubService,
+    ):
+        await pubsub_service.publish_many(
+            [
+                ("test-channel", "new-message", {"id": 1}),
+                ("other-channel", "new-message", {"id": 2}),
+                ("test-channel", "new-message", {"id": 3}),
+            ],
+        )
+
+        received = []
+        while message := await pubsub_subscribed_to_channel.get_message(ignore_subscribe_messages=True, timeout=0.1):
+            received.append(json.loads(message["data"].decode())["data"]["id"])
+        assert received == [1, 3]
+
+
+@pytest.mark.asyncio
+class TestRedisPublishBatcher:
+    async def test_publishes_concurrent_events_in_one_pipeline(
+        self,
+        mocker,
+        redis_client: aioredis.FakeRedis,
+        pubsub_subscribed_to_channel,
+    ):
+        pipeline = mocker.spy(redis_client, "pipeline")
+        pubsub_service = RedisPubsubService(redis_client, RedisPublishBatcher(redis_client, 0.01, 100))
+
+        await asyncio.gather(*(pubsub_service.publish("test-channel", "new-message", {"id": i}) for i in range(3)))
+
+        assert pipeline.call_count == 1
+        received = []
+        while message := await pubsub_subscribed_to_channel.get_message(ignore_subscribe_messages=True, timeout=0.1):
+            received.append(json.loads(message["data"].decode())["data"]["id"])
+        assert received == [0, 1, 2]
+
+    async def test_full_batch_is_flushed_without_waiting(self, redis_client: aioredis.FakeRedis):
+        batcher = RedisPublishBatcher(redis_client, flush_window_seconds=60, max_batch_size=2)
+
+        await asyncio.wait_for(asyncio.gather(batcher.publish("a", "1"), batcher.publish("a", "2")), timeout=5)
+
+    async def test_publish_raises_when_the_batch_fails(self, mocker, redis_client: aioredis.FakeRedis):
+        mocker.patch.object(redis_client, "pipeline", side_effect=redis.ConnectionError)
+        batcher = RedisPublishBatcher(redis_client, flush_window_seconds=0.01, max_batch_size=100)
+
+        with pytest.raises(redis.ConnectionError):
+            await batcher.publish("a", "1")
+
+    async def test_close_flushes_pending_events(self, redis_client: aioredis.FakeRedis):
+        batcher = RedisPublishBatcher(redis_client, flush_window_seconds=60, max_batch_size=100)
+        publish = asyncio.create_task(batcher.publish("a", "1"))
+        await asyncio.sleep(0)
+
+        await batcher.close()
+
+        assert publish.done() and publish.exception() is None
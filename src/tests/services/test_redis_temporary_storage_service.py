@@ -59,3 +59,12 @@ def test_delete_non_existent_key_returns_false(storage_service: RedisTemporarySt
     result = storage_service.delete("not_here")
 
     assert result is False
+
+
+def test_set_if_greater_only_moves_forward(storage_service: RedisTemporaryStorageService, redis_client):
+    assert storage_service.set_if_greater("latest", 2, expiration_seconds=60)
+    assert not storage_service.set_if_greater("latest", 1, expiration_seconds=60)
+    assert storage_service.set_if_greater("latest", 3, expiration_seconds=60)
+
+    assert storage_service.get("latest") == 3
+    assert 0 < redis_client.ttl("latest") <= 60
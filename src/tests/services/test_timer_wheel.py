@@ -0,0 +1,56 @@
+import asyncio
+
+from infrastructure.services.timer_wheel import TimerWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_runs_callbacks_once_due():
+    clock = FakeClock()
+    timer_wheel = TimerWheel(tick_seconds=0.1, slots=8, clock=clock)
+    fired = []
+
+    async def callback(name: str):
+        fired.append(name)
+
+    timer_wheel.schedule(0.25, callback, "soon")
+    timer_wheel.schedule(5, callback, "after several turns")
+
+    clock.now = 0.2
+    timer_wheel.advance()
+    await asyncio.sleep(0)
+    assert fired == []
+
+    clock.now = 0.3
+    timer_wheel.advance()
+    await asyncio.sleep(0)
+    assert fired == ["soon"]
+    assert len(timer_wheel) == 1
+
+    clock.now = 5.0
+    timer_wheel.advance()
+    await asyncio.sleep(0)
+    assert fired == ["soon", "after several turns"]
+    assert len(timer_wheel) == 0
+
+
+async def test_stop_runs_pending_callbacks():
+    timer_wheel = TimerWheel()
+    fired = []
+
+    async def callback():
+        fired.append(True)
+
+    timer_wheel.start()
+    timer_wheel.schedule(60, callback)
+
+    await timer_wheel.stop()
+
+    assert fired == [True]
+    assert len(timer_wheel) == 0
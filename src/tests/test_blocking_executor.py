@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from application.use_cases import blocking_calls_lock
+from application.use_cases import run_blocking
+from infrastructure.blocking_executor import InstrumentedThreadPoolExecutor
+from infrastructure.blocking_executor import blocking_call_wait_seconds
+from infrastructure.blocking_executor import blocking_calls_queued
+from infrastructure.blocking_executor import blocking_calls_running
+
+
+async def test_run_blocking_uses_the_default_executor():
+    executor = InstrumentedThreadPoolExecutor(max_workers=1, thread_name_prefix="blocking-test")
+    asyncio.get_running_loop().set_default_executor(executor)
+
+    thread_name = await run_blocking(lambda: threading.current_thread().name)
+
+    assert thread_name.startswith("blocking-test")
+    executor.shutdown()
+
+
+async def test_cancelled_call_waits_for_its_thread():
+    started = threading.Event()
+    finished = threading.Event()
+
+    def call():
+        started.set()
+        time.sleep(0.05)
+        finished.set()
+
+    task = asyncio.create_task(run_blocking(call))
+    await asyncio.to_thread(started.wait)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert finished.is_set()
+
+
+async def test_calls_sharing_a_lock_run_one_at_a_time():
+    running, overlapped = 0, False
+    lock = threading.Lock()
+
+    def call():
+        nonlocal running, overlapped
+        with lock:
+            running += 1
+            overlapped |= running > 1
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    token = blocking_calls_lock.set(asyncio.Lock())
+    try:
+        await asyncio.gather(*(run_blocking(call) for _ in range(3)))
+    finally:
+        blocking_calls_lock.reset(token)
+
+    assert not overlapped
+
+
+def test_executor_reports_queueing():
+    executor = InstrumentedThreadPoolExecutor(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+    waits_before = blocking_call_wait_seconds.get_count()
+
+    first = executor.submit(lambda: (started.set(), release.wait()))
+    second = executor.submit(lambda: None)
+    third = executor.submit(lambda: None)
+    started.wait()
+
+    assert blocking_calls_running.get() == 1
+    assert blocking_calls_queued.get() == 2
+
+    third.cancel()
+    release.set()
+    first.result()
+    second.result()
+    executor.shutdown()
+
+    assert blocking_calls_running.get() == 0
+    assert blocking_calls_queued.get() == 0
+    assert blocking_call_wait_seconds.get_count() == waits_before + 2
@@ -0,0 +1,186 @@
+import logging
+import re
+
+import pytest
+
+from infrastructure.di import DIRegistry
+from infrastructure.di import di_resolutions_total
+
+
+class Session:
+    pass
+
+
+class Repository:
+    def __init__(self, session: Session):
+        self.session = session
+
+
+class Service:
+    def __init__(self, repository: Repository, session: Session):
+        self.repository = repository
+        self.session = session
+
+
+@pytest.fixture
+def registry() -> DIRegistry:
+    registry = DIRegistry()
+    registry.register(Service, factory=Service, dependencies=[Repository, Session])
+    registry.register(Repository, factory=Repository, dependencies=[Session])
+    registry.register(Session, factory=Session)
+    return registry
+
+
+async def test_resolves_dependencies_once_per_scope(registry: DIRegistry):
+    container = registry.create_container()
+
+    service = await container.get(Service)
+
+    assert service.repository.session is service.session
+    assert await container.get(Repository) is service.repository
+
+
+async def test_scopes_do_not_share_instances(registry: DIRegistry):
+    first = await registry.create_container().get(Service)
+    second = await registry.create_container().get(Service)
+
+    assert first.session is not second.session
+
+
+async def test_plan_is_in_dependency_order(registry: DIRegistry):
+    assert [step[0] for step in registry._plans[Service]] == [Session, Repository, Service]
+
+
+async def test_async_factory_is_awaited(registry: DIRegistry):
+    async def create_repository(session: Session) -> Repository:
+        return Repository(session)
+
+    registry.register(Repository, factory=create_repository, dependencies=[Session])
+
+    service = await registry.create_container().get(Service)
+
+    assert isinstance(service.repository, Repository)
+
+
+async def test_unregistered_dependency_raises(registry: DIRegistry):
+    registry.register(str, factory=str, dependencies=[int])
+
+    with pytest.raises(ValueError):
+        await registry.create_container().get(str)
+
+
+def test_circular_dependency_raises(registry: DIRegistry):
+    with pytest.raises(ValueError):
+        registry.register(Session, factory=Session, dependencies=[Service])
+
+    assert registry._dependencies[Session] == ()
+
+
+class Pool:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class Client:
+    def __init__(self, pool: Pool):
+        self.pool = pool
+        self.closed = False
+
+    def close(self):
+        assert not self.pool.closed
+        self.closed = True
+
+
+@pytest.fixture
+def singleton_registry(registry: DIRegistry) -> DIRegistry:
+    registry.register(Pool, factory=Pool, is_singleton=True)
+    registry.register(Client, factory=Client, dependencies=[Pool], is_singleton=True)
+    registry.register(Repository, factory=lambda session, client: Repository(session), dependencies=[Session, Client])
+    return registry
+
+
+async def test_singletons_are_shared_between_scopes(singleton_registry: DIRegistry):
+    await singleton_registry.start()
+
+    first = singleton_registry.create_container()
+    second = singleton_registry.create_container()
+
+    assert await first.get(Client) is await second.get(Client)
+    assert (await first.get(Client)).pool is await second.get(Pool)
+
+
+async def test_singleton_must_be_started(singleton_registry: DIRegistry):
+    with pytest.raises(RuntimeError):
+        await singleton_registry.create_container().get(Repository)
+
+
+async def test_scope_close_does_not_close_singletons(singleton_registry: DIRegistry):
+    await singleton_registry.start()
+
+    async with singleton_registry.scope() as container:
+        await container.get(Service)
+
+    assert not (await singleton_registry.create_container().get(Client)).closed
+
+
+async def test_shutdown_closes_dependents_first(singleton_registry: DIRegistry):
+    await singleton_registry.start()
+    client = await singleton_registry.create_container().get(Client)
+
+    await singleton_registry.shutdown()
+
+    assert client.closed
+    assert client.pool.closed
+
+
+async def test_shutdown_uses_registered_callable(registry: DIRegistry):
+    closed = []
+    registry.register(Pool, factory=Pool, is_singleton=True, shutdown=closed.append)
+    await registry.start()
+
+    await registry.shutdown()
+
+    assert len(closed) == 1
+
+
+def test_singleton_cannot_depend_on_scoped_dependency(registry: DIRegistry):
+    with pytest.raises(ValueError):
+        registry.register(Pool, factory=lambda session: Pool(), dependencies=[Session], is_singleton=True)
+
+
+async def test_instrumented_container_records_builds_and_hits():
+    registry = DIRegistry(instrumented=True)
+    registry.register(Session, factory=Session)
+    registry.register(Repository, factory=Repository, dependencies=[Session])
+    registry.register(Service, factory=Service, dependencies=[Repository, Session])
+    builds_before = di_resolutions_total.get(type="Service", result="build")
+
+    container = registry.create_container()
+    await container.get(Repository)
+    await container.get(Service)
+
+    assert set(container.build_seconds) == {Session, Repository, Service}
+    assert container.hits == {Session: 1, Repository: 1}
+    assert di_resolutions_total.get(type="Service", result="build") == builds_before + 1
+    assert [re.sub(r" in [\d.]+ms", "", line) for line in container.resolution_tree().splitlines()] == [
+        "Repository built",
+        "  Session built",
+        "Service built",
+        "  Repository built",
+        "  Session built",
+    ]
+
+
+async def test_instrumented_scope_logs_resolution_tree(caplog):
+    registry = DIRegistry(instrumented=True)
+    registry.register(Session, factory=Session)
+
+    with caplog.at_level(logging.DEBUG, logger="infrastructure.di"):
+        async with registry.scope() as container:
+            await container.get(Session)
+
+    assert "DI scope built 1 objects" in caplog.text
+    assert "Session built in" in caplog.text
@@ -0,0 +1,44 @@
+import asyncio
+
+from infrastructure.in_flight_tasks import InFlightTasks
+
+
+async def test_drain_waits_for_running_calls():
+    in_flight_tasks = InFlightTasks()
+    finished = []
+
+    async def callback(name: str):
+        await asyncio.sleep(0.01)
+        finished.append(name)
+
+    tracked = in_flight_tasks.track(callback)
+    calls = [asyncio.create_task(tracked(name)) for name in "ab"]
+    await asyncio.sleep(0)
+
+    assert len(in_flight_tasks) == 2
+    assert await in_flight_tasks.drain(timeout_seconds=1) == 0
+    assert sorted(finished) == ["a", "b"]
+    assert len(in_flight_tasks) == 0
+    await asyncio.gather(*calls)
+
+
+async def test_drain_cancels_calls_still_running_after_the_timeout():
+    in_flight_tasks = InFlightTasks()
+    unwound = asyncio.Event()
+
+    async def callback():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            unwound.set()
+
+    call = asyncio.create_task(in_flight_tasks.track(callback)())
+    await asyncio.sleep(0)
+
+    assert await in_flight_tasks.drain(timeout_seconds=0.01) == 1
+    assert unwound.is_set()
+    assert call.cancelled()
+
+
+async def test_drain_without_running_calls_returns_right_away():
+    assert await InFlightTasks().drain(timeout_seconds=10) == 0
@@ -0,0 +1,105 @@
+import urllib.request
+
+import sqlalchemy
+
+from infrastructure.metrics import MetricsRegistry
+from infrastructure.metrics import merge_snapshots
+from infrastructure.metrics import render_prometheus
+from infrastructure.metrics_server import MetricsServer
+from infrastructure.persistence.database.query_timer import QueryTimer
+from infrastructure.persistence.database.query_timer import current_query_timer
+
+
+def _registry(task_count: int, in_flight: int, duration: float) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.counter("tasks_total", "Tasks").inc(task_count, task="RunAgent")
+    registry.gauge("tasks_in_flight", "In flight").set(in_flight)
+    registry.histogram("task_seconds", "Duration", buckets=(1, 10)).observe(duration)
+    return registry
+
+
+def test_snapshot_describes_each_metric():
+    snapshot = _registry(2, 1, 0.5).snapshot()
+
+    assert snapshot["tasks_total"] == {
+        "kind": "counter",
+        "description": "Tasks",
+        "buckets": None,
+        "samples": {(("task", "RunAgent"),): 2},
+    }
+    assert snapshot["task_seconds"]["buckets"] == (1, 10)
+    assert snapshot["task_seconds"]["samples"] == {(): ([1, 0, 0], 1, 0.5)}
+
+
+def test_merge_snapshots_adds_up_samples():
+    merged = merge_snapshots([_registry(2, 1, 0.5).snapshot(), _registry(3, 4, 20).snapshot()])
+
+    assert merged["tasks_total"]["samples"] == {(("task", "RunAgent"),): 5}
+    assert merged["tasks_in_flight"]["samples"] == {(): 5}
+    assert merged["task_seconds"]["samples"] == {(): ([1, 0, 1], 2, 20.5)}
+
+
+def test_merge_snapshots_can_drop_gauges():
+    merged = merge_snapshots([_registry(2, 1, 0.5).snapshot()], include_gauges=False)
+
+    assert "tasks_in_flight" not in merged
+    assert "tasks_total" in merged
+
+
+def test_merge_snapshots_does_not_modify_its_inputs():
+    snapshot = _registry(2, 1, 0.5).snapshot()
+
+    merge_snapshots([snapshot, snapshot])
+
+    assert snapshot["task_seconds"]["samples"] == {(): ([1, 0, 0], 1, 0.5)}
+
+
+def test_render_prometheus_writes_the_text_format():
+    registry = MetricsRegistry()
+    registry.counter("tasks_total", "Tasks").inc(2, task='Run"Agent')
+    registry.gauge("tasks_in_flight", "In flight").set(1)
+    registry.histogram("task_seconds", "Duration", buckets=(1, 10)).observe(5, task="RunAgent")
+
+    assert render_prometheus(registry.snapshot()) == (
+        "# HELP task_seconds Duration\n"
+        "# TYPE task_seconds histogram\n"
+        'task_seconds_bucket{task="RunAgent",le="1"} 0\n'
+        'task_seconds_bucket{task="RunAgent",le="10"} 1\n'
+        'task_seconds_bucket{task="RunAgent",le="+Inf"} 1\n'
+        'task_seconds_sum{task="RunAgent"} 5.0\n'
+        'task_seconds_count{task="RunAgent"} 1\n'
+        "# HELP tasks_in_flight In flight\n"
+        "# TYPE tasks_in_flight gauge\n"
+        "tasks_in_flight 1\n"
+        "# HELP tasks_total Tasks\n"
+        "# TYPE tasks_total counter\n"
+        'tasks_total{task="Run\\"Agent"} 2.0\n'
+    )
+
+
+def test_metrics_server_serves_the_collected_snapshot():
+    server = MetricsServer(lambda: merge_snapshots([_registry(2, 1, 0.5).snapshot()] * 2), "127.0.0.1", 0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            body = response.read().decode()
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.stop()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert 'tasks_total{task="RunAgent"} 4.0\n' in body
+    assert "task_seconds_count 2\n" in body
+
+
+def test_query_timer_adds_up_queries_run_in_its_context():
+    engine = sqlalchemy.create_engine("sqlite://")
+    query_timer = QueryTimer()
+    token = current_query_timer.set(query_timer)
+    try:
+        with engine.connect() as connection:
+            connection.execute(sqlalchemy.text("SELECT 1"))
+    finally:
+        current_query_timer.reset(token)
+
+    assert query_timer.seconds > 0
@@ -0,0 +1,96 @@
+import pytest
+
+from application.services.message_burst_service import MessageBurstService
+from application.use_cases import AsyncTask
+from application.use_cases.async_tasks import ProcessIncomingMessage
+from application.use_cases.async_tasks import ProcessMessage
+from application.use_cases.async_tasks import RunAgent
+from domain.exceptions import TaskRejectedException
+from domain.ports.repositories import MessageRepository
+from domain.ports.services import AsyncTaskDispatcherService
+from domain.ports.services import TemporaryStorageService
+from infrastructure.di import DIRegistry
+from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
+from infrastructure.services.in_memory_temporary_storage_service import InMemoryTemporaryStorageService
+from infrastructure.task_registry import TaskRegistry
+
+
+@pytest.fixture
+def di_registry(
+    mock_async_task_dispatcher: AsyncTaskDispatcherService,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_temporary_storage_service: InMemoryTemporaryStorageService,
+) -> DIRegistry:
+    di_registry = DIRegistry()
+    di_registry.register(AsyncTaskDispatcherService, factory=lambda: mock_async_task_dispatcher)
+    di_registry.register(MessageRepository, factory=lambda: in_memory_message_repository)
+    di_registry.register(TemporaryStorageService, factory=lambda: in_memory_temporary_storage_service)
+    di_registry.register(
+        MessageBurstService,
+        factory=lambda message_repository, temporary_storage_service: MessageBurstService(
+            message_repository,
+            temporary_storage_service,
+            debounce_seconds=3,
+            poll_seconds=1,
+            latest_message_ttl_seconds=60,
+        ),
+        dependencies=[MessageRepository, TemporaryStorageService],
+    )
+    return di_registry
+
+
+@pytest.fixture
+def task_registry(di_registry: DIRegistry) -> TaskRegistry:
+    task_registry = TaskRegistry(di_registry)
+    task_registry.register_all(AsyncTask.__subclasses__())
+    return task_registry
+
+
+async def test_route_builds_task_from_di(task_registry: TaskRegistry, di_registry: DIRegistry):
+    route, kwargs = task_registry.route({"task": "ProcessMessage", "kwargs": {"message_id": "1"}})
+
+    task = await route.build(di_registry.create_container())
+
+    assert isinstance(task, ProcessMessage)
+    assert kwargs == {"message_id": 1}
+
+
+def test_route_keeps_defaults(task_registry: TaskRegistry):
+    route, kwargs = task_registry.route(
+        {
+            "task": "ProcessIncomingMessage",
+            "kwargs": {"message_body": "Oi", "phone_number": "5541999999999", "timestamp": "2026-01-01T00:00:00"},
+        },
+    )
+
+    assert route.task_cls is ProcessIncomingMessage
+    assert kwargs["message_id"] is None
+
+
+def test_queues_use_task_concurrency(task_registry: TaskRegistry):
+    assert task_registry.queues() == {"async_tasks": 5, "async_tasks.agent": 5}
+
+
+def test_queues_take_largest_concurrency(di_registry: DIRegistry):
+    class FastAgentTask(RunAgent):
+        concurrency = 20
+
+    task_registry = TaskRegistry(di_registry)
+    task_registry.register_all([ProcessMessage, RunAgent, FastAgentTask])
+
+    assert task_registry.queues() == {"async_tasks": 5, "async_tasks.agent": 20}
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        ["ProcessMessage"],
+        {"task": "process_message", "kwargs": {"message_id": 1}},
+        {"task": "ProcessMessage", "kwargs": {}},
+        {"task": "ProcessMessage", "kwargs": {"message_id": "not a number"}},
+        {"task": "ProcessMessage", "kwargs": {"message_id": 1, "unexpected": True}},
+    ],
+)
+def test_route_rejects_invalid_payloads(task_registry: TaskRegistry, payload):
+    with pytest.raises(TaskRejectedException):
+        task_registry.route(payload)
@@ -0,0 +1,458 @@
+import asyncio
+import datetime
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+import pytest
+from fakeredis import aioredis
+
+from application.services.message_burst_service import MessageBurstService
+from application.use_cases import AsyncTask
+from application.use_cases import async_tasks  # noqa: F401 - defines the AsyncTask subclasses
+from application.use_cases.async_tasks import NotifyUser
+from application.use_cases.async_tasks import RunAgent
+from domain.entities import MessageAuthor
+from domain.entities import MessageBroker
+from domain.entities import User
+from domain.exceptions import TaskRejectedException
+from domain.exceptions import TaskRetryException
+from domain.exceptions import TaskSupersededException
+from domain.ports.repositories import MessageRepository
+from domain.ports.repositories import TenantRepository
+from domain.ports.repositories import UserRepository
+from domain.ports.services import AIAgentService
+from domain.ports.services import AMQPService
+from domain.ports.services import AsyncTaskDispatcherService
+from domain.ports.services import PubsubService
+from domain.ports.services import TemporaryStorageService
+from domain.ports.services import WhatsappBrokerMessageService
+from infrastructure.di import DIRegistry
+from infrastructure.persistence.memory.repositories.message_repository import InMemoryMessageRepository
+from infrastructure.persistence.memory.repositories.tenant_repository import InMemoryTenantRepository
+from infrastructure.persistence.memory.repositories.user_repository import InMemoryUserRepository
+from infrastructure.services.amqp_async_task_dispatcher import AMQPAsyncTaskDispatcherService
+from infrastructure.services.in_memory_temporary_storage_service import InMemoryTemporaryStorageService
+from infrastructure.services.redis_completed_tasks import RedisCompletedTasks
+from infrastructure.services.redis_keyed_lock import RedisKeyedLock
+from infrastructure.task_registry import TaskRegistry
+from infrastructure.task_registry import TaskRoute
+from infrastructure.task_runner import TaskRunner
+from infrastructure.task_runner import duplicate_tasks_total
+from infrastructure.task_runner import retry_or_reject
+
+
+@pytest.fixture
+async def redis_client():
+    client = aioredis.FakeRedis()
+    yield client
+    await client.flushall()
+    await client.aclose()
+
+
+@pytest.fixture
+def di_registry(
+    mock_amqp_service: AMQPService,
+    mock_pubsub_service: PubsubService,
+    mock_whatsapp_service: WhatsappBrokerMessageService,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_user_repository: InMemoryUserRepository,
+    in_memory_tenant_repository: InMemoryTenantRepository,
+    mock_ai_agent_service: AIAgentService,
+    in_memory_temporary_storage_service: InMemoryTemporaryStorageService,
+    redis_client: aioredis.FakeRedis,
+) -> DIRegistry:
+    di_registry = DIRegistry()
+    di_registry.register(AMQPService, factory=lambda: mock_amqp_service)
+    di_registry.register(AsyncTaskDispatcherService, factory=AMQPAsyncTaskDispatcherService, dependencies=[AMQPService])
+    di_registry.register(MessageRepository, factory=lambda: in_memory_message_repository)
+    di_registry.register(UserRepository, factory=lambda: in_memory_user_repository)
+    di_registry.register(TenantRepository, factory=lambda: in_memory_tenant_repository)
+    di_registry.register(PubsubService, factory=lambda: mock_pubsub_service)
+    di_registry.register(WhatsappBrokerMessageService, factory=lambda: mock_whatsapp_service)
+    di_registry.register(AIAgentService, factory=lambda: mock_ai_agent_service)
+    di_registry.register(TemporaryStorageService, factory=lambda: in_memory_temporary_storage_service)
+    di_registry.register(
+        MessageBurstService,
+        factory=lambda message_repository, temporary_storage_service: MessageBurstService(
+            message_repository,
+            temporary_storage_service,
+            debounce_seconds=0,
+            poll_seconds=0.01,
+            latest_message_ttl_seconds=60,
+        ),
+        dependencies=[MessageRepository, TemporaryStorageService],
+    )
+    keyed_lock = RedisKeyedLock(None)
+    di_registry.register(RedisKeyedLock, factory=lambda: keyed_lock)
+    di_registry.register(RedisCompletedTasks, factory=lambda: RedisCompletedTasks(redis_client, ttl_seconds=60))
+    return di_registry
+
+
+@pytest.fixture
+def run_task(di_registry: DIRegistry) -> Callable[..., Awaitable[None]]:
+    task_registry = TaskRegistry(di_registry)
+    task_registry.register_all(AsyncTask.__subclasses__())
+
+    async def run_task(task_name: str, inline_concurrency: int = 5, task_id: str | None = None, **kwargs):
+        task_runner = TaskRunner(
+            di_registry,
+            task_registry,
+            inline_concurrency=inline_concurrency,
+            inline_max_countdown_seconds=1,
+        )
+        route, task_kwargs = task_registry.route({"task": task_name, "kwargs": kwargs})
+        await task_runner.run(route, task_kwargs, task_id)
+
+    return run_task
+
+
+def _route(task_cls: type[AsyncTask]) -> TaskRoute:
+    task_registry = TaskRegistry(DIRegistry())
+    task_registry.register(task_cls)
+    return task_registry.get(task_cls.__name__)
+
+
+def _create_message(repository: InMemoryMessageRepository, user: User, author: MessageAuthor, body: str = "Oi") -> int:
+    message = repository.create(
+        body=body,
+        author=author,
+        timestamp=datetime.datetime(2026, 1, 1, tzinfo=datetime.UTC),
+        broker=MessageBroker.WHATSAPP,
+        user_id=user.id,
+        tenant_id=user.tenant_id,
+    )
+    return message.id
+
+
+def _published_tasks(mock_amqp_service) -> list[tuple[str, str]]:
+    return [(call.args[0]["task"], call.args[1]) for call in mock_amqp_service.publish.await_args_list]
+
+
+async def test_inline_follow_ups_run_without_the_broker(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+    mock_whatsapp_service,
+):
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+
+    await run_task("ProcessMessage", message_id=message_id)
+
+    mock_amqp_service.publish.assert_not_awaited()
+    mock_pubsub_service.publish.assert_awaited_once()
+    mock_whatsapp_service.send_message.assert_awaited_once_with("Oi", in_memory_registered_user.phone_number)
+
+
+async def test_follow_ups_are_published_when_inline_execution_is_off(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+):
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+
+    await run_task("ProcessMessage", inline_concurrency=0, message_id=message_id)
+
+    assert _published_tasks(mock_amqp_service) == [("NotifyUser", "async_tasks"), ("SendMessage", "async_tasks")]
+    mock_pubsub_service.publish.assert_not_awaited()
+
+
+async def test_tasks_not_marked_inline_are_published(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+):
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER)
+
+    await run_task("ProcessMessage", message_id=message_id)
+
+    assert _published_tasks(mock_amqp_service) == [("RunAgent", "async_tasks.agent")]
+    mock_pubsub_service.publish.assert_awaited_once()
+
+
+async def test_failed_inline_task_is_published(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+    mock_whatsapp_service,
+):
+    mock_pubsub_service.publish.side_effect = ConnectionError
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+
+    await run_task("ProcessMessage", message_id=message_id)
+
+    assert _published_tasks(mock_amqp_service) == [("NotifyUser", "async_tasks")]
+    mock_whatsapp_service.send_message.assert_awaited_once()
+
+
+async def test_remaining_inline_tasks_are_published_when_cancelled(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+    mock_whatsapp_service,
+):
+    notifying = asyncio.Event()
+
+    async def publish(*args, **kwargs):
+        notifying.set()
+        await asyncio.sleep(10)
+
+    mock_pubsub_service.publish.side_effect = publish
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+
+    task = asyncio.create_task(run_task("ProcessMessage", task_id="abc", message_id=message_id))
+    await notifying.wait()
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert _published_tasks(mock_amqp_service) == [("NotifyUser", "async_tasks"), ("SendMessage", "async_tasks")]
+    mock_whatsapp_service.send_message.assert_not_awaited()
+
+
+async def test_remaining_inline_tasks_are_published_when_a_publish_fails(
+    run_task,
+    redis_client: aioredis.FakeRedis,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+    mock_whatsapp_service,
+):
+    # NotifyUser fails inline and so does its publish, then the broker comes back
+    mock_pubsub_service.publish.side_effect = ConnectionError
+    mock_amqp_service.publish.side_effect = [ConnectionError, None, None]
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+
+    await run_task("ProcessMessage", task_id="abc", message_id=message_id)
+
+    assert _published_tasks(mock_amqp_service) == [
+        ("NotifyUser", "async_tasks"),
+        ("NotifyUser", "async_tasks"),
+        ("SendMessage", "async_tasks"),
+    ]
+    mock_whatsapp_service.send_message.assert_not_awaited()
+    assert await RedisCompletedTasks(redis_client).pending_follow_ups("abc") == []
+
+
+async def test_redelivered_task_publishes_follow_ups_left_behind(
+    run_task,
+    redis_client: aioredis.FakeRedis,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+):
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+    completed_tasks = RedisCompletedTasks(redis_client)
+    # The worker died after ProcessMessage committed, before running its follow-ups
+    await completed_tasks.mark_completed("abc", [("NotifyUser", {"message_id": message_id}, "def")])
+
+    await run_task("ProcessMessage", inline_concurrency=0, task_id="abc", message_id=message_id)
+
+    assert _published_tasks(mock_amqp_service) == [("NotifyUser", "async_tasks")]
+    assert mock_amqp_service.publish.await_args.args[0]["id"] == "def"
+    mock_pubsub_service.publish.assert_not_awaited()
+    assert await completed_tasks.pending_follow_ups("abc") == []
+
+
+async def test_follow_ups_are_published_when_saturated(
+    run_task,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+    mock_pubsub_service,
+):
+    # ProcessMessage is dispatched with a countdown and runs inline, taking the only slot
+    await run_task(
+        "ProcessIncomingMessage",
+        inline_concurrency=1,
+        message_body="Oi",
+        phone_number=in_memory_registered_user.phone_number,
+        timestamp="2026-01-01T00:00:00+00:00",
+    )
+
+    # RunAgent is published as it is dispatched, NotifyUser once ProcessMessage commits
+    assert _published_tasks(mock_amqp_service) == [("RunAgent", "async_tasks.agent"), ("NotifyUser", "async_tasks")]
+    mock_pubsub_service.publish.assert_not_awaited()
+
+
+async def test_runs_for_the_same_user_are_serialized(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_ai_agent_service,
+):
+    running, overlapped = 0, False
+
+    async def run_agent(message_body: str, user: User) -> str:
+        nonlocal running, overlapped
+        running += 1
+        overlapped |= running > 1
+        await asyncio.sleep(0.01)
+        running -= 1
+        return f"Re: {message_body}"
+
+    mock_ai_agent_service.run.side_effect = run_agent
+    message_ids = [
+        _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER) for _ in range(3)
+    ]
+
+    user_id = in_memory_registered_user.id
+    await asyncio.gather(*(run_task("RunAgent", message_id=message_id, user_id=user_id) for message_id in message_ids))
+
+    assert mock_ai_agent_service.run.await_count == 3
+    assert not overlapped
+
+
+async def test_completed_task_is_skipped_when_redelivered(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_amqp_service,
+):
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+    duplicates_before = duplicate_tasks_total.get(task="ProcessMessage")
+
+    await run_task("ProcessMessage", inline_concurrency=0, task_id="abc", message_id=message_id)
+    await run_task("ProcessMessage", inline_concurrency=0, task_id="abc", message_id=message_id)
+
+    assert _published_tasks(mock_amqp_service) == [("NotifyUser", "async_tasks"), ("SendMessage", "async_tasks")]
+    assert duplicate_tasks_total.get(task="ProcessMessage") == duplicates_before + 1
+
+
+async def test_failed_task_runs_again_when_retried(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_pubsub_service,
+):
+    mock_pubsub_service.publish.side_effect = [ConnectionError, None]
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+
+    with pytest.raises(ConnectionError):
+        await run_task("NotifyUser", task_id="abc", message_id=message_id)
+    await run_task("NotifyUser", task_id="abc", message_id=message_id)
+
+    assert mock_pubsub_service.publish.await_count == 2
+
+
+async def test_inline_follow_ups_keep_their_task_ids(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    redis_client: aioredis.FakeRedis,
+):
+    message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY)
+
+    await run_task("ProcessMessage", task_id="abc", message_id=message_id)
+
+    assert len(await redis_client.keys("task_done:*")) == 3
+
+
+async def test_burst_of_messages_gets_one_agent_run(
+    run_task,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_ai_agent_service,
+):
+    _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER, "Old question")
+    _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.BILLY, "Old answer")
+    message_ids = []
+    for body in ["Gastei 50", "no mercado", "ontem"]:
+        message_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER, body)
+        message_ids.append(message_id)
+        await run_task("ProcessMessage", inline_concurrency=0, message_id=message_id)
+
+    for message_id in message_ids[:-1]:
+        with pytest.raises(TaskSupersededException):
+            await run_task("RunAgent", message_id=message_id, user_id=in_memory_registered_user.id)
+    await run_task("RunAgent", message_id=message_ids[-1], user_id=in_memory_registered_user.id)
+
+    mock_ai_agent_service.run.assert_awaited_once_with("Gastei 50\nno mercado\nontem", in_memory_registered_user)
+
+
+async def test_agent_run_is_cancelled_when_a_newer_message_arrives(
+    run_task,
+    di_registry: DIRegistry,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_ai_agent_service,
+):
+    cancelled = asyncio.Event()
+
+    async def run_agent(message_body: str, user: User) -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    mock_ai_agent_service.run.side_effect = run_agent
+    first_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER)
+    second_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER)
+    message_burst_service = await di_registry.create_container().get(MessageBurstService)
+
+    agent_run = asyncio.create_task(run_task("RunAgent", message_id=first_id, user_id=in_memory_registered_user.id))
+    await asyncio.sleep(0.05)
+    message_burst_service.mark_latest(in_memory_message_repository.get_by_id(second_id))
+
+    with pytest.raises(TaskSupersededException):
+        await asyncio.wait_for(agent_run, timeout=1)
+    assert cancelled.is_set()
+    user = in_memory_registered_user
+    assert len(list(in_memory_message_repository.get_all(user_id=user.id, tenant_id=user.tenant_id))) == 2
+
+
+async def test_older_message_marked_last_does_not_supersede_newer_one(
+    run_task,
+    di_registry: DIRegistry,
+    in_memory_message_repository: InMemoryMessageRepository,
+    in_memory_registered_user: User,
+    mock_ai_agent_service,
+):
+    older_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER, "Gastei 50")
+    newer_id = _create_message(in_memory_message_repository, in_memory_registered_user, MessageAuthor.USER, "ontem")
+    message_burst_service = await di_registry.create_container().get(MessageBurstService)
+
+    # ProcessMessage for the newer message ran first, e.g. the older one was retried
+    message_burst_service.mark_latest(in_memory_message_repository.get_by_id(newer_id))
+    message_burst_service.mark_latest(in_memory_message_repository.get_by_id(older_id))
+
+    with pytest.raises(TaskSupersededException):
+        await run_task("RunAgent", message_id=older_id, user_id=in_memory_registered_user.id)
+    await run_task("RunAgent", message_id=newer_id, user_id=in_memory_registered_user.id)
+
+    mock_ai_agent_service.run.assert_awaited_once_with("Gastei 50\nontem", in_memory_registered_user)
+
+
+@pytest.mark.parametrize(
+    ("attempt", "delay_range_ms"),
+    [(1, (500, 1000)), (2, (1000, 2000)), (4, (4000, 8000))],
+)
+def test_retry_or_reject_backs_off_exponentially(attempt: int, delay_range_ms: tuple[int, int]):
+    payload = {"task": "NotifyUser", "kwargs": {"message_id": 1}, "attempt": attempt}
+
+    failure = retry_or_reject(_route(NotifyUser), payload, ConnectionError("Redis is down"))
+
+    assert isinstance(failure, TaskRetryException)
+    assert failure.payload == {**payload, "attempt": attempt + 1}
+    assert delay_range_ms[0] <= failure.delay_ms <= delay_range_ms[1]
+    assert str(failure) == "ConnectionError: Redis is down"
+
+
+def test_retry_or_reject_rejects_after_max_attempts():
+    payload = {"task": "RunAgent", "kwargs": {"message_id": 1}, "attempt": 3}
+
+    failure = retry_or_reject(_route(RunAgent), payload, TimeoutError("LLM timed out"))
+
+    assert isinstance(failure, TaskRejectedException)
+    assert str(failure) == "Failed after 3 attempts, TimeoutError: LLM timed out"
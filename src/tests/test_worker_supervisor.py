@@ -0,0 +1,62 @@
+import functools
+import signal
+import sys
+import threading
+import time
+from multiprocessing.queues import Queue
+from pathlib import Path
+
+from infrastructure.metrics import MetricsRegistry
+from infrastructure.worker_supervisor import WorkerSupervisor
+
+
+def crash_once_worker(index: int, metrics_queue: Queue, starts_dir: str):
+    # Runs in a spawned child process
+    starts = Path(starts_dir) / str(index)
+    with starts.open("a") as file:
+        file.write("started\n")
+
+    registry = MetricsRegistry()
+    registry.counter("tasks_total", "Tasks").inc()
+    registry.gauge("tasks_in_flight", "In flight").set(1)
+    metrics_queue.put((index, registry.snapshot()))
+
+    if len(starts.read_text().splitlines()) == 1:
+        sys.exit(1)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    stopped.wait()
+
+
+def _wait_for(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_supervisor_restarts_crashed_workers_and_aggregates_metrics(tmp_path):
+    supervisor = WorkerSupervisor(
+        functools.partial(crash_once_worker, starts_dir=str(tmp_path)),
+        processes=2,
+        shutdown_timeout_seconds=10,
+        restart_delay_seconds=0,
+    )
+    runner = threading.Thread(target=supervisor.run, kwargs={"install_signal_handlers": False})
+    runner.start()
+
+    try:
+        _wait_for(lambda: supervisor.restarts == 2)
+        # The live children and the counters of the crashed ones
+        _wait_for(lambda: supervisor.aggregated_metrics().get("tasks_total", {}).get("samples") == {(): 4})
+    finally:
+        supervisor.stop()
+        runner.join(timeout=30)
+
+    assert not runner.is_alive()
+    assert [len((tmp_path / str(index)).read_text().splitlines()) for index in range(2)] == [2, 2]
+    aggregated = supervisor.aggregated_metrics()
+    assert aggregated["tasks_total"]["samples"] == {(): 4}
+    # Gauges of stopped workers are dropped
+    assert "tasks_in_flight" not in aggregated